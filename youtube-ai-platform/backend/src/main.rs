@@ -4,12 +4,16 @@ use actix_files::Files;
 use serde::{Deserialize, Serialize};
 use dotenv::dotenv;
 use chrono::Utc;
-use std::process::Command;
+use std::process::{Child, Command};
+use tokio::io::{AsyncBufReadExt, AsyncWriteExt, BufReader};
+use tokio::net::UnixStream;
 
 // JSON 요청/응답 구조체들
 #[derive(Serialize, Deserialize)]
 struct SearchRequest {
     query: String,
+    #[serde(default)]
+    mode: Option<String>,
 }
 
 #[derive(Serialize, Deserialize)]
@@ -20,11 +24,15 @@ struct VideoSearchRequest {
 #[derive(Serialize, Deserialize)]
 struct ChannelRequest {
     video_url: String,
+    #[serde(default)]
+    max_videos: Option<u32>,
 }
 
 #[derive(Serialize, Deserialize)]
 struct SaveChannelRequest {
     channel_id: String,
+    #[serde(default)]
+    max_results: Option<u32>,
 }
 
 #[derive(Serialize, Deserialize)]
@@ -50,7 +58,7 @@ struct CompareChunkingRequest {
 
 #[derive(Serialize, Deserialize)]
 struct ProgressRequest {
-    channel_id: String,
+    job_id: String,
 }
 
 #[derive(Serialize, Deserialize)]
@@ -63,9 +71,78 @@ struct ApiResponse<T> {
 // MCP 클라이언트 구조체
 struct MCPClient;
 
+// 워커 풀 Unix 소켓 경로 (mcp_client.py --serve 와 동일한 기본값)
+fn mcp_socket_path() -> String {
+    std::env::var("MCP_SOCKET_PATH").unwrap_or_else(|_| "/tmp/mcp_worker.sock".to_string())
+}
+
 impl MCPClient {
+    // 사전 워밍된 Python 워커 풀을 백그라운드로 시작 (MCP_WORKER_POOL=0 이면 비활성화)
+    fn start_worker_pool() -> Option<Child> {
+        if std::env::var("MCP_WORKER_POOL").map(|v| v == "0").unwrap_or(false) {
+            return None;
+        }
+        let workers = std::env::var("MCP_WORKERS").unwrap_or_else(|_| "4".to_string());
+        match Command::new("../python/.venv/bin/python")
+            .current_dir(".")
+            .arg("../python/mcp_client.py")
+            .arg("--serve")
+            .arg("--socket")
+            .arg(mcp_socket_path())
+            .arg("--workers")
+            .arg(&workers)
+            .spawn()
+        {
+            Ok(child) => {
+                println!("🧵 MCP 워커 풀 시작 (워커 {}개, 소켓 {})", workers, mcp_socket_path());
+                Some(child)
+            }
+            Err(e) => {
+                println!("⚠️ MCP 워커 풀 시작 실패, 1회성 호출로 동작합니다: {}", e);
+                None
+            }
+        }
+    }
+
     // Python MCP 서버와 통신하는 함수
     async fn call_function(function_name: &str, args: serde_json::Value) -> Result<String, anyhow::Error> {
+        // 1. 상주 워커 풀이 떠 있으면 소켓으로 호출
+        match Self::call_worker_pool(function_name, &args).await {
+            Ok(result) => return Ok(result),
+            Err(e) => println!("워커 풀 호출 불가, 1회성 프로세스로 대체: {}", e),
+        }
+
+        // 2. fallback: 요청마다 Python 프로세스 실행
+        Self::call_one_shot(function_name, args).await
+    }
+
+    // 워커 풀에 JSON-lines 요청 한 줄을 보내고 응답의 result를 문자열로 반환
+    async fn call_worker_pool(function_name: &str, args: &serde_json::Value) -> Result<String, anyhow::Error> {
+        let stream = UnixStream::connect(mcp_socket_path()).await?;
+        let (reader, mut writer) = stream.into_split();
+
+        let request = serde_json::json!({
+            "id": 0,
+            "function": function_name,
+            "args": args
+        });
+        let mut line = serde_json::to_string(&request)?;
+        line.push('\n');
+        writer.write_all(line.as_bytes()).await?;
+        writer.flush().await?;
+
+        let mut response_line = String::new();
+        BufReader::new(reader).read_line(&mut response_line).await?;
+        if response_line.trim().is_empty() {
+            return Err(anyhow::anyhow!("워커 풀 응답이 비어 있습니다"));
+        }
+
+        let response: serde_json::Value = serde_json::from_str(response_line.trim())?;
+        let result = response.get("result").cloned().unwrap_or(serde_json::Value::Null);
+        Ok(serde_json::to_string(&result)?)
+    }
+
+    async fn call_one_shot(function_name: &str, args: serde_json::Value) -> Result<String, anyhow::Error> {
         // 가상환경의 Python 사용 (.venv로 수정)
         let output = Command::new("../python/.venv/bin/python")
             .current_dir(".")  // 현재 디렉토리에서 실행
@@ -89,7 +166,8 @@ impl MCPClient {
 // API 엔드포인트 함수들
 async fn search_similar_video(req: web::Json<SearchRequest>) -> Result<HttpResponse> {
     let args = serde_json::json!({
-        "query": req.query
+        "query": req.query,
+        "mode": req.mode.as_deref().unwrap_or("vector")
     });
     
     match MCPClient::call_function("search_similar_youtube_video", args).await {
@@ -183,7 +261,8 @@ async fn search_youtube_videos(req: web::Json<VideoSearchRequest>) -> Result<Htt
 
 async fn get_channel_info(req: web::Json<ChannelRequest>) -> Result<HttpResponse> {
     let args = serde_json::json!({
-        "video_url": req.video_url
+        "video_url": req.video_url,
+        "max_videos": req.max_videos.unwrap_or(5)
     });
     
     match MCPClient::call_function("get_channel_info", args).await {
@@ -226,7 +305,8 @@ async fn get_channel_info(req: web::Json<ChannelRequest>) -> Result<HttpResponse
 
 async fn save_channel_embeddings(req: web::Json<SaveChannelRequest>) -> Result<HttpResponse> {
     let args = serde_json::json!({
-        "channel_id": req.channel_id
+        "channel_id": req.channel_id,
+        "max_results": req.max_results.unwrap_or(3)
     });
     
     match MCPClient::call_function("save_channel_youtube_embeddings", args).await {
@@ -263,6 +343,7 @@ async fn save_channel_embeddings(req: web::Json<SaveChannelRequest>) -> Result<H
 async fn save_channel_embeddings_force(req: web::Json<SaveChannelRequest>) -> Result<HttpResponse> {
     let args = serde_json::json!({
         "channel_id": req.channel_id,
+        "max_results": req.max_results.unwrap_or(3),
         "force_update": true
     });
     
@@ -466,6 +547,49 @@ async fn compare_chunking_methods(req: web::Json<CompareChunkingRequest>) -> Res
     }
 }
 
+// 수집 작업 상태/진행 상황 조회 (저장 요청은 작업 ID만 바로 반환)
+async fn get_ingest_progress(req: web::Json<ProgressRequest>) -> Result<HttpResponse> {
+    let args = serde_json::json!({
+        "job_id": req.job_id
+    });
+
+    match MCPClient::call_function("get_ingest_job", args).await {
+        Ok(result) => {
+            match serde_json::from_str::<serde_json::Value>(&result) {
+                Ok(data) => {
+                    if let Some(error) = data.get("error").and_then(|e| e.as_str()) {
+                        return Ok(HttpResponse::NotFound().json(ApiResponse::<()> {
+                            success: false,
+                            data: None,
+                            error: Some(error.to_string()),
+                        }));
+                    }
+                    Ok(HttpResponse::Ok().json(ApiResponse {
+                        success: true,
+                        data: Some(data),
+                        error: None,
+                    }))
+                },
+                Err(e) => {
+                    Ok(HttpResponse::InternalServerError().json(ApiResponse::<()> {
+                        success: false,
+                        data: None,
+                        error: Some(format!("작업 상태 응답 파싱 실패: {}", e)),
+                    }))
+                }
+            }
+        },
+        Err(e) => {
+            println!("MCP 함수 호출 오류: {}", e);
+            Ok(HttpResponse::InternalServerError().json(ApiResponse::<()> {
+                success: false,
+                data: None,
+                error: Some(e.to_string()),
+            }))
+        }
+    }
+}
+
 async fn health_check() -> Result<HttpResponse> {
     Ok(HttpResponse::Ok().json(serde_json::json!({
         "status": "healthy",
@@ -489,7 +613,10 @@ async fn main() -> std::io::Result<()> {
     println!("📍 서버 주소: http://127.0.0.1:8080");
     println!("🔧 MCP 서버와 연동 중...");
 
-    HttpServer::new(|| {
+    // 서버가 살아있는 동안 워커 풀 프로세스를 유지
+    let mut worker_pool = MCPClient::start_worker_pool();
+
+    let server = HttpServer::new(|| {
         let cors = Cors::default()
             .allow_any_origin()
             .allow_any_method()
@@ -506,6 +633,7 @@ async fn main() -> std::io::Result<()> {
             .route("/api/channel-info", web::post().to(get_channel_info))
             .route("/api/save-channel", web::post().to(save_channel_embeddings))
             .route("/api/save-channel-force", web::post().to(save_channel_embeddings_force))
+            .route("/api/progress", web::post().to(get_ingest_progress))
             .route("/api/transcript", web::post().to(get_youtube_transcript))
             .route("/api/save-single-video", web::post().to(save_single_video_embedding))
             .route("/api/save-single-video-semantic", web::post().to(save_single_video_semantic_embedding))
@@ -513,5 +641,10 @@ async fn main() -> std::io::Result<()> {
     })
     .bind("127.0.0.1:8080")?
     .run()
-    .await
+    .await;
+
+    if let Some(child) = worker_pool.as_mut() {
+        let _ = child.kill();
+    }
+    server
 } 
\ No newline at end of file
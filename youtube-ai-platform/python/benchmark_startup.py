@@ -0,0 +1,148 @@
+"""
+mcp_server 콜드 스타트 벤치마크
+매번 새 파이썬 프로세스에서 mcp_server(또는 mcp_client)를 import하고 걸린 시간을 잽니다.
+워커 프로세스와 스크립트가 첫 요청 전에 내는 비용입니다.
+- 벽시계 시간: 인터프리터 시작 + import 전체 (중앙값/최솟값)
+- import 시간: python -X importtime 결과를 최상위 패키지별 self 시간으로 합산한 상위 목록
+- 무거운 선택 패키지(openai, supabase, mcp 등)가 import 시점에 불러와졌는지 표시
+
+--budget-ms를 주면 import 시간 중앙값이 예산을 넘을 때 종료 코드 1로 끝나므로 회귀 검사에 쓸 수 있습니다.
+
+사용 예:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 10 --top 15 --json startup.json
+    python benchmark_startup.py --target import --budget-ms 400
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 측정 대상: 이름 → 새 프로세스에서 실행할 코드
+TARGETS = {
+    "import": "import mcp_server",                           # 함수 모음으로 import (워커, 스크립트)
+    "server": "import mcp_server; mcp_server.mcp.server",    # FastMCP 서버 생성 + 도구 등록 (run 직전)
+    "client": "import mcp_client",                           # 백엔드가 띄우는 클라이언트 프로세스
+}
+
+# 필요할 때만 불러와야 하는 무거운 패키지
+DEFERRED_PACKAGES = ("openai", "supabase", "mcp", "httpx", "tiktoken", "sklearn", "faiss")
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_wall(code: str) -> float:
+    """새 프로세스에서 code를 실행하는 데 걸린 시간(초)"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=HERE, env=_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def measure_importtime(code: str) -> tuple:
+    """-X importtime 결과 [(모듈 이름, self us, cumulative us, 깊이)]와 실행 후 sys.modules의 최상위 패키지 집합.
+    importtime에는 실패한 import 시도(설치되지 않은 선택 패키지)도 나오므로 실제 로드 여부는 sys.modules로 판단"""
+    code += "; import sys; print(' '.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=HERE, env=_env(),
+                               check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), (len(match.group(3)) - 1) // 2))
+    loaded = set(completed.stdout.strip().splitlines()[-1].split()) if completed.stdout.strip() else set()
+    return modules, loaded
+
+
+def summarize_imports(modules: list, loaded: set) -> dict:
+    """최상위 import 합계와 패키지별 self 시간 합계(ms)"""
+    total_us = sum(cumulative for _, _, cumulative, depth in modules if depth == 0)
+    packages = {}
+    for name, self_us, _, _ in modules:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    return {
+        "import_ms": total_us / 1000,
+        "packages_ms": {name: us / 1000 for name, us in packages.items()},
+        "deferred_loaded": sorted(p for p in DEFERRED_PACKAGES if p in loaded),
+    }
+
+
+def run_target(name: str, runs: int) -> dict:
+    code = TARGETS[name]
+    measure_wall(code)  # 첫 실행은 디스크 캐시 워밍용으로 버림
+    walls = [measure_wall(code) for _ in range(runs)]
+    summaries = [summarize_imports(*measure_importtime(code)) for _ in range(runs)]
+
+    package_names = set().union(*(s["packages_ms"] for s in summaries))
+    packages_ms = {
+        package: round(statistics.median(s["packages_ms"].get(package, 0.0) for s in summaries), 2)
+        for package in package_names
+    }
+    return {
+        "target": name,
+        "code": code,
+        "runs": runs,
+        "wall_median_ms": round(statistics.median(walls) * 1000, 1),
+        "wall_min_ms": round(min(walls) * 1000, 1),
+        "import_median_ms": round(statistics.median(s["import_ms"] for s in summaries), 1),
+        "deferred_loaded": summaries[-1]["deferred_loaded"],
+        "packages_ms": dict(sorted(packages_ms.items(), key=lambda item: -item[1])),
+    }
+
+
+def print_report(results: list, top: int):
+    print(f"\n🚀 콜드 스타트 ({sys.executable})")
+    print(f"{'target':<8} {'wall p50':>9} {'wall min':>9} {'import p50':>11}  불러온 선택 패키지")
+    for r in results:
+        print(f"{r['target']:<8} {r['wall_median_ms']:>9} {r['wall_min_ms']:>9} {r['import_median_ms']:>11}  "
+              f"{', '.join(r['deferred_loaded']) or '(없음)'}")
+    for r in results:
+        print(f"\n📦 {r['target']}: 패키지별 import self 시간 상위 {top}개 (ms, 중앙값)")
+        for package, ms in list(r["packages_ms"].items())[:top]:
+            print(f"  {package:<28} {ms:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mcp_server 콜드 스타트(import) 시간 벤치마크")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS),
+                        help="측정 대상 (여러 번 지정 가능, 기본: 전부)")
+    parser.add_argument("--runs", type=int, default=5, help="대상별 반복 횟수 (새 프로세스)")
+    parser.add_argument("--top", type=int, default=10, help="패키지별 시간 상위 몇 개를 출력할지")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="import 시간 중앙값 예산. 어느 대상이든 넘으면 종료 코드 1")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    results = [run_target(name, max(1, args.runs)) for name in (args.target or list(TARGETS))]
+    print_report(results, args.top)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.json}")
+
+    if args.budget_ms is not None:
+        over = [r for r in results if r["import_median_ms"] > args.budget_ms]
+        for r in over:
+            print(f"❌ {r['target']}: import {r['import_median_ms']}ms > 예산 {args.budget_ms}ms")
+        return 1 if over else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+MCP 도구 오프라인 벤치마크
+fake_services.py의 가짜 OpenAI/Supabase/YouTube/RSS/자막 서버에 mcp_server 도구를 연결해서
+네트워크·API 키 없이 같은 조건으로 반복 측정합니다. 서비스별 지연 시간과 오류율을 주입할 수 있습니다.
+자막은 cooking_transcript.txt를 타임라인 항목으로 바꾼 것과, 그것을 --long-factor배로 늘린 긴 자막을 사용합니다.
+
+측정 항목 (도구별):
+- 처리량: 수집 영상/청크 수 per second
+- 지연 시간: p50/p95/p99 (ms)
+- 외부 API 호출 수: 가짜 서버가 받은 서비스/경로별 요청 수
+- 최대 메모리: 도구 실행 중 RSS 최댓값 - 시작 시 RSS (MB, 같은 프로세스의 가짜 서버 포함). --tracemalloc이면 파이썬 할당 peak도 측정
+  (tracemalloc은 할당마다 추적해서 파이썬 코드가 몇 배 느려지므로 지연 시간 비교와는 따로 실행)
+
+사용 예:
+    python benchmark_tools.py
+    python benchmark_tools.py --latency openai=80,supabase=15,youtube=40 --jitter 10 --error-rate openai=0.05
+    python benchmark_tools.py --videos 20 --long-videos 3 --long-factor 50 --queries 300 --json results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from fake_services import SERVICES, FakeCorpus, FakeServices, ServiceProfile, transcript_entries_from_text
+
+BASE_TRANSCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cooking_transcript.txt")
+
+
+def parse_service_values(value: str, cast=float) -> dict:
+    """"openai=50,youtube=20" 또는 "30"(모든 서비스) 형식"""
+    if not value:
+        return {}
+    if "=" not in value:
+        return {service: cast(value) for service in SERVICES}
+    result = {}
+    for item in value.split(","):
+        service, _, number = item.partition("=")
+        if service.strip() not in SERVICES:
+            raise SystemExit(f"알 수 없는 서비스: {service} ({', '.join(SERVICES)} 중 하나)")
+        result[service.strip()] = cast(number)
+    return result
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def count_delta(before: dict, after: dict) -> dict:
+    delta = {}
+    for service, routes in after.items():
+        for route, count in routes.items():
+            diff = count - before.get(service, {}).get(route, 0)
+            if diff:
+                delta[f"{service}:{route}"] = diff
+    return delta
+
+
+def current_rss() -> int:
+    """현재 프로세스 RSS (바이트). /proc이 없으면 지금까지의 최대 RSS"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class PeakRss:
+    """백그라운드 스레드로 RSS를 주기적으로 읽어 구간 최댓값을 기록"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+    @property
+    def peak_mb(self) -> float:
+        return round((self.peak_rss - self.start_rss) / 1024 / 1024, 2)
+
+
+class Runner:
+    """도구 호출을 측정하고 결과를 모음"""
+
+    def __init__(self, services: FakeServices, trace_memory: bool = False, verbose: bool = False):
+        self.services = services
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.results = []
+
+    def run(self, name: str, calls: list, units: dict = None) -> list:
+        """calls: 인자 없는 함수 목록. 호출마다 지연 시간을 재고 전체 구간의 API 호출 수/최대 메모리를 기록"""
+        before = self.services.snapshot_counts()
+        rows_before = len(self.services.rows)
+        samples = []
+        outputs = []
+        if self.trace_memory:
+            tracemalloc.start()
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        started = time.perf_counter()
+        with output, PeakRss() as rss:
+            for call in calls:
+                t0 = time.perf_counter()
+                outputs.append(call())
+                samples.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        traced_peak = None
+        if self.trace_memory:
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+
+        result = {
+            "tool": name,
+            "calls": len(calls),
+            "seconds": round(elapsed, 3),
+            **percentiles(samples),
+            "api_calls": count_delta(before, self.services.snapshot_counts()),
+            "rows_written": len(self.services.rows) - rows_before,
+            "peak_rss_mb": rss.peak_mb,
+            "traced_peak_mb": traced_peak,
+        }
+        for unit, count in (units or {}).items():
+            result[f"{unit}_per_s"] = round(count / elapsed, 2) if elapsed else None
+        if result["rows_written"]:
+            result["chunks_per_s"] = round(result["rows_written"] / elapsed, 2) if elapsed else None
+        self.results.append(result)
+        print(f"  ✅ {name}: {len(calls)}회, {elapsed:.2f}s")
+        return outputs
+
+
+def run_scenarios(server, runner: Runner, corpus: FakeCorpus, args, queries: list):
+    channel_ids = list(corpus.channels)
+    first_channel = corpus.channels[channel_ids[0]]["video_ids"]
+
+    # 1. 단일 영상 수집 (첫 채널의 앞쪽 영상: 긴 자막 포함). 수집 도구는 작업만 등록하므로 작업 핸들러를 직접 호출
+    single_ids = first_channel[:args.videos]
+    runner.run("save_single_video_embedding", [
+        (lambda vid=vid: server.ingest_video(corpus.video_url(vid))) for vid in single_ids
+    ], units={"videos": len(single_ids)})
+
+    # 2. 채널 수집 (나머지 채널, 첫 동기화) → 변화 없는 재동기화
+    for channel_id in channel_ids[1:]:
+        runner.run("save_channel_youtube_embeddings", [
+            lambda channel_id=channel_id: server.ingest_channel(channel_id, max_results=args.videos)
+        ], units={"videos": args.videos})
+        runner.run("save_channel_youtube_embeddings (no change)", [
+            lambda channel_id=channel_id: server.ingest_channel(channel_id, max_results=args.videos)
+        ])
+
+    # 작업 큐: 등록은 바로 반환되고, 수집은 작업 워커가 실행 (여기서는 현재 스레드에서 대기 작업을 모두 실행)
+    job_ids = first_channel[args.videos:args.videos * 2]
+    runner.run("save_single_video_embedding (job submit)", [
+        (lambda vid=vid: server.save_single_video_embedding(corpus.video_url(vid))) for vid in job_ids
+    ])
+    runner.run("ingest jobs (drain)", [server.get_job_runner().drain], units={"videos": len(job_ids)})
+
+    # 3. 유사도 검색: 처음 보는 검색어(임베딩 + RPC)와 반복 검색어(결과 캐시)
+    runner.run("search_similar_youtube_video (cold)", [
+        (lambda q=q: server.search_similar_youtube_video(q, top_k=5)) for q in queries
+    ], units={"queries": len(queries)})
+    repeated = [random.Random(args.seed).choice(queries) for _ in range(len(queries))]
+    runner.run("search_similar_youtube_video (repeat)", [
+        (lambda q=q: server.search_similar_youtube_video(q, top_k=5)) for q in repeated
+    ], units={"queries": len(repeated)})
+    # 키워드(BM25, 임베딩 없음) / 하이브리드(키워드 + 벡터 RRF). 첫 호출에서 키워드 인덱스를 동기화하므로 미리 한 번 호출
+    server.search_similar_youtube_video("워밍업", top_k=5, mode="keyword")
+    runner.run("search_similar_youtube_video (keyword)", [
+        (lambda q=q: server.search_similar_youtube_video(q, top_k=5, mode="keyword")) for q in queries
+    ], units={"queries": len(queries)})
+    runner.run("search_similar_youtube_video (hybrid)", [
+        (lambda q=q: server.search_similar_youtube_video(q, top_k=5, mode="hybrid")) for q in queries
+    ], units={"queries": len(queries)})
+    # 일괄 검색: 처음 보는 검색어 전체를 한 호출로 (임베딩 한 요청)
+    batch_queries = [query + " batch" for query in queries]
+    runner.run("search_similar_youtube_video_batch", [
+        lambda: server.search_similar_youtube_video_batch(batch_queries, top_k=5)
+    ], units={"queries": len(batch_queries)})
+
+    # 4. YouTube 검색 / 채널 정보
+    runner.run("search_youtube_videos", [
+        (lambda q=q: server.search_youtube_videos(q)) for q in ["요리", "가짜", "채널", "김치찌개"] * 5
+    ])
+    runner.run("get_channel_info", [
+        (lambda vid=vid: server.get_channel_info(corpus.video_url(vid), max_videos=5)) for vid in single_ids
+    ])
+
+    # 5. 시맨틱 청킹 (긴 자막 전체 텍스트)
+    long_text = "\n".join(entry["text"] for entry in corpus.transcripts[first_channel[0]])
+    runner.run("semantic_chunk_transcript", [
+        lambda: server.semantic_chunk_transcript(long_text, window=args.window)
+    ])
+
+
+def print_report(results: list):
+    print(f"\n📊 도구별 결과")
+    print(f"{'tool':<46} {'calls':>5} {'sec':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'thru/s':>8} {'rssMB':>7} {'heapMB':>7}")
+    for r in results:
+        throughput = next((f"{v}" for k, v in r.items() if k.endswith("_per_s") and k != "chunks_per_s"), "")
+        print(f"{r['tool']:<46} {r['calls']:>5} {r['seconds']:>7} {r.get('p50_ms', ''):>8} {r.get('p95_ms', ''):>8} "
+              f"{r.get('p99_ms', ''):>8} {throughput:>8} {r['peak_rss_mb']:>7} "
+              f"{r['traced_peak_mb'] if r['traced_peak_mb'] is not None else '-':>7}")
+    print(f"\n📡 도구별 외부 API 호출 수")
+    for r in results:
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(r["api_calls"].items())) or "(없음)"
+        extra = f" | 저장 청크 {r['rows_written']}개 ({r.get('chunks_per_s')}/s)" if r["rows_written"] else ""
+        print(f"  {r['tool']}: {calls}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 도구 오프라인 벤치마크 (가짜 외부 서비스)")
+    parser.add_argument("--channels", type=int, default=2, help="가짜 채널 수 (첫 채널은 단일 영상 수집, 나머지는 채널 수집)")
+    parser.add_argument("--videos", type=int, default=5, help="단일/채널 수집할 영상 수")
+    parser.add_argument("--videos-per-channel", type=int, default=30)
+    parser.add_argument("--long-videos", type=int, default=2, help="채널마다 긴 자막을 가진 영상 수")
+    parser.add_argument("--long-factor", type=int, default=20, help="긴 자막 길이 (기본 자막의 배수)")
+    parser.add_argument("--missing-every", type=int, default=0, help="N번째 영상마다 자막 없음 (0이면 모두 있음)")
+    parser.add_argument("--queries", type=int, default=100, help="유사도 검색 횟수")
+    parser.add_argument("--window", type=int, default=None, help="시맨틱 청킹 이웃 비교 창 크기")
+    parser.add_argument("--latency", default="", help="서비스별 지연 ms (예: openai=50,supabase=10 또는 모두 20)")
+    parser.add_argument("--jitter", default="", help="서비스별 지연 편차 ms")
+    parser.add_argument("--error-rate", default="", help="서비스별 오류 주입 확률 (예: openai=0.05)")
+    parser.add_argument("--error-status", default="", help="서비스별 오류 상태 코드 (기본 503, 예: openai=429)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="파이썬 할당 peak(heapMB)도 측정 (지연 시간이 크게 늘어나므로 메모리 측정 전용)")
+    parser.add_argument("--verbose", action="store_true", help="도구 로그 출력 (LOG_LEVEL=INFO)")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency = parse_service_values(args.latency)
+    jitter = parse_service_values(args.jitter)
+    error_rate = parse_service_values(args.error_rate)
+    error_status = parse_service_values(args.error_status, cast=int)
+    profiles = {
+        service: ServiceProfile(latency_ms=latency.get(service, 0.0), jitter_ms=jitter.get(service, 0.0),
+                                error_rate=error_rate.get(service, 0.0), error_status=error_status.get(service, 503))
+        for service in SERVICES
+    }
+
+    with open(BASE_TRANSCRIPT_PATH, "r", encoding="utf-8") as f:
+        base_entries = transcript_entries_from_text(f.read())
+    corpus = FakeCorpus(base_entries, channels=max(1, args.channels), videos_per_channel=args.videos_per_channel,
+                        long_videos=args.long_videos, long_factor=args.long_factor, missing_every=args.missing_every)
+    services = FakeServices(corpus, profiles, seed=args.seed).start()
+
+    # 로컬 캐시/상태 파일은 임시 디렉터리에 두어 매 실행이 같은 조건에서 시작
+    workdir = tempfile.mkdtemp(prefix="mcp_bench_")
+    os.environ.update(services.env())
+    os.environ.update({
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "YOUTUBE_API_CACHE_PATH": os.path.join(workdir, "youtube_api.sqlite3"),
+        "TRANSCRIPT_STORE_PATH": os.path.join(workdir, "transcripts.sqlite3"),
+        "CHANNEL_SYNC_PATH": os.path.join(workdir, "channel_sync.sqlite3"),
+        "INGEST_JOBS_PATH": os.path.join(workdir, "ingest_jobs.sqlite3"),
+        "VECTOR_INDEX_PATH": os.path.join(workdir, "vector_index"),
+        "KEYWORD_INDEX_PATH": os.path.join(workdir, "keyword_index.json"),
+        "SEARCH_CACHE_MARKER_PATH": os.path.join(workdir, "search_cache.invalidated"),
+    })
+    os.environ.setdefault("LOG_LEVEL", "INFO" if args.verbose else "WARNING")
+    # load_dotenv는 이미 설정된 환경 변수를 덮어쓰지 않으므로 .env가 있어도 가짜 서버로 연결됨
+    import mcp_server as server
+
+    queries = [entry["text"] for entry in base_entries if len(entry["text"]) >= 10]
+    queries = [random.Random(args.seed + i).choice(queries) + f" {i}" for i in range(args.queries)]
+
+    print(f"🧪 가짜 서비스: {services.base_url} (작업 디렉터리 {workdir})")
+    print(f"   채널 {len(corpus.channels)}개, 영상 {len(corpus.videos)}개, 기본 자막 {len(base_entries)}개 항목")
+    try:
+        runner = Runner(services, trace_memory=args.tracemalloc, verbose=args.verbose)
+        run_scenarios(server, runner, corpus, args, queries)
+    finally:
+        services.stop()
+
+    print_report(runner.results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": runner.results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.json}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+채널별 증분 동기화 상태 (high-water mark)
+- 채널마다 마지막으로 본 게시 시각과 최근 video_id를 SQLite에 저장
+- 새 영상 탐색은 쿼터가 들지 않는 RSS 피드(최근 15개)를 먼저 보고, 변화가 없으면 요청 한 번으로 끝남
+- search 페이징(호출당 100 단위)은 첫 동기화나 RSS 범위를 넘는 공백이 생겼을 때만 사용
+- 채널의 게시 주기를 기록해서 자주 올리는 채널부터 다음 동기화 시각을 정함
+"""
+
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+from http_client import http_get
+from metrics import get_logger
+
+logger = get_logger("channel_sync")
+
+YOUTUBE_RSS_URL = os.getenv("YOUTUBE_RSS_URL", "https://www.youtube.com/feeds/videos.xml")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CHANNEL_SYNC_PATH = os.getenv("CHANNEL_SYNC_PATH", os.path.join(CACHE_DIR, "channel_sync.sqlite3"))
+CHANNEL_SYNC_MIN_INTERVAL = float(os.getenv("CHANNEL_SYNC_MIN_INTERVAL", str(60 * 60)))
+CHANNEL_SYNC_MAX_INTERVAL = float(os.getenv("CHANNEL_SYNC_MAX_INTERVAL", str(7 * 24 * 60 * 60)))
+SEEN_IDS_LIMIT = 200
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+YT_NS = "{http://www.youtube.com/xml/schemas/2015}"
+
+
+def parse_published(value: str) -> str:
+    """RSS/Data API의 게시 시각을 비교 가능한 UTC ISO 문자열로 통일"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def published_before(value: str) -> str:
+    """parse_published 형식 게시 시각의 1초 전 (high-water mark를 그 영상 직전까지만 올릴 때)"""
+    parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ") - timedelta(seconds=1)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def fetch_channel_feed(channel_id: str, limit: int = None) -> list:
+    """채널 RSS 피드의 최신 항목(최신순)을 반환. limit개를 읽으면 나머지는 받지 않음. 실패하면 None"""
+    rss_url = f"{YOUTUBE_RSS_URL}?channel_id={channel_id}"
+    response = http_get(rss_url, stream=True)
+    with response:
+        if response.status_code != 200:
+            logger.warning(f"RSS 피드 응답 오류: {channel_id} ({response.status_code})")
+            return None
+
+        parser = ET.XMLPullParser(events=("end",))
+        entries = []
+        for data in response.iter_content(chunk_size=8192):
+            parser.feed(data)
+            for _, element in parser.read_events():
+                if element.tag != f"{ATOM_NS}entry":
+                    continue
+                link = element.find(f"{ATOM_NS}link").attrib["href"]
+                video_id = element.findtext(f"{YT_NS}videoId") or (link.split("v=")[1] if "v=" in link else None)
+                entries.append({
+                    "video_id": video_id,
+                    "title": element.findtext(f"{ATOM_NS}title"),
+                    "url": link,
+                    "published": element.findtext(f"{ATOM_NS}published"),
+                })
+                element.clear()
+                if limit is not None and len(entries) >= limit:
+                    return entries
+    return entries
+
+
+def publish_interval(published_times: list) -> float:
+    """게시 시각 목록에서 게시 간격 중앙값(초). 계산할 수 없으면 None"""
+    times = sorted(datetime.fromisoformat(t.replace("Z", "+00:00")).timestamp() for t in published_times if t)
+    gaps = [b - a for a, b in zip(times, times[1:]) if b > a]
+    return statistics.median(gaps) if gaps else None
+
+
+class ChannelSyncStore:
+    """채널별 동기화 상태 저장소 (SQLite, 스레드/프로세스 공유)"""
+
+    def __init__(self, path: str = CHANNEL_SYNC_PATH):
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS channels (
+                channel_id TEXT PRIMARY KEY,
+                last_published TEXT,
+                seen_ids TEXT NOT NULL,
+                publish_interval REAL,
+                last_synced_at REAL NOT NULL,
+                next_sync_at REAL NOT NULL,
+                videos_saved INTEGER NOT NULL DEFAULT 0,
+                syncs INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, channel_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT channel_id, last_published, seen_ids, publish_interval, last_synced_at, next_sync_at, "
+                "videos_saved, syncs FROM channels WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "channel_id": row[0],
+            "last_published": row[1],
+            "seen_ids": json.loads(row[2]),
+            "publish_interval": row[3],
+            "last_synced_at": row[4],
+            "next_sync_at": row[5],
+            "videos_saved": row[6],
+            "syncs": row[7],
+        }
+
+    def update(self, channel_id: str, last_published: str, seen_ids: list, interval: float = None,
+               saved: int = 0, due_now: bool = False):
+        """동기화 결과 기록. 다음 동기화 시각은 게시 간격의 절반 (최소/최대 간격으로 제한)"""
+        previous = self.get(channel_id)
+        if interval is None and previous:
+            interval = previous["publish_interval"]
+        now = time.time()
+        delay = CHANNEL_SYNC_MAX_INTERVAL if interval is None else interval / 2
+        delay = min(max(delay, CHANNEL_SYNC_MIN_INTERVAL), CHANNEL_SYNC_MAX_INTERVAL)
+        # 이번에 max_results에 걸려 남은 새 영상이 있으면 다음 일괄 동기화에서 바로 처리
+        next_sync_at = now if due_now else now + delay
+        merged_ids = list(dict.fromkeys(seen_ids + (previous["seen_ids"] if previous else [])))[:SEEN_IDS_LIMIT]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO channels (channel_id, last_published, seen_ids, publish_interval, "
+                "last_synced_at, next_sync_at, videos_saved, syncs) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (channel_id, last_published, json.dumps(merged_ids), interval, now, next_sync_at,
+                 (previous["videos_saved"] if previous else 0) + saved,
+                 (previous["syncs"] if previous else 0) + 1)
+            )
+            self._conn.commit()
+
+    def due_channels(self, now: float = None) -> list:
+        """다음 동기화 시각이 지난 채널 (오래 기다린 순)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id, last_published, seen_ids, publish_interval, last_synced_at, next_sync_at, "
+                "videos_saved, syncs FROM channels WHERE next_sync_at <= ? ORDER BY next_sync_at", (now,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def tracked_channels(self) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id, last_published, seen_ids, publish_interval, last_synced_at, next_sync_at, "
+                "videos_saved, syncs FROM channels ORDER BY next_sync_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_channel_sync_store() -> ChannelSyncStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChannelSyncStore()
+    return _store
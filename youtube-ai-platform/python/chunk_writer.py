@@ -0,0 +1,121 @@
+"""
+Supabase youtube_videos 청크 행 버퍼링 다건 저장기
+청크마다 insert 하던 것을 batch_size 단위의 다건 insert/upsert 한 번으로 묶습니다.
+배치가 실패하면 반으로 나눠 다시 보내서 실제로 실패한 행만 골라냅니다.
+호출은 rate_limit 제어기를 거치고, 속도 제한 응답이면 나누지 않고 같은 배치를 다시 보냅니다.
+"""
+
+import os
+import time
+
+from metrics import get_logger, inc, observe
+from rate_limit import RATE_LIMIT_MAX_RETRIES, get_rate_limiter, throttle_info
+
+logger = get_logger("chunk_writer")
+
+CHUNK_WRITE_BATCH_SIZE = int(os.getenv("CHUNK_WRITE_BATCH_SIZE", "100"))
+# 1이면 청크 시작/끝 시각도 start_seconds/end_seconds 컬럼에 저장 (컬럼을 추가한 DB에서만 켬. 기본은 url의 &t=만 사용)
+CHUNK_TIME_COLUMNS = os.getenv("CHUNK_TIME_COLUMNS", "0") == "1"
+TIME_FIELDS = ("start_seconds", "end_seconds")
+
+# 행이 저장될 때 호출할 콜백 목록: callback(table, saved_rows) (검색 캐시 무효화 등)
+_write_listeners = []
+
+
+# 저장된 행 자체가 필요한 콜백 목록: callback(table, rows) (로컬 키워드 인덱스 갱신 등)
+_row_listeners = []
+
+
+def add_write_listener(callback):
+    _write_listeners.append(callback)
+
+
+def add_row_listener(callback):
+    _row_listeners.append(callback)
+
+
+class ChunkWriter:
+    """청크 행을 모아서 저장하고, 행 단위 실패 내역을 보관"""
+
+    def __init__(self, client, table: str = "youtube_videos", batch_size: int = CHUNK_WRITE_BATCH_SIZE,
+                 upsert: bool = False, on_conflict: str = "video_id,chunk_index", on_rows=None):
+        self.client = client
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.upsert = upsert
+        self.on_conflict = on_conflict
+        self.on_rows = on_rows  # 이 저장기로 저장된 행 콜백: on_rows(rows) (수집 체크포인트 기록 등)
+        self.buffer = []
+        self.saved = 0
+        self.failed = []  # (row, error) 목록
+
+    def add(self, row: dict) -> int:
+        """행을 버퍼에 추가. 버퍼가 차면 자동으로 flush 하고 저장된 행 수를 반환"""
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """버퍼의 행을 모두 저장하고 이번 flush에서 저장된 행 수를 반환"""
+        saved = 0
+        while self.buffer:
+            rows = self.buffer[:self.batch_size]
+            self.buffer = self.buffer[self.batch_size:]
+            saved += self._write(rows)
+        self.saved += saved
+        if saved:
+            for callback in _write_listeners:
+                try:
+                    callback(self.table, saved)
+                except Exception as e:
+                    logger.warning(f"⚠️ 저장 후 콜백 실패: {str(e)}")
+        return saved
+
+    def _write(self, rows: list, attempt: int = 0) -> int:
+        endpoint = f"{self.table}.{'upsert' if self.upsert else 'insert'}"
+        inc("external_calls_total", service="supabase", endpoint=endpoint)
+        started = time.perf_counter()
+        try:
+            with get_rate_limiter("supabase", endpoint).slot():
+                started = time.perf_counter()
+                query = self.client.table(self.table)
+                if self.upsert:
+                    response = query.upsert(rows, on_conflict=self.on_conflict).execute()
+                else:
+                    response = query.insert(rows).execute()
+        except Exception as e:
+            inc("external_errors_total", service="supabase", endpoint=endpoint)
+            if throttle_info(e)[0] and attempt < RATE_LIMIT_MAX_RETRIES:
+                # 제어기가 제한 구간 동안 기다리게 하므로 같은 배치를 바로 다시 보냄
+                inc("retries_total", service="supabase", endpoint=endpoint)
+                return self._write(rows, attempt + 1)
+            if len(rows) == 1:
+                row = rows[0]
+                logger.error(f"❌ {row.get('video_id')} - DB 저장 실패 (청크 {row.get('chunk_index')}): {str(e)}")
+                self.failed.append((row, str(e)))
+                return 0
+            # 배치를 나눠서 실패한 행만 골라냄
+            mid = len(rows) // 2
+            return self._write(rows[:mid]) + self._write(rows[mid:])
+        observe("external_call_seconds", time.perf_counter() - started, service="supabase", endpoint=endpoint)
+        inc("rows_written_total", len(rows), table=self.table)
+        # 콜백 오류를 저장 실패로 보고 같은 행을 다시 보내지 않도록 try 밖에서 알림
+        self._notify_rows(getattr(response, "data", None) or rows)
+        return len(rows)
+
+    def _notify_rows(self, rows: list):
+        if self.on_rows is not None:
+            self.on_rows(rows)
+        for callback in _row_listeners:
+            try:
+                callback(self.table, rows)
+            except Exception as e:
+                logger.warning(f"⚠️ 저장 행 콜백 실패: {str(e)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
@@ -0,0 +1,153 @@
+"""
+자막 청킹 헬퍼
+토큰 예산 청킹은 자막 타임라인 항목(text/start/duration)을 자르지 않고 max_tokens까지 묶어서
+청크마다 시작/끝 시각을 보존합니다 (검색 결과에서 해당 시점으로 바로 이동).
+시맨틱 청킹은 n×n 유사도 행렬을 만들지 않고 NumPy 벡터 연산으로 군집을 나눕니다.
+- 전체 모드: 기준 문장 하나와 나머지 문장의 유사도를 한 번에 계산 (메모리 O(n))
+- 윈도우 모드: 앞뒤 window개 이웃 문장만 비교하는 띠(band) 유사도 (메모리 O(n·w))
+"""
+
+import os
+import re
+import numpy as np
+
+from embeddings import count_tokens
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "800"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+
+def split_sentences(transcript: str, pattern: str = r'[.!?]+', min_length: int = 10) -> list:
+    """문장 부호 기준으로 나누고 min_length자 미만 문장은 버림"""
+    sentences = re.split(pattern, transcript)
+    return [s.strip() for s in sentences if len(s.strip()) >= min_length]
+
+
+def _split_long_segment(text: str, start: float, end: float, max_tokens: int) -> list:
+    """예산보다 긴 자막 항목 하나를 단어 단위로 나누고 시각은 글자 수 비율로 나눔"""
+    pieces = []
+    current = []
+    for word in text.split(" "):
+        candidate = " ".join(current + [word])
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(" ".join(current))
+            current = [word]
+        else:
+            current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+
+    segments = []
+    total_chars = sum(len(piece) for piece in pieces) or 1
+    offset = start
+    for piece in pieces:
+        piece_end = offset + (end - start) * len(piece) / total_chars
+        segments.append((piece, offset, piece_end, count_tokens(piece)))
+        offset = piece_end
+    return segments
+
+
+def _make_chunk(segments: list) -> dict:
+    return {
+        "text": " ".join(segment[0] for segment in segments),
+        "start": round(segments[0][1], 2),
+        "end": round(segments[-1][2], 2),
+        "tokens": sum(segment[3] for segment in segments),
+    }
+
+
+def _iter_segments(entries, max_tokens: int):
+    for entry in entries:
+        text = " ".join(entry["text"].split())
+        if not text:
+            continue
+        start = float(entry["start"])
+        end = start + float(entry.get("duration", 0.0))
+        tokens = count_tokens(text)
+        if tokens > max_tokens:
+            yield from _split_long_segment(text, start, end, max_tokens)
+        else:
+            yield (text, start, end, tokens)
+
+
+def iter_timed_chunks(entries, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """chunk_timed_entries의 제너레이터 버전. 청크가 완성될 때마다 하나씩 반환하므로
+    긴 자막도 청크 목록 전체를 만들지 않고 앞쪽 청크부터 임베딩/저장할 수 있음 (entries는 이터러블이면 됨)"""
+    current = []
+    current_tokens = 0
+    for segment in _iter_segments(entries, max_tokens):
+        if current and current_tokens + segment[3] > max_tokens:
+            yield _make_chunk(current)
+            carry = []
+            carry_tokens = 0
+            for previous in reversed(current):
+                if carry_tokens + previous[3] > overlap_tokens or carry_tokens + previous[3] + segment[3] > max_tokens:
+                    break
+                carry.insert(0, previous)
+                carry_tokens += previous[3]
+            current = carry
+            current_tokens = carry_tokens
+        current.append(segment)
+        current_tokens += segment[3]
+    if current:
+        yield _make_chunk(current)
+
+
+def chunk_timed_entries(entries: list, max_tokens: int = CHUNK_MAX_TOKENS,
+                        overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """자막 타임라인 항목을 토큰 예산 청크로 묶음.
+    항목 단위로 채우다가 다음 항목이 max_tokens를 넘기면 새 청크를 시작하고, overlap_tokens를 주면
+    직전 청크 끝의 항목들을 그 토큰 수 이내로 다음 청크 앞에 다시 넣습니다.
+    반환: [{"text", "start", "end", "tokens"}, ...] (start/end는 초)"""
+    return list(iter_timed_chunks(entries, max_tokens, overlap_tokens))
+
+
+def _normalize(embeddings) -> np.ndarray:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def semantic_clusters(embeddings, similarity_threshold: float = 0.7, window: int = None) -> list:
+    """문장 임베딩을 유사도 기준으로 군집화하여 군집별 문장 인덱스 리스트를 반환.
+    앞에서부터 아직 배정되지 않은 문장을 기준으로 삼고, 기준 문장과의 코사인 유사도가
+    임계값 이상인 뒤쪽 미배정 문장을 같은 군집에 넣습니다. window를 주면 기준 문장 뒤
+    window개 문장만 비교합니다."""
+    vectors = _normalize(embeddings)
+    n = len(vectors)
+    used = np.zeros(n, dtype=bool)
+    clusters = []
+
+    band = None
+    if window is not None and n > 1:
+        window = max(1, int(window))
+        # band[i, k-1] = 문장 i와 문장 i+k의 유사도 (범위 밖은 -inf)
+        band = np.full((n, window), -np.inf, dtype=np.float32)
+        for k in range(1, min(window, n - 1) + 1):
+            band[:n - k, k - 1] = np.einsum("ij,ij->i", vectors[:-k], vectors[k:])
+
+    for i in range(n):
+        if used[i]:
+            continue
+        used[i] = True
+
+        if band is not None:
+            end = min(n, i + 1 + window)
+            sims = band[i, :end - i - 1]
+        else:
+            end = n
+            sims = vectors[i + 1:] @ vectors[i]
+
+        members = np.flatnonzero((sims >= similarity_threshold) & ~used[i + 1:end]) + i + 1
+        used[members] = True
+        clusters.append([i] + members.tolist())
+
+    return clusters
+
+
+def cluster_embedding(embeddings, indices: list) -> list:
+    """군집에 속한 모든 문장 임베딩의 평균(정규화)을 청크 임베딩으로 사용"""
+    mean = _normalize(np.asarray(embeddings, dtype=np.float32)[indices]).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
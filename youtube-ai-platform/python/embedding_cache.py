@@ -0,0 +1,205 @@
+"""
+내용 기반(content-addressed) 임베딩 디스크 캐시
+(model, 정규화된 텍스트 해시)를 키로 벡터를 SQLite에 저장하고,
+항목 수/용량 한도를 넘으면 가장 오래 사용하지 않은 항목부터 제거(LRU)합니다.
+EMBEDDING_CACHE_DTYPE=float16|int8이면 벡터를 양자화해서 저장합니다 (기본 float32).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from quantization import check_dtype, encode_vector, decode_vector
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0"
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+# 항목 수/용량은 저장할 때마다 누적해서 계산하고, 이 횟수만큼 저장할 때마다 전체를 다시 셈
+# (같은 캐시 파일에 다른 프로세스가 쓴 항목 반영)
+RECOUNT_EVERY_WRITES = 100
+
+
+def normalize_text(text: str) -> str:
+    """유니코드 정규화(NFC) + 공백 정리. 표기만 다른 동일 텍스트가 같은 키를 갖도록 함"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite 기반 LRU 임베딩 캐시 (스레드 안전)"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 max_bytes: int = int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+                 dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.path = path
+        self.dtype = check_dtype(dtype)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "dtype" not in columns:
+            # 양자화 도입 전 캐시 파일은 모두 float32
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float32'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._recount_locked()
+
+    def get_many(self, model: str, texts: list) -> list:
+        """texts 순서대로 캐시된 임베딩(list[float]) 또는 None을 반환"""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, dtype FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob, dtype in rows:
+                    found[key] = (blob, dtype)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = []
+            for key in keys:
+                entry = found.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(decode_vector(*entry))
+        return results
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """임베딩을 저장 (None인 벡터는 무시)한 뒤 한도를 넘으면 LRU 제거"""
+        now = time.time()
+        rows = [
+            (cache_key(model, text), model, len(vector), encode_vector(vector, self.dtype), self.dtype, now)
+            for text, vector in zip(texts, vectors) if vector is not None
+        ]
+        if not rows:
+            return
+        rows = list({row[0]: row for row in rows}.values())
+        with self._lock:
+            # 덮어쓰는 키는 기존 크기를 빼서 누적 합계를 맞춤 (키 기본 인덱스 조회라 저장하는 행 수에만 비례)
+            replaced = 0
+            replaced_bytes = 0
+            for i in range(0, len(rows), 500):
+                part = [row[0] for row in rows[i:i + 500]]
+                count, size = self._conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchone()
+                replaced += count
+                replaced_bytes += size
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, dtype, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._entries += len(rows) - replaced
+            self._bytes += sum(len(row[3]) for row in rows) - replaced_bytes
+            self._writes += 1
+            self._evict_locked()
+            self._conn.commit()
+
+    def _recount_locked(self):
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        self._writes = 0
+
+    def _evict_locked(self):
+        # 누적 합계가 한도를 넘었을 때와 RECOUNT_EVERY_WRITES번마다만 전체를 다시 셈
+        if self._writes >= RECOUNT_EVERY_WRITES or self._entries > self.max_entries or self._bytes > self.max_bytes:
+            self._recount_locked()
+        if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        excess_entries = max(0, self._entries - self.max_entries)
+        excess_bytes = max(0, self._bytes - self.max_bytes)
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC"
+        ):
+            if len(victims) >= excess_entries and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+        self._entries -= len(victims)
+        self._bytes -= freed
+
+    def stats(self) -> dict:
+        # 쓰기/제거 때 갱신하는 카운터를 그대로 사용 (조회마다 테이블 전체를 훑지 않음)
+        with self._lock:
+            count, total_bytes = self._entries, self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total_bytes,
+            "dtype": self.dtype,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._recount_locked()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """프로세스 공용 캐시 인스턴스 (비활성화 시 None)"""
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
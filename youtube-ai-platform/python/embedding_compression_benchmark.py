@@ -0,0 +1,127 @@
+"""
+임베딩 차원 축소/양자화 recall@k 벤치마크
+저장된 youtube_videos 임베딩(전체 정밀도 float32)의 정확 top-k 검색 결과를 기준으로,
+차원(dimensions) x 저장 형식(float32/float16/int8) 조합마다 recall@k, 벡터당 바이트, 검색 시간을 측정합니다.
+text-embedding-3 계열은 앞쪽 차원만 잘라 정규화한 벡터가 dimensions 파라미터 결과와 같으므로 재임베딩 없이 비교합니다.
+
+사용 예:
+    python embedding_compression_benchmark.py --k 10 --queries 200
+    python embedding_compression_benchmark.py --source index --dims 1536,512,256 --dtypes float32,int8
+    python embedding_compression_benchmark.py --query-file queries.txt   # 실제 검색어로 측정 (한 줄에 하나)
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from quantization import VECTOR_DTYPES, bytes_per_vector, normalize_rows, quantize, quantized_scores, truncate_dimensions
+from vector_index import VectorIndex, VECTOR_INDEX_PATH
+
+
+def load_corpus(source: str) -> np.ndarray:
+    """전체 정밀도 임베딩 행렬 (n, d)"""
+    if source == "index":
+        index = VectorIndex.load(VECTOR_INDEX_PATH, backend="numpy", dtype="float32")
+        if not len(index):
+            raise SystemExit(f"로컬 벡터 인덱스가 없습니다: {VECTOR_INDEX_PATH}.npy")
+    else:
+        from supabase import create_client
+        client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        index = VectorIndex(backend="numpy", dtype="float32")
+        index.sync(client)
+    return index.vectors()
+
+
+def load_queries(corpus: np.ndarray, query_file: str, count: int, seed: int) -> tuple:
+    """(쿼리 행렬, 제외할 코퍼스 행 번호). 파일이 없으면 코퍼스에서 표본 추출 (자기 자신은 정답에서 제외)"""
+    if query_file:
+        from embeddings import embed_texts
+        with open(query_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:count]
+        # 기준이 되는 전체 차원으로 임베딩
+        vectors = [v for v in embed_texts(texts, dimensions=None) if v is not None]
+        return truncate_dimensions(normalize_rows(np.asarray(vectors, dtype=np.float32)), corpus.shape[1]), None
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(corpus), size=min(count, len(corpus)), replace=False)
+    return corpus[rows], rows
+
+
+def top_k(scores: np.ndarray, k: int, exclude: int = None) -> set:
+    if exclude is not None:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    k = min(k, len(scores) - (1 if exclude is not None else 0))
+    return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+
+def run_benchmark(corpus: np.ndarray, queries: np.ndarray, exclude_rows, k: int, dims_list: list, dtypes: list) -> list:
+    full_dims = corpus.shape[1]
+    truth = [
+        top_k(corpus @ query, k, None if exclude_rows is None else exclude_rows[i])
+        for i, query in enumerate(queries)
+    ]
+
+    results = []
+    for dims in dims_list:
+        if dims > full_dims:
+            continue
+        reduced_corpus = truncate_dimensions(corpus, dims)
+        reduced_queries = truncate_dimensions(queries, dims)
+        for dtype in dtypes:
+            codes, scales = quantize(reduced_corpus, dtype)
+            hits = 0
+            started = time.perf_counter()
+            for i, query in enumerate(reduced_queries):
+                found = top_k(quantized_scores(codes, scales, query), k,
+                              None if exclude_rows is None else exclude_rows[i])
+                hits += len(found & truth[i])
+            elapsed = time.perf_counter() - started
+            results.append({
+                "dims": dims,
+                "dtype": dtype,
+                "bytes_per_vector": bytes_per_vector(dims, dtype),
+                "index_mb": round(codes.nbytes / 1024 / 1024 + (scales.nbytes / 1024 / 1024 if scales is not None else 0), 2),
+                "recall": round(hits / (len(queries) * k), 4),
+                "query_ms": round(elapsed / len(queries) * 1000, 3),
+            })
+    return results
+
+
+def print_results(results: list, k: int, corpus_size: int, query_count: int):
+    print(f"\n📊 recall@{k} (코퍼스 {corpus_size}개, 쿼리 {query_count}개, 기준: 전체 차원 float32 정확 검색)")
+    print(f"{'dims':>6} {'dtype':>8} {'bytes/vec':>10} {'index MB':>9} {f'recall@{k}':>10} {'query ms':>9}")
+    for r in results:
+        print(f"{r['dims']:>6} {r['dtype']:>8} {r['bytes_per_vector']:>10} {r['index_mb']:>9} "
+              f"{r['recall']:>10.4f} {r['query_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 차원 축소/양자화 recall@k 벤치마크")
+    parser.add_argument("--source", choices=["supabase", "index"], default="supabase",
+                        help="코퍼스 임베딩 출처 (Supabase 전체 조회 또는 로컬 벡터 인덱스 파일)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    parser.add_argument("--query-file", help="검색어 파일 (없으면 코퍼스 벡터를 쿼리로 사용)")
+    parser.add_argument("--dims", default="1536,1024,768,512,256", help="비교할 차원 목록")
+    parser.add_argument("--dtypes", default=",".join(VECTOR_DTYPES), help="비교할 저장 형식 목록")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.source)
+    queries, exclude_rows = load_queries(corpus, args.query_file, args.queries, args.seed)
+    if not len(queries):
+        raise SystemExit("쿼리가 없습니다")
+
+    dims_list = sorted({int(d) for d in args.dims.split(",")} | {corpus.shape[1]}, reverse=True)
+    dtypes = [d.strip() for d in args.dtypes.split(",")]
+    results = run_benchmark(corpus, queries, exclude_rows, args.k, dims_list, dtypes)
+    print_results(results, args.k, len(corpus), len(queries))
+
+
+if __name__ == "__main__":
+    main()
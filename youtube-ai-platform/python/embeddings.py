@@ -0,0 +1,289 @@
+"""
+OpenAI 임베딩 배치 호출 헬퍼
+청크를 하나씩 보내는 대신 요청당 입력 수/토큰 한도 안에서 묶어서 보냅니다.
+모든 호출은 embedding_cache를 먼저 확인하고, 캐시에 없는 텍스트만 API로 보냅니다.
+aembed_texts/aembed_text는 FastMCP 비동기 도구용으로 AsyncOpenAI를 쓰고 배치들을 동시에 보냅니다.
+요청은 rate_limit 제어기(openai.embeddings)를 거치고, 429는 SDK 내부 재시도 대신 제어기가 보고 처리합니다.
+openai 패키지와 tiktoken 인코딩은 import가 무거우므로 처음 쓸 때 불러옵니다.
+"""
+
+import asyncio
+import os
+import time
+from embedding_cache import get_embedding_cache, normalize_text
+from metrics import get_logger, inc, observe
+from rate_limit import RATE_LIMIT_MAX_RETRIES, get_rate_limiter, throttle_info
+from tool_executor import run_blocking
+
+logger = get_logger("embeddings")
+
+_encoding = False  # 아직 불러오지 않음 (None이면 tiktoken 없음)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# text-embedding-3 계열의 출력 차원 축소 (dimensions 파라미터). 비우면 모델 기본값(1536)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# OpenAI embeddings API 요청 한도
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300000
+MAX_TOKENS_PER_INPUT = 8191
+
+# 일시적 오류(5xx, 네트워크) 재시도 설정 (429는 RATE_LIMIT_MAX_RETRIES번까지 제어기 대기 후 재시도)
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
+_limiter = get_rate_limiter("openai", "embeddings")
+
+
+def estimate_tokens(text: str) -> int:
+    """tiktoken 없이 토큰 수를 보수적으로 추정 (ASCII 약 4자당 1토큰, 한글 등 비ASCII는 1자당 최대 2토큰)"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars) * 2 + 1
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is False:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")  # text-embedding-3-* 토크나이저
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """청크 크기 계산용 토큰 수 (tiktoken이 있으면 정확히 세고, 없으면 estimate_tokens로 추정)"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def iter_batches(texts: list, max_inputs: int = MAX_INPUTS_PER_REQUEST,
+                 max_tokens: int = MAX_TOKENS_PER_REQUEST):
+    """텍스트 인덱스를 요청 한도에 맞는 배치(인덱스 리스트)로 나눠서 반환"""
+    batch = []
+    batch_tokens = 0
+    for idx, text in enumerate(texts):
+        if not text or not text.strip():
+            # 빈 입력은 API가 거부하므로 건너뜀 (결과는 None)
+            continue
+        tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(idx)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _prepare(texts: list, model: str, use_cache: bool, dimensions: int) -> tuple:
+    """캐시 조회 후 (cache, cache_model, results, pending) 반환. pending: 정규화 텍스트 → 결과 위치 목록"""
+    cache = get_embedding_cache() if use_cache else None
+    # 차원이 다른 벡터가 섞이지 않도록 캐시 키에 차원 포함
+    cache_model = f"{model}@{dimensions}" if dimensions else model
+    results = cache.get_many(cache_model, texts) if cache else [None] * len(texts)
+
+    # 캐시 미스만 API로 보냄 (같은 텍스트가 여러 번 있으면 한 번만 임베딩)
+    pending = {}
+    for idx, text in enumerate(texts):
+        if results[idx] is None:
+            pending.setdefault(normalize_text(text), []).append(idx)
+    if cache:
+        inc("cache_hits_total", len(texts) - sum(len(idxs) for idxs in pending.values()), cache="embedding")
+        inc("cache_misses_total", sum(len(idxs) for idxs in pending.values()), cache="embedding")
+    return cache, cache_model, results, pending
+
+
+def _merge(results: list, pending: dict, unique_texts: list, unique_results: list) -> list:
+    for text, embedding in zip(unique_texts, unique_results):
+        for idx in pending[text]:
+            results[idx] = embedding
+    return results
+
+
+def embed_texts(texts: list, model: str = EMBEDDING_MODEL, use_cache: bool = True,
+                dimensions: int = EMBEDDING_DIMENSIONS) -> list:
+    """텍스트 리스트를 배치로 임베딩하여 입력 순서대로 임베딩 리스트를 반환 (실패한 항목은 None)"""
+    cache, cache_model, results, pending = _prepare(texts, model, use_cache, dimensions)
+    if not pending:
+        return results
+
+    unique_texts = list(pending.keys())
+    unique_results = [None] * len(unique_texts)
+    for batch in iter_batches(unique_texts):
+        _embed_batch_into(unique_results, unique_texts, batch, model, dimensions)
+
+    if cache:
+        cache.put_many(cache_model, unique_texts, unique_results)
+    return _merge(results, pending, unique_texts, unique_results)
+
+
+async def aembed_texts(texts: list, model: str = EMBEDDING_MODEL, use_cache: bool = True,
+                       dimensions: int = EMBEDDING_DIMENSIONS) -> list:
+    """embed_texts의 비동기 버전. 배치 요청을 AsyncOpenAI로 동시에 보내고(asyncio.gather),
+    SQLite 캐시 조회/저장은 크기 제한 스레드 풀에서 실행"""
+    cache, cache_model, results, pending = await run_blocking(_prepare, texts, model, use_cache, dimensions)
+    if not pending:
+        return results
+
+    unique_texts = list(pending.keys())
+    unique_results = [None] * len(unique_texts)
+    await asyncio.gather(*(
+        _aembed_batch_into(unique_results, unique_texts, batch, model, dimensions)
+        for batch in iter_batches(unique_texts)
+    ))
+
+    if cache:
+        await run_blocking(cache.put_many, cache_model, unique_texts, unique_results)
+    return _merge(results, pending, unique_texts, unique_results)
+
+
+async def aembed_text(text: str, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS) -> list:
+    """단일 텍스트 비동기 임베딩. 실패 시 RuntimeError"""
+    embedding = (await aembed_texts([text], model=model, dimensions=dimensions))[0]
+    if embedding is None:
+        raise RuntimeError("임베딩 생성에 실패했습니다")
+    return embedding
+
+
+def embed_text(text: str, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS) -> list:
+    """단일 텍스트 임베딩. 실패 시 RuntimeError"""
+    embedding = embed_texts([text], model=model, dimensions=dimensions)[0]
+    if embedding is None:
+        raise RuntimeError("임베딩 생성에 실패했습니다")
+    return embedding
+
+
+def _error_classes() -> tuple:
+    """(일시적 오류, 치명적 오류, 입력 오류) 예외 클래스. 키/권한 문제는 나눠서 다시 보내도 해결되지 않고,
+    입력 오류(400/422)만 배치 안의 특정 항목 때문일 수 있음"""
+    import openai
+    return ((openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError),
+            (openai.AuthenticationError, openai.PermissionDeniedError),
+            (openai.BadRequestError, openai.UnprocessableEntityError))
+
+
+def _apply_response(results: list, texts: list, indices: list, model: str, response):
+    usage = getattr(response, "usage", None)
+    tokens = getattr(usage, "total_tokens", None) or sum(estimate_tokens(texts[i]) for i in indices)
+    inc("tokens_embedded_total", tokens, model=model)
+    inc("texts_embedded_total", len(indices), model=model)
+
+    # 응답 순서가 아닌 index 필드로 원래 위치에 매핑
+    for item in response.data:
+        results[indices[item.index]] = item.embedding
+
+
+def _failure_action(error: Exception, indices: list, attempt: int) -> str:
+    """실패한 배치 처리 방법: "give_up", "throttled"(제어기 대기 후 배치 전체), "retry"(backoff 후 배치 전체),
+    "split"(반으로 나눠 재시도, 입력 오류일 때만)"""
+    inc("external_errors_total", service="openai", endpoint="embeddings")
+    transient_errors, fatal_errors, input_errors = _error_classes()
+    if isinstance(error, fatal_errors):
+        logger.error(f"❌ 임베딩 인증 오류 ({len(indices)}개 항목 실패): {str(error)}")
+        return "give_up"
+    if throttle_info(error)[0] and attempt < RATE_LIMIT_MAX_RETRIES:
+        inc("retries_total", service="openai", endpoint="embeddings")
+        return "throttled"
+    if isinstance(error, transient_errors) and attempt < MAX_RETRIES:
+        inc("retries_total", service="openai", endpoint="embeddings")
+        logger.warning(f"⏳ 임베딩 일시 오류, {RETRY_BACKOFF_SECONDS * (2 ** attempt):.1f}초 후 재시도 "
+                       f"({attempt + 1}/{MAX_RETRIES}): {str(error)}")
+        return "retry"
+    if not isinstance(error, input_errors):
+        # 재시도를 다 쓴 일시 오류/제한이나 알 수 없는 오류: 나눠 보내면 요청만 늘어나므로 배치 전체 실패
+        logger.error(f"❌ 임베딩 실패 ({len(indices)}개 항목, 재시도 {attempt}회): {str(error)}")
+        return "give_up"
+    if len(indices) == 1:
+        logger.error(f"❌ 임베딩 실패 (항목 {indices[0]}): {str(error)}")
+        return "give_up"
+    return "split"
+
+
+def _request_params(texts: list, indices: list, model: str, dimensions: int) -> dict:
+    params = {"input": [texts[i] for i in indices], "model": model}
+    if dimensions:
+        params["dimensions"] = dimensions
+    return params
+
+
+def _embed_batch_into(results: list, texts: list, indices: list, model: str, dimensions: int = None,
+                      attempt: int = 0):
+    """indices에 해당하는 텍스트를 한 번에 임베딩하여 results에 채움.
+    일시적 오류는 배치 전체를 재시도하고, 입력 오류(400/422)는 배치를 반으로 나눠 실패한 항목만 다시 시도"""
+    inc("external_calls_total", service="openai", endpoint="embeddings")
+    started = time.perf_counter()
+    try:
+        with _limiter.slot():
+            started = time.perf_counter()
+            response = get_client().embeddings.create(**_request_params(texts, indices, model, dimensions))
+    except Exception as e:
+        observe("external_call_seconds", time.perf_counter() - started, service="openai", endpoint="embeddings")
+        action = _failure_action(e, indices, attempt)
+        if action == "throttled":
+            _embed_batch_into(results, texts, indices, model, dimensions, attempt + 1)
+        elif action == "retry":
+            time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+            _embed_batch_into(results, texts, indices, model, dimensions, attempt + 1)
+        elif action == "split":
+            mid = len(indices) // 2
+            _embed_batch_into(results, texts, indices[:mid], model, dimensions)
+            _embed_batch_into(results, texts, indices[mid:], model, dimensions)
+        return
+    observe("external_call_seconds", time.perf_counter() - started, service="openai", endpoint="embeddings")
+    _apply_response(results, texts, indices, model, response)
+
+
+_client = None
+_async_client = None
+
+
+def get_client():
+    """OpenAI 클라이언트 (OPENAI_API_KEY/OPENAI_BASE_URL 환경 변수 사용, 처음 쓸 때 생성).
+    429를 제어기가 보도록 SDK 자체 재시도는 끔 (재시도는 _embed_batch_into에서)"""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """비동기 OpenAI 클라이언트 (get_client와 같은 설정)"""
+    global _async_client
+    if _async_client is None:
+        import openai
+        _async_client = openai.AsyncOpenAI(max_retries=0)
+    return _async_client
+
+
+async def _aembed_batch_into(results: list, texts: list, indices: list, model: str, dimensions: int = None,
+                             attempt: int = 0):
+    """_embed_batch_into의 비동기 버전 (나눈 배치도 동시에 재시도)"""
+    inc("external_calls_total", service="openai", endpoint="embeddings")
+    started = time.perf_counter()
+    try:
+        async with _limiter.aslot():
+            started = time.perf_counter()
+            response = await get_async_client().embeddings.create(**_request_params(texts, indices, model, dimensions))
+    except Exception as e:
+        observe("external_call_seconds", time.perf_counter() - started, service="openai", endpoint="embeddings")
+        action = _failure_action(e, indices, attempt)
+        if action == "throttled":
+            await _aembed_batch_into(results, texts, indices, model, dimensions, attempt + 1)
+        elif action == "retry":
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+            await _aembed_batch_into(results, texts, indices, model, dimensions, attempt + 1)
+        elif action == "split":
+            mid = len(indices) // 2
+            await asyncio.gather(
+                _aembed_batch_into(results, texts, indices[:mid], model, dimensions),
+                _aembed_batch_into(results, texts, indices[mid:], model, dimensions),
+            )
+        return
+    observe("external_call_seconds", time.perf_counter() - started, service="openai", endpoint="embeddings")
+    _apply_response(results, texts, indices, model, response)
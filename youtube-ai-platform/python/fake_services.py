@@ -0,0 +1,420 @@
+"""
+오프라인 벤치마크용 가짜 외부 서비스 (HTTP 서버 하나에 경로별로 구현)
+- openai:     POST /v1/embeddings            결정적 임베딩 (글자 bigram feature hashing → 비슷한 텍스트는 비슷한 벡터)
+- supabase:   /rest/v1/youtube_videos        PostgREST select(eq/in/gt, order, limit)/insert/upsert 메모리 테이블
+              POST /rest/v1/rpc/match_youtube_video  코사인 유사도 top-k
+- youtube:    GET /youtube/v3/{search,videos,channels}  고정된 채널/영상 목록 (ETag/304 지원)
+- rss:        GET /feeds/videos.xml          채널별 최신 15개 Atom 피드
+- transcript: GET /transcripts/{video_id}    자막 타임라인 항목 (자막 없는 영상은 404)
+서비스마다 지연 시간(latency_ms ± jitter_ms)과 오류 주입(error_rate 확률로 error_status 응답)을 설정할 수 있고,
+서비스/경로별 호출 수를 집계합니다. 사용법은 benchmark_tools.py 참고.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+SERVICES = ("openai", "supabase", "youtube", "rss", "transcript")
+FAKE_EMBEDDING_DIMENSIONS = 1536
+RSS_FEED_SIZE = 15
+SEARCH_PAGE_SIZE = 50
+MATCH_COUNT = 10
+
+
+@dataclass
+class ServiceProfile:
+    """가짜 서비스 응답 특성"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+def fake_embedding(text: str, dimensions: int = FAKE_EMBEDDING_DIMENSIONS) -> list:
+    """글자 bigram을 차원에 해싱한 정규화 벡터 (같은 텍스트 → 같은 벡터, 겹치는 표현이 많을수록 유사)"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    codes = np.frombuffer(" ".join(text.split()).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) >= 2:
+        hashes = ((codes[:-1] * np.uint64(1000003)) ^ codes[1:]) * np.uint64(2654435761) % np.uint64(2 ** 32)
+        signs = np.where((hashes >> np.uint64(16)) & np.uint64(1), 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, (hashes % np.uint64(dimensions)).astype(np.int64), signs)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def transcript_entries_from_text(text: str, seconds_per_char: float = 0.12) -> list:
+    """줄 단위 텍스트를 자막 타임라인 항목으로 변환 (글자 수에 비례한 길이)"""
+    entries = []
+    start = 0.0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        duration = round(max(1.0, len(line) * seconds_per_char), 2)
+        entries.append({"text": line, "start": round(start, 2), "duration": duration})
+        start += duration
+    return entries
+
+
+def synthetic_long_entries(base_entries: list, factor: int, seed: int = 0) -> list:
+    """기본 자막을 factor배로 늘린 긴 자막 (문장 순서를 섞고 번호를 붙여 중복 텍스트를 피함)"""
+    rng = random.Random(seed)
+    entries = []
+    start = 0.0
+    for round_no in range(factor):
+        shuffled = list(base_entries)
+        rng.shuffle(shuffled)
+        for entry in shuffled:
+            entries.append({"text": f"{entry['text']} ({round_no + 1})", "start": round(start, 2),
+                            "duration": entry["duration"]})
+            start += entry["duration"]
+    return entries
+
+
+class FakeCorpus:
+    """가짜 YouTube 채널/영상/자막 데이터"""
+
+    def __init__(self, base_entries: list, channels: int = 2, videos_per_channel: int = 30,
+                 long_videos: int = 0, long_factor: int = 20, missing_every: int = 0):
+        self.channels = {}
+        self.videos = {}
+        self.transcripts = {}
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        for c in range(channels):
+            channel_id = f"UCfake{c:018d}"
+            video_ids = []
+            for v in range(videos_per_channel):
+                video_id = f"v{c:02d}{v:08d}"
+                published = now - timedelta(days=v, hours=c)
+                self.videos[video_id] = {
+                    "channel_id": channel_id,
+                    "title": f"가짜 요리 영상 {c}-{v}",
+                    "published": published.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                }
+                if missing_every and v % missing_every == missing_every - 1:
+                    pass  # 자막 없는 영상
+                elif v < long_videos:
+                    self.transcripts[video_id] = synthetic_long_entries(base_entries, long_factor, seed=c * 1000 + v)
+                else:
+                    self.transcripts[video_id] = synthetic_long_entries(base_entries, 1, seed=c * 1000 + v)
+                video_ids.append(video_id)
+            self.channels[channel_id] = {"title": f"가짜 채널 {c}", "video_ids": video_ids}
+
+    def video_url(self, video_id: str) -> str:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class FakeServices:
+    """가짜 서비스 HTTP 서버. start() 후 env()의 환경 변수로 앱을 가짜 서버에 연결"""
+
+    def __init__(self, corpus: FakeCorpus, profiles: dict = None, seed: int = 0):
+        self.corpus = corpus
+        self.profiles = {name: ServiceProfile() for name in SERVICES}
+        self.profiles.update(profiles or {})
+        self.counts = {}
+        self.rows = []
+        self._next_id = 1
+        self._matrix = None
+        self._matrix_rows = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = None
+
+    # ---- 서버 수명 ----
+
+    def start(self):
+        handler = type("FakeHandler", (_FakeHandler,), {"services": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def env(self) -> dict:
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "sk-fake",
+            "SUPABASE_URL": self.base_url,
+            "SUPABASE_KEY": "fake-" + "x" * 40,
+            "YOUTUBE_API_KEY": "fake",
+            "YOUTUBE_API_URL": f"{self.base_url}/youtube/v3",
+            "YOUTUBE_RSS_URL": f"{self.base_url}/feeds/videos.xml",
+            "TRANSCRIPT_SOURCE_URL": f"{self.base_url}/transcripts",
+        }
+
+    # ---- 집계 ----
+
+    def count(self, service: str, route: str):
+        with self._lock:
+            routes = self.counts.setdefault(service, {})
+            routes[route] = routes.get(route, 0) + 1
+
+    def snapshot_counts(self) -> dict:
+        with self._lock:
+            return {service: dict(routes) for service, routes in self.counts.items()}
+
+    def inject(self, service: str):
+        """지연 시간 적용 후 오류를 낼 차례면 상태 코드를 반환"""
+        profile = self.profiles[service]
+        delay = profile.latency_ms + (self._random.uniform(-1, 1) * profile.jitter_ms if profile.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if profile.error_rate and self._random.random() < profile.error_rate:
+            return profile.error_status
+        return None
+
+    # ---- supabase 메모리 테이블 ----
+
+    def insert_rows(self, rows: list, on_conflict: str = None) -> list:
+        with self._lock:
+            keys = on_conflict.split(",") if on_conflict else None
+            saved = []
+            for row in rows:
+                row = dict(row)
+                if keys:
+                    existing = next((r for r in self.rows if all(r.get(k) == row.get(k) for k in keys)), None)
+                    if existing is not None:
+                        existing.update(row)
+                        self._matrix = None
+                        saved.append(existing)
+                        continue
+                row["id"] = self._next_id
+                self._next_id += 1
+                self.rows.append(row)
+                saved.append(row)
+            return saved
+
+    def match(self, vector: list, count: int = MATCH_COUNT) -> list:
+        with self._lock:
+            rows = [row for row in self.rows if row.get("embedding")]
+            if not rows:
+                return []
+            if self._matrix is None or self._matrix_rows != len(rows):
+                matrix = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                self._matrix = matrix / norms
+                self._matrix_rows = len(rows)
+            query = np.asarray(vector, dtype=np.float32)
+            query /= (np.linalg.norm(query) or 1.0)
+            scores = self._matrix @ query
+            top = np.argsort(-scores)[:count]
+            return [dict({k: v for k, v in rows[i].items() if k != "embedding"}, score=float(scores[i])) for i in top]
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    services = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body=None, content_type: str = "application/json", headers: dict = None):
+        if body is None:
+            data = b""
+        elif isinstance(body, (bytes, bytearray)):
+            data = bytes(body)
+        else:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null") if length else None
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.startswith("/v1/"):
+            return "openai", path[len("/v1/"):], parsed
+        if path.startswith("/rest/v1/"):
+            return "supabase", path[len("/rest/v1/"):], parsed
+        if path.startswith("/youtube/v3/"):
+            return "youtube", path[len("/youtube/v3/"):], parsed
+        if path.startswith("/feeds/"):
+            return "rss", "videos.xml", parsed
+        if path.startswith("/transcripts/"):
+            return "transcript", "transcripts", parsed
+        return None, path, parsed
+
+    def _handle(self):
+        service, route, parsed = self._route()
+        if service is None:
+            return self._send(404, {"error": "unknown route"})
+        body = self._read_json() if self.command in ("POST", "PATCH") else None
+        self.services.count(service, route.split("/")[0] if service != "supabase" else route)
+        status = self.services.inject(service)
+        if status:
+            headers = {"Retry-After": "0"} if status == 429 else None
+            return self._send(status, {"error": {"message": "injected error", "code": status}}, headers=headers)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        handler = getattr(self, f"_{service}")
+        return handler(route, query, body, parsed)
+
+    do_GET = do_POST = do_PATCH = _handle
+
+    # ---- openai ----
+
+    def _openai(self, route, query, body, parsed):
+        if route != "embeddings":
+            return self._send(404, {"error": {"message": f"unknown route {route}"}})
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or FAKE_EMBEDDING_DIMENSIONS
+        data = [{"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                for i, text in enumerate(inputs)]
+        tokens = sum(len(text) for text in inputs)
+        return self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    # ---- supabase (PostgREST) ----
+
+    def _supabase(self, route, query, body, parsed):
+        if route.startswith("rpc/"):
+            if route != "rpc/match_youtube_video":
+                return self._send(404, {"message": f"unknown function {route}"})
+            vector = body.get("input_vector")
+            if isinstance(vector, str):
+                vector = json.loads(vector)
+            return self._send(200, self.services.match(vector))
+
+        if route != "youtube_videos":
+            return self._send(404, {"message": f"unknown table {route}"})
+        if self.command == "POST":
+            rows = body if isinstance(body, list) else [body]
+            saved = self.services.insert_rows(rows, query.get("on_conflict"))
+            return self._send(201, [self._present(row, None) for row in saved])
+
+        rows = list(self.services.rows)
+        for column, condition in query.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            op, _, value = condition.partition(".")
+            if op == "eq":
+                rows = [row for row in rows if str(row.get(column)) == value]
+            elif op == "in":
+                wanted = {v.strip('"') for v in value.strip("()").split(",")}
+                rows = [row for row in rows if str(row.get(column)) in wanted]
+            elif op == "gt":
+                rows = [row for row in rows if row.get(column) is not None and row.get(column) > float(value)]
+        if "order" in query:
+            column, _, direction = query["order"].partition(".")
+            rows.sort(key=lambda row: row.get(column) or 0, reverse=direction.startswith("desc"))
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+        rows = rows[offset:offset + limit if limit is not None else None]
+        columns = None if query.get("select", "*") == "*" else query["select"].split(",")
+        return self._send(200, [self._present(row, columns) for row in rows])
+
+    @staticmethod
+    def _present(row: dict, columns: list) -> dict:
+        # pgvector 컬럼은 PostgREST가 "[...]" 문자열로 돌려줌
+        out = {k: v for k, v in row.items() if columns is None or k in columns}
+        if isinstance(out.get("embedding"), list):
+            out["embedding"] = json.dumps(out["embedding"])
+        return out
+
+    # ---- youtube data api ----
+
+    def _youtube(self, route, query, body, parsed):
+        corpus = self.services.corpus
+        if route == "search":
+            if "channelId" in query:
+                video_ids = corpus.channels.get(query["channelId"], {}).get("video_ids", [])
+            else:
+                words = query.get("q", "").split()
+                video_ids = [vid for vid, video in corpus.videos.items()
+                             if not words or any(word in video["title"] for word in words)] or list(corpus.videos)
+            start = int(query.get("pageToken") or 0)
+            size = min(int(query.get("maxResults", 5)), SEARCH_PAGE_SIZE)
+            page = video_ids[start:start + size]
+            result = {"items": [{"id": {"kind": "youtube#video", "videoId": vid},
+                                 "snippet": {"publishedAt": corpus.videos[vid]["published"]}} for vid in page]}
+            if start + size < len(video_ids):
+                result["nextPageToken"] = str(start + size)
+        elif route == "videos":
+            items = []
+            for vid in query.get("id", "").split(","):
+                video = corpus.videos.get(vid)
+                if not video:
+                    continue
+                items.append({
+                    "id": vid,
+                    "snippet": {
+                        "title": video["title"], "publishedAt": video["published"],
+                        "channelId": video["channel_id"],
+                        "channelTitle": corpus.channels[video["channel_id"]]["title"],
+                        "thumbnails": {"default": {"url": f"https://img.youtube.com/vi/{vid}/default.jpg"},
+                                       "medium": {"url": f"https://img.youtube.com/vi/{vid}/mqdefault.jpg"}},
+                    },
+                    "statistics": {"viewCount": "1000", "likeCount": "10"},
+                })
+            result = {"items": items}
+        elif route == "channels":
+            channel = corpus.channels.get(query.get("id"))
+            result = {"items": [{
+                "id": query.get("id"),
+                "snippet": {"title": channel["title"], "thumbnails": {"default": {"url": "https://yt3.ggpht.com/fake"}}},
+                "statistics": {"subscriberCount": "100", "viewCount": "10000",
+                               "videoCount": str(len(channel["video_ids"]))},
+            }]} if channel else {"items": []}
+        else:
+            return self._send(404, {"error": {"message": f"unknown resource {route}"}})
+
+        etag = '"' + hashlib.md5(json.dumps(result, sort_keys=True).encode()).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag})
+        result["etag"] = etag
+        return self._send(200, result, headers={"ETag": etag})
+
+    # ---- rss ----
+
+    def _rss(self, route, query, body, parsed):
+        corpus = self.services.corpus
+        channel = corpus.channels.get(query.get("channel_id"))
+        if not channel:
+            return self._send(404, b"", content_type="text/html")
+        entries = []
+        for vid in channel["video_ids"][:RSS_FEED_SIZE]:
+            video = corpus.videos[vid]
+            entries.append(
+                f"<entry><id>yt:video:{vid}</id><yt:videoId>{vid}</yt:videoId>"
+                f"<yt:channelId>{video['channel_id']}</yt:channelId><title>{video['title']}</title>"
+                f'<link rel="alternate" href="{corpus.video_url(vid)}"/>'
+                f"<published>{video['published']}</published><updated>{video['published']}</updated></entry>"
+            )
+        feed = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+                f"<title>{channel['title']}</title>{''.join(entries)}</feed>")
+        return self._send(200, feed.encode("utf-8"), content_type="application/atom+xml; charset=UTF-8")
+
+    # ---- transcript ----
+
+    def _transcript(self, route, query, body, parsed):
+        video_id = parsed.path.rsplit("/", 1)[-1]
+        entries = self.services.corpus.transcripts.get(video_id)
+        if entries is None:
+            return self._send(404, {"error": "no transcript"})
+        return self._send(200, {"language": "ko", "entries": entries})
@@ -5,16 +5,12 @@
 """
 
 import time
-import random
-from mcp_server import (
-    FOOD_CATEGORIES, 
-    search_food_videos_by_category, 
-    save_food_category_videos,
-    search_similar_youtube_video
-)
+from mcp_server import search_similar_youtube_video_batch
 
 def collect_food_data():
     """음식 카테고리별 데이터를 수집합니다."""
+    # 카테고리 수집 도구는 mcp_server에 있을 때만 쓸 수 있으므로 검색 테스트와 따로 import
+    from mcp_server import FOOD_CATEGORIES, save_food_category_videos
     
     print("🍳 음식 카테고리별 데이터 수집을 시작합니다...")
     print("=" * 50)
@@ -29,11 +25,9 @@ def collect_food_data():
             
             try:
                 result = save_food_category_videos(category_key, difficulty)
+                # API 호출 간격은 rate_limit 제어기가 조절 (429 응답이면 알아서 늦춤)
                 print(f"  ✅ {difficulty}: {result}")
                 
-                # API 호출 제한을 피하기 위한 대기
-                time.sleep(random.uniform(2, 5))
-                
             except Exception as e:
                 print(f"  ❌ {difficulty} 처리 실패: {str(e)}")
                 continue
@@ -78,32 +72,34 @@ def test_search_queries():
     print("🔍 검색 테스트를 시작합니다...")
     print("=" * 50)
     
-    for i, query in enumerate(test_queries, 1):
+    # 모든 검색어를 한 번에 검색 (임베딩 한 요청 + 일괄 점수 계산)
+    started = time.perf_counter()
+    try:
+        results = search_similar_youtube_video_batch(test_queries)
+    except Exception as e:
+        print(f"❌ 테스트 실패: {str(e)}")
+        return
+    elapsed = time.perf_counter() - started
+    
+    for i, (query, result) in enumerate(zip(test_queries, results), 1):
         print(f"\n{i:2d}. 검색어: '{query}'")
         
-        try:
-            result = search_similar_youtube_video(query)
-            
-            if "error" in result:
-                print(f"    ❌ 검색 실패: {result['error']}")
-            else:
-                print(f"    ✅ 검색 성공!")
-                print(f"    📺 영상: {result.get('video_id', 'N/A')}")
-                print(f"    📝 청크: {result.get('chunk_index', 'N/A')}")
-                print(f"    🎯 점수: {result.get('score', 'N/A')}")
-                print(f"    📄 내용: {result.get('chunk_text', 'N/A')[:100]}...")
-            
-            # API 호출 제한을 피하기 위한 대기
-            time.sleep(random.uniform(1, 3))
-            
-        except Exception as e:
-            print(f"    ❌ 테스트 실패: {str(e)}")
+        if "error" in result:
+            print(f"    ❌ 검색 실패: {result['error']}")
+        else:
+            print(f"    ✅ 검색 성공!")
+            print(f"    📺 영상: {result.get('video_id', 'N/A')}")
+            print(f"    📝 청크: {result.get('chunk_index', 'N/A')}")
+            print(f"    🎯 점수: {result.get('score', 'N/A')}")
+            print(f"    📄 내용: {(result.get('chunk_text') or 'N/A')[:100]}...")
     
-    print("\n🎉 모든 검색 테스트 완료!")
+    print(f"\n🎉 모든 검색 테스트 완료! ({len(test_queries)}개 검색어, {elapsed:.2f}초)")
 
 def analyze_data_quality():
     """수집된 데이터의 품질을 분석합니다."""
     
+    from mcp_server import FOOD_CATEGORIES
+
     print("📊 데이터 품질 분석을 시작합니다...")
     print("=" * 50)
     
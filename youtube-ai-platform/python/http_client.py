@@ -0,0 +1,154 @@
+"""
+YouTube Data API / RSS 호출용 공용 HTTP 세션
+- 모듈 전역 requests.Session 하나로 keep-alive 커넥션 재사용 (요청마다 TLS 핸드셰이크 반복 방지)
+- connect/read 타임아웃 기본값
+- gzip 압축 응답 요청 (Google API는 User-Agent에 "gzip"이 있어야 압축해서 보냄)
+- 엔드포인트별 rate_limit 제어기를 거쳐서 호출 (토큰 버킷 + AIMD 동시 호출 한도)
+- 429/503, YouTube rate limit(403 rateLimitExceeded) 응답은 제어기에 알려 한도를 줄이고 Retry-After 동안 멈춘 뒤 재시도
+- 그 밖의 5xx와 연결 오류는 backoff 후 재시도
+- 엔드포인트별 호출 수/오류/재시도/지연 시간 카운터 (metrics 지표에도 서비스/엔드포인트 라벨로 기록)
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import get_logger, inc, observe
+from rate_limit import THROTTLE_STATUS_CODES, get_rate_limiter, parse_retry_after
+
+logger = get_logger("http")
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 403이지만 잠시 후 재시도하면 되는 YouTube 오류 사유 (quotaExceeded는 일일 한도라 재시도하지 않음)
+RETRY_403_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    # 재시도는 아래 http_get에서 응답 내용을 보고 직접 처리
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "User-Agent": "youtube-ai-platform/1.0 (gzip)",
+    })
+    return session
+
+
+session = _create_session()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def endpoint_name(url: str) -> str:
+    """지연 시간 집계용 엔드포인트 이름 (예: youtube.search, youtube.rss)"""
+    parsed = urlparse(url)
+    if parsed.netloc.endswith("googleapis.com") and "/youtube/" in parsed.path:
+        return f"youtube.{parsed.path.rstrip('/').rsplit('/', 1)[-1]}"
+    if parsed.path.startswith("/feeds/videos.xml"):
+        return "youtube.rss"
+    return parsed.netloc or url
+
+
+def _service(endpoint: str) -> str:
+    return "youtube" if endpoint.startswith("youtube.") else endpoint
+
+
+def _record(endpoint: str, elapsed: float, error: bool = False, retried: bool = False):
+    service = _service(endpoint)
+    inc("external_calls_total", service=service, endpoint=endpoint)
+    observe("external_call_seconds", elapsed, service=service, endpoint=endpoint)
+    if error:
+        inc("external_errors_total", service=service, endpoint=endpoint)
+    if retried:
+        inc("retries_total", service=service, endpoint=endpoint)
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {
+            "calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0,
+        })
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["retries"] += int(retried)
+        elapsed_ms = elapsed * 1000
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def get_http_stats() -> dict:
+    """엔드포인트별 호출 통계 (평균/최대 지연 ms 포함)"""
+    with _stats_lock:
+        return {
+            endpoint: dict(
+                stats,
+                total_ms=round(stats["total_ms"], 1),
+                max_ms=round(stats["max_ms"], 1),
+                avg_ms=round(stats["total_ms"] / stats["calls"], 1) if stats["calls"] else 0.0,
+            )
+            for endpoint, stats in _stats.items()
+        }
+
+
+def _is_rate_limited(response: requests.Response) -> bool:
+    """호출 속도를 줄여야 하는 응답 (429/503, YouTube 403 rateLimitExceeded)"""
+    if response.status_code in THROTTLE_STATUS_CODES:
+        return True
+    if response.status_code == 403:
+        try:
+            errors = response.json().get("error", {}).get("errors", [])
+        except ValueError:
+            return False
+        return any(err.get("reason") in RETRY_403_REASONS for err in errors)
+    return False
+
+
+def _retry_delay(attempt: int) -> float:
+    return HTTP_BACKOFF_SECONDS * (2 ** attempt)
+
+
+def http_get(url: str, params: dict = None, timeout=None, endpoint: str = None, **kwargs) -> requests.Response:
+    """공용 세션으로 GET. 일시적 오류는 재시도하고 마지막 응답을 반환 (연결 실패가 계속되면 예외).
+    제한 응답 후에는 제어기가 Retry-After 동안 이 엔드포인트의 호출을 멈추므로 따로 기다리지 않음"""
+    endpoint = endpoint or endpoint_name(url)
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    limiter = get_rate_limiter(_service(endpoint), endpoint)
+
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        started = time.perf_counter()
+        try:
+            with limiter.slot() as permit:
+                started = time.perf_counter()  # 제어기 대기 시간은 호출 지연에서 제외
+                response = session.get(url, params=params, timeout=timeout, **kwargs)
+                rate_limited = _is_rate_limited(response)
+                if rate_limited:
+                    permit.throttled(parse_retry_after(response.headers.get("Retry-After")))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(endpoint, time.perf_counter() - started, error=True, retried=not last_attempt)
+            if last_attempt:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning(f"⏳ {endpoint} 연결 오류, {delay:.1f}초 후 재시도: {str(e)}")
+            time.sleep(delay)
+            continue
+
+        retry = not last_attempt and (rate_limited or response.status_code in RETRY_STATUS_CODES)
+        _record(endpoint, time.perf_counter() - started, error=response.status_code >= 400, retried=retry)
+        if not retry:
+            return response
+        if rate_limited:
+            continue  # 대기는 다음 acquire에서 (제어기가 경고 로그를 남김)
+        delay = _retry_delay(attempt)
+        logger.warning(f"⏳ {endpoint} 응답 {response.status_code}, {delay:.1f}초 후 재시도")
+        time.sleep(delay)
@@ -5,7 +5,8 @@ import requests
 from io import BytesIO
 import openai
 from dotenv import load_dotenv
-import time
+from embeddings import embed_text
+from rate_limit import rate_limited
 
 load_dotenv()
 
@@ -41,8 +42,9 @@ def test_image_embedding(image_path_or_url):
         
         print("OpenAI Vision API 호출 중...")
         
-        # OpenAI Vision API로 이미지 분석 (타임아웃 설정)
-        response = openai.chat.completions.create(
+        # OpenAI Vision API로 이미지 분석 (타임아웃 설정, 호출 간격은 속도 제어기가 조절)
+        response = rate_limited(
+            "openai", "chat.completions", openai.chat.completions.create,
             model="gpt-4o",
             messages=[
                 {
@@ -68,18 +70,10 @@ def test_image_embedding(image_path_or_url):
         description = response.choices[0].message.content
         print(f"이미지 분석 결과: {description}")
         
-        # 잠시 대기 (API 호출 간격 조절)
-        time.sleep(1)
-        
         print("텍스트 임베딩 생성 중...")
         # 분석된 텍스트를 임베딩으로 변환
-        embedding_response = openai.embeddings.create(
-            input=description,
-            model="text-embedding-3-small",
-            timeout=30
-        )
+        embedding = embed_text(description)
         
-        embedding = embedding_response.data[0].embedding
         print(f"임베딩 벡터 크기: {len(embedding)}")
         print(f"임베딩 벡터 (처음 5개): {embedding[:5]}")
         
@@ -0,0 +1,487 @@
+"""
+수집 작업 큐 (SQLite, 프로세스가 재시작돼도 이어서 실행)
+채널/영상 수집 요청은 작업으로 저장하고 작업 ID를 바로 반환합니다. 수집은 워커 스레드가 백그라운드에서 실행합니다.
+- 상태: queued → running → done/failed. 같은 대상의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업을 반환
+- 실행 중인 작업은 heartbeat를 남기고, INGEST_JOB_LEASE초 넘게 끊긴 작업(프로세스 종료)은 다른 워커가 이어서 실행
+- 작업 체크포인트(채널 수집 계획 등)와 영상별 청크 체크포인트(저장한 청크 번호)를 기록
+  → 재시작하면 남은 청크만 임베딩/저장. 체크포인트가 남은 영상은 저장되지 않은 것으로 보고 다음 수집에서 마저 저장
+- 워커 풀의 여러 프로세스가 같은 DB를 써도 작업 하나는 워커 하나만 가져감 (BEGIN IMMEDIATE)
+"""
+
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import get_logger, inc, observe
+
+logger = get_logger("ingest_jobs")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", os.path.join(CACHE_DIR, "ingest_jobs.sqlite3"))
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_LEASE = float(os.getenv("INGEST_JOB_LEASE", "60"))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+INGEST_JOB_POLL_INTERVAL = float(os.getenv("INGEST_JOB_POLL_INTERVAL", "2"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+JOB_FIELDS = ("job_id", "kind", "target", "params", "status", "attempts", "owner", "created_at", "started_at",
+              "heartbeat_at", "finished_at", "progress", "checkpoint", "result", "error")
+JSON_FIELDS = ("params", "progress", "checkpoint", "result")
+
+
+class JobLostError(RuntimeError):
+    """lease가 끝나 다른 워커가 이어받았거나 이미 끝난 작업 (이 워커는 더 진행하지 않음)"""
+
+
+class JobStore:
+    """작업/체크포인트 저장소 (SQLite, 스레드/프로세스 공유)"""
+
+    def __init__(self, path: str = INGEST_JOBS_PATH, lease: float = INGEST_JOB_LEASE,
+                 max_attempts: int = INGEST_JOB_MAX_ATTEMPTS):
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 작업을 가져올 때 BEGIN IMMEDIATE로 쓰기 잠금을 잡으므로 트랜잭션은 직접 관리
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                checkpoint TEXT,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_target ON jobs (kind, target, status)")
+        # 저장을 시작했지만 끝내지 못한 영상 (행이 있으면 부분 저장 상태)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS video_checkpoints (
+                video_id TEXT PRIMARY KEY,
+                job_id TEXT,
+                chunks_total INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoint_chunks (
+                video_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                PRIMARY KEY (video_id, chunk_index)
+            )
+        """)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(zip(JOB_FIELDS, row))
+        for field in JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def _select(self, where: str, args: tuple = (), suffix: str = "") -> list:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE {where} {suffix}", args).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    # ---- 작업 ----
+
+    def submit(self, kind: str, target: str, params: dict) -> tuple:
+        """작업 추가. 같은 kind/target 작업이 대기/실행 중이면 그 작업을 반환. (작업, 새로 만들었는지)"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE kind = ? AND target = ? "
+                "AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1", (kind, target)
+            ).fetchone()
+            if row:
+                return self._to_dict(row), False
+            job_id = uuid.uuid4().hex[:16]
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, target, params, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, target, json.dumps(params, ensure_ascii=False), time.time())
+            )
+        inc("ingest_jobs_submitted_total", kind=kind)
+        return self.get(job_id), True
+
+    def claim(self, owner: str, kinds: list) -> dict:
+        """대기 중이거나 heartbeat가 끊긴 작업 하나를 가져옴 (없으면 None).
+        시도 횟수를 다 쓴 작업은 실패 처리 (매번 프로세스를 죽이는 작업이 계속 재시작되지 않도록)"""
+        if not kinds:
+            return None
+        placeholders = ", ".join("?" for _ in kinds)
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                row = conn.execute(
+                    f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE kind IN ({placeholders}) AND "
+                    "(status = 'queued' OR (status = 'running' AND heartbeat_at < ?)) ORDER BY created_at LIMIT 1",
+                    (*kinds, now - self.lease)
+                ).fetchone()
+                if row is None:
+                    return None
+                job = self._to_dict(row)
+                if job["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+                        (now, f"작업이 {job['attempts']}번 중단되어 재시도하지 않습니다", job["job_id"])
+                    )
+                    logger.error(f"❌ 작업 {job['job_id']} ({job['kind']} {job['target']}) - 재시도 횟수 초과")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1, "
+                    "started_at = COALESCE(started_at, ?), heartbeat_at = ? WHERE job_id = ?",
+                    (owner, now, now, job["job_id"])
+                )
+            if job["status"] == "running":
+                inc("ingest_jobs_resumed_total", kind=job["kind"])
+                logger.warning(f"🔁 중단된 작업 이어서 실행: {job['job_id']} ({job['kind']} {job['target']}, "
+                               f"이전 워커 {job['owner']})")
+            job.update(status="running", owner=owner, attempts=job["attempts"] + 1)
+            return job
+
+    def heartbeat(self, job_ids: list, owner: str):
+        if not job_ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND owner = ? AND status = 'running'",
+                [(time.time(), job_id, owner) for job_id in job_ids]
+            )
+
+    def update(self, job_id: str, owner: str, progress: dict = None, checkpoint: dict = None) -> bool:
+        """진행 상황/체크포인트 기록 (heartbeat도 갱신). owner가 실행 중인 작업이 아니면 False (기록하지 않음)"""
+        sets = ["heartbeat_at = ?"]
+        args = [time.time()]
+        if progress is not None:
+            sets.append("progress = ?")
+            args.append(json.dumps(progress, ensure_ascii=False))
+        if checkpoint is not None:
+            sets.append("checkpoint = ?")
+            args.append(json.dumps(checkpoint, ensure_ascii=False))
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {', '.join(sets)} WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (*args, job_id, owner)
+            )
+            return cursor.rowcount > 0
+
+    def finish(self, job_id: str, owner: str, status: str, result=None, error: str = None) -> bool:
+        """owner가 실행 중인 작업만 마침. lease가 끝나 다른 워커가 가져간 작업이면 False (기록하지 않음)"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? "
+                "WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (status, time.time(), None if result is None else json.dumps(result, ensure_ascii=False), error,
+                 job_id, owner)
+            )
+            return cursor.rowcount > 0
+
+    def get(self, job_id: str):
+        jobs = self._select("job_id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(self, status: str = None, limit: int = 20) -> list:
+        """최근 작업부터 (status를 주면 그 상태만)"""
+        if status:
+            return self._select("status = ?", (status,), f"ORDER BY created_at DESC LIMIT {int(limit)}")
+        return self._select("1 = 1", (), f"ORDER BY created_at DESC LIMIT {int(limit)}")
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+    # ---- 영상별 청크 체크포인트 ----
+
+    def start_video(self, video_id: str, job_id: str = None, chunks_total: int = 0):
+        """영상 저장 시작 기록 (첫 청크를 저장하기 전에 호출해야 중간에 끊겨도 부분 저장 상태로 남음).
+        스트리밍 수집은 청킹이 끝나야 청크 수를 알므로 chunks_total은 0"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO video_checkpoints (video_id, job_id, chunks_total, updated_at) "
+                "VALUES (?, ?, ?, ?)", (video_id, job_id, chunks_total, time.time())
+            )
+
+    def record_chunks(self, video_id: str, chunk_indexes: list):
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO checkpoint_chunks (video_id, chunk_index) VALUES (?, ?)",
+                             [(video_id, idx) for idx in chunk_indexes])
+            conn.execute("UPDATE video_checkpoints SET updated_at = ? WHERE video_id = ?", (time.time(), video_id))
+
+    def finish_video(self, video_id: str):
+        """모든 청크 저장 완료: 체크포인트 삭제"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM checkpoint_chunks WHERE video_id = ?", (video_id,))
+            conn.execute("DELETE FROM video_checkpoints WHERE video_id = ?", (video_id,))
+
+    def saved_chunks(self, video_id: str) -> set:
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_index FROM checkpoint_chunks WHERE video_id = ?",
+                                      (video_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def partial_video_ids(self, video_ids: list) -> set:
+        """video_ids 중 저장을 시작했지만 끝내지 못한 영상"""
+        video_ids = list(dict.fromkeys(video_ids))
+        partial = set()
+        with self._lock:
+            for i in range(0, len(video_ids), 500):
+                batch = video_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT video_id FROM video_checkpoints WHERE video_id IN ({', '.join('?' for _ in batch)})", batch
+                ).fetchall()
+                partial.update(row[0] for row in rows)
+        return partial
+
+
+class JobContext:
+    """핸들러에 넘기는 실행 중인 작업: 진행 상황과 체크포인트를 기록 (파이프라인 워커 스레드에서 동시에 호출 가능).
+    다른 워커가 작업을 이어받았으면 기록하지 않고 lost를 세운 뒤 JobLostError (핸들러는 그 자리에서 멈춤)"""
+
+    def __init__(self, store: JobStore, job: dict, owner: str):
+        self.store = store
+        self.owner = owner
+        self.lost = False
+        self.job_id = job["job_id"]
+        self.kind = job["kind"]
+        self.params = job["params"]
+        self.checkpoint = job["checkpoint"]  # 이전 시도에서 저장한 체크포인트 (없으면 None)
+        self.progress = dict(job["progress"] or {})
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        """진행 상황 필드를 덮어씀"""
+        with self._lock:
+            self.progress.update(fields)
+            progress = dict(self.progress)
+        self._write(progress=progress)
+
+    def add(self, **counts):
+        """진행 상황 카운터를 더함 (videos_done=1 등)"""
+        with self._lock:
+            for field, value in counts.items():
+                self.progress[field] = self.progress.get(field, 0) + value
+            progress = dict(self.progress)
+        self._write(progress=progress)
+
+    def save_checkpoint(self, checkpoint: dict):
+        self.checkpoint = checkpoint
+        self._write(checkpoint=checkpoint)
+
+    def check(self):
+        """작업을 잃었으면 JobLostError (결과를 기록하기 전에 호출)"""
+        if self.lost:
+            raise JobLostError(f"다른 워커가 이어받은 작업입니다: {self.job_id}")
+
+    def _write(self, **fields):
+        if not self.lost and not self.store.update(self.job_id, self.owner, **fields):
+            self.lost = True
+        self.check()
+
+
+class JobRunner:
+    """작업 워커 스레드들: 대기 작업을 가져와서 kind별 핸들러(handler(job: JobContext) -> 결과)로 실행"""
+
+    def __init__(self, store: JobStore, handlers: dict, workers: int = INGEST_JOB_WORKERS,
+                 poll_interval: float = INGEST_JOB_POLL_INTERVAL):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = {}  # job_id → JobContext
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self._heartbeat_started = False
+
+    def start(self):
+        """워커/heartbeat 스레드 시작 (여러 번 호출해도 한 번만)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._start_heartbeat()
+        for worker_no in range(self.workers):
+            threading.Thread(target=self._work, name=f"ingest-job-{worker_no}", daemon=True).start()
+        logger.info(f"🧵 수집 작업 워커 {self.workers}개 시작 ({self.owner})")
+
+    def drain(self) -> int:
+        """대기 작업이 없을 때까지 현재 스레드에서 실행하고 실행한 작업 수를 반환 (상주 워커가 없을 때)"""
+        self._start_heartbeat()
+        count = 0
+        while True:
+            job = self.store.claim(self.owner, list(self.handlers))
+            if job is None:
+                return count
+            self.run_job(job)
+            count += 1
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat_started:
+                return
+            self._heartbeat_started = True
+        threading.Thread(target=self._heartbeat_loop, name="ingest-job-heartbeat", daemon=True).start()
+
+    def wake(self):
+        """새 작업이 들어왔음을 알림 (폴링 간격을 기다리지 않고 바로 가져감)"""
+        self._wake.set()
+
+    def _work(self):
+        while True:
+            try:
+                job = self.store.claim(self.owner, list(self.handlers))
+            except Exception as e:
+                logger.error(f"❌ 작업 가져오기 실패: {str(e)}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict):
+        context = JobContext(self.store, job, self.owner)
+        self.running[job["job_id"]] = context
+        logger.info(f"▶️ 작업 시작: {job['job_id']} ({job['kind']} {job['target']}, {job['attempts']}번째 시도)")
+        started = time.perf_counter()
+        try:
+            result = self.handlers[job["kind"]](context)
+        except JobLostError:
+            status = "failed"
+            finished = False
+        except Exception as e:
+            logger.exception(f"❌ 작업 실패: {job['job_id']} ({job['kind']} {job['target']}): {str(e)}")
+            status = "failed"
+            finished = self.store.finish(job["job_id"], self.owner, status, error=str(e))
+        else:
+            status = "done"
+            finished = self.store.finish(job["job_id"], self.owner, status, result=result)
+            logger.info(f"✅ 작업 완료: {job['job_id']} ({time.perf_counter() - started:.1f}초)")
+        finally:
+            self.running.pop(job["job_id"], None)
+        if not finished:
+            # heartbeat가 늦어 lease가 끝났고 다른 워커가 이미 이어받은 작업: 그쪽 결과를 덮어쓰지 않음
+            status = "superseded"
+            logger.warning(f"⚠️ 작업 {job['job_id']}을 다른 워커가 이어받아 결과를 기록하지 않음")
+        inc("ingest_jobs_finished_total", kind=job["kind"], status=status)
+        observe("ingest_job_seconds", time.perf_counter() - started, kind=job["kind"])
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(max(1.0, self.store.lease / 3))
+            try:
+                self.store.heartbeat(list(self.running), self.owner)
+            except Exception as e:
+                logger.warning(f"⚠️ 작업 heartbeat 기록 실패: {str(e)}")
+
+
+_store = None
+_runner = None
+_store_lock = threading.Lock()
+_handlers = {}  # 작업 kind → handler(job: JobContext) -> 결과
+
+
+def register_job_handler(kind: str, handler):
+    _handlers[kind] = handler
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
+
+
+def get_job_runner() -> JobRunner:
+    """프로세스 공용 작업 워커 (스레드는 start()를 호출한 상주 프로세스에서만 실행)"""
+    global _runner
+    if _runner is None:
+        store = get_job_store()
+        with _store_lock:
+            if _runner is None:
+                _runner = JobRunner(store, _handlers)
+    return _runner
+
+
+def submit_job(kind: str, target: str, params: dict) -> tuple:
+    """작업 등록 후 이 프로세스의 워커가 돌고 있으면 바로 깨움. (작업, 새로 만들었는지)"""
+    job, created = get_job_store().submit(kind, target, params)
+    if _runner is not None:
+        _runner.wake()
+    return job, created
+
+
+def job_status(job: dict) -> dict:
+    """도구 응답용 작업 상태 (시각은 읽기 쉬운 문자열, 진행률 %)"""
+    progress = dict(job["progress"] or {})
+    # 채널 작업은 영상 수 기준, 단일 영상은 저장한 자막 구간(초) 기준
+    # (청크 수는 청킹이 진행되면서 늘어나므로 끝나기 전에는 진행률로 쓸 수 없음)
+    if progress.get("videos_total"):
+        done, total = progress.get("videos_done", 0), progress["videos_total"]
+    elif progress.get("seconds_total"):
+        done, total = progress.get("seconds_saved", 0), progress["seconds_total"]
+    else:
+        done, total = progress.get("chunks_saved", 0), progress.get("chunks_total") or 0
+    if job["status"] == "done":
+        progress["percent"] = 100.0
+    elif total:
+        progress["percent"] = min(100.0, round(100.0 * done / total, 1))
+    for field in ("seconds_total", "seconds_saved"):
+        if field in progress:
+            progress[field] = round(progress[field], 1)
+    end = job["finished_at"] or time.time()
+    return {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "target": job["target"],
+        "params": job["params"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": _format_time(job["created_at"]),
+        "started_at": _format_time(job["started_at"]),
+        "finished_at": _format_time(job["finished_at"]),
+        "elapsed_seconds": round(end - job["started_at"], 1) if job["started_at"] else None,
+        "progress": progress,
+        "result": job["result"],
+        # "error" 키는 도구 오류 응답에 쓰므로 작업 실패 사유는 다른 이름으로
+        "last_error": job["error"],
+    }
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else None
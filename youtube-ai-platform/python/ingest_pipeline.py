@@ -0,0 +1,189 @@
+"""
+채널 임베딩용 단계별 동시 수집 파이프라인
+자막 수집 → 청킹 → 임베딩 → DB 저장 단계를 크기 제한 큐로 연결하고,
+단계마다 워커 수를 따로 지정합니다. 큐가 가득 차면 앞 단계가 기다리므로(backpressure)
+빠른 단계가 메모리에 무한정 쌓아두지 않습니다.
+fan-out 단계는 항목 하나를 여러 항목으로 나눠 넘깁니다 (영상 하나 → 청크 배치 여러 개).
+제너레이터를 반환하면 다음 단계 큐가 찼을 때 생성도 멈추므로 긴 영상도 배치 몇 개 분량만 메모리에 둡니다.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from metrics import get_logger, run_in_context, stage as trace_stage
+
+logger = get_logger("ingest")
+
+INGEST_FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "4"))
+INGEST_CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", "1"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# 청킹 단계가 임베딩/저장 단계로 넘기는 청크 배치 크기 (배치마다 임베딩 요청 한 번, DB 저장 한 번)
+INGEST_CHUNK_BATCH_SIZE = int(os.getenv("INGEST_CHUNK_BATCH_SIZE", "50"))
+
+_DONE = object()
+
+
+class Stage:
+    """파이프라인 한 단계: fn(item) -> 다음 단계로 넘길 item (None이면 버림).
+    fan_out=True이면 fn(item)이 이터러블을 반환하고 그 항목들을 하나씩 다음 단계로 넘김"""
+
+    def __init__(self, name: str, fn, workers: int = 1, fan_out: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.fan_out = fan_out
+        self.processed = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._active = self.workers
+        self._lock = threading.Lock()
+
+    def stats(self, wall_seconds: float) -> dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "emitted": self.emitted,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # 단계 처리량: 파이프라인 전체 시간 기준 초당 처리 항목 수
+            "items_per_second": round(self.processed / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            # 워커 활용률: 단계 워커들이 실제로 일한 시간 비율
+            "utilization": round(self.busy_seconds / (wall_seconds * self.workers), 3) if wall_seconds > 0 else 0.0,
+        }
+
+
+class IngestPipeline:
+    """Stage 목록을 크기 제한 큐로 연결해 실행"""
+
+    def __init__(self, stages: list, queue_size: int = INGEST_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.wall_seconds = 0.0
+
+    def run(self, items) -> list:
+        """items를 모든 단계에 통과시키고 마지막 단계의 결과 목록을 반환"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = []
+        results_lock = threading.Lock()
+        threads = []
+
+        for stage_no, stage in enumerate(self.stages):
+            stage._active = stage.workers
+            in_q = queues[stage_no]
+            out_q = queues[stage_no + 1] if stage_no + 1 < len(self.stages) else None
+            next_workers = self.stages[stage_no + 1].workers if out_q is not None else 0
+            for _ in range(stage.workers):
+                # 워커 스레드에서도 호출한 도구의 추적 컨텍스트로 단계 시간을 기록
+                thread = threading.Thread(
+                    target=run_in_context(self._run_worker),
+                    args=(stage, in_q, out_q, next_workers, results, results_lock),
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        started = time.perf_counter()
+        first_q = queues[0]
+        try:
+            for item in items:
+                first_q.put(item)  # 첫 단계 큐가 차면 여기서 대기
+        finally:
+            # 입력 생성 중 예외가 나도 워커들이 종료되도록 항상 종료 신호를 보냄
+            for _ in range(self.stages[0].workers):
+                first_q.put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.wall_seconds = time.perf_counter() - started
+        return results
+
+    @staticmethod
+    def _run_worker(stage, in_q, out_q, next_workers, results, results_lock):
+        def emit(output):
+            if out_q is not None:
+                out_q.put(output)  # 다음 단계 큐가 차면 여기서 대기 (backpressure)
+            else:
+                with results_lock:
+                    results.append(output)
+
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                with stage._lock:
+                    stage._active -= 1
+                    last = stage._active == 0
+                # 단계의 마지막 워커가 끝나면 다음 단계 워커 수만큼 종료 신호 전달
+                if last and out_q is not None:
+                    for _ in range(next_workers):
+                        out_q.put(_DONE)
+                return
+
+            if stage.fan_out:
+                emitted, failed, elapsed = IngestPipeline._run_fan_out(stage, item, emit)
+            else:
+                started = time.perf_counter()
+                failed = False
+                try:
+                    with trace_stage(stage.name):
+                        output = stage.fn(item)
+                except Exception as e:
+                    output = None
+                    failed = True
+                    logger.error(f"❌ [{stage.name}] 처리 실패: {str(e)}")
+                elapsed = time.perf_counter() - started
+                emitted = 0 if output is None else 1
+
+            with stage._lock:
+                stage.busy_seconds += elapsed
+                stage.emitted += emitted
+                if failed:
+                    stage.errors += 1
+                elif emitted or stage.fan_out:
+                    stage.processed += 1
+                else:
+                    stage.dropped += 1
+
+            if not stage.fan_out and output is not None:
+                emit(output)
+
+    @staticmethod
+    def _run_fan_out(stage, item, emit) -> tuple:
+        """fn(item)의 항목을 만들 때마다 넘김. 다음 단계 큐를 기다린 시간은 단계 작업 시간에서 뺌.
+        반환: (넘긴 항목 수, 실패 여부, 작업 시간)"""
+        emitted = 0
+        elapsed = 0.0
+        outputs = None
+        while True:
+            started = time.perf_counter()
+            try:
+                with trace_stage(stage.name):
+                    if outputs is None:
+                        outputs = iter(stage.fn(item))
+                    output = next(outputs, _DONE)
+            except Exception as e:
+                logger.error(f"❌ [{stage.name}] 처리 실패 ({emitted}개 넘긴 뒤): {str(e)}")
+                return emitted, True, elapsed + time.perf_counter() - started
+            elapsed += time.perf_counter() - started
+            if output is _DONE:
+                return emitted, False, elapsed
+            emit(output)
+            emitted += 1
+
+    def report(self) -> list:
+        return [stage.stats(self.wall_seconds) for stage in self.stages]
+
+    def log_report(self):
+        logger.info(f"📊 파이프라인 완료: {self.wall_seconds:.2f}초")
+        for stats in self.report():
+            logger.info(
+                f"   - {stats['stage']:<10} 워커 {stats['workers']}개 | 처리 {stats['processed']}건"
+                f" (버림 {stats['dropped']}, 오류 {stats['errors']}, 넘김 {stats['emitted']}) | {stats['items_per_second']}건/초"
+                f" | 활용률 {stats['utilization'] * 100:.0f}%"
+            )
@@ -0,0 +1,262 @@
+"""
+youtube_videos.chunk_text 키워드 검색용 로컬 역색인 (BM25)
+요리/재료 이름처럼 정확한 단어로 찾는 검색어("제육볶음", "고추장")는 임베딩 없이 바로 찾습니다.
+- 토큰화: 한글은 글자 n-gram(기본 2글자), 영문/숫자는 단어 단위. 조사가 붙은 "고추장을"도 "고추장"과 일치
+- 점수: BM25 (k1, b)
+- 동기화: vector_index와 같이 id 기준 증분 동기화 + 이 프로세스에서 저장한 청크는 저장 직후 바로 추가
+- 하이브리드 검색용 reciprocal_rank_fusion()으로 키워드/벡터 순위를 합침
+메타데이터만 디스크에 저장하고 역색인은 불러올 때 다시 만듭니다.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from chunk_writer import TIME_FIELDS, CHUNK_TIME_COLUMNS
+from metrics import get_logger, inc
+from rate_limit import rate_limited
+
+logger = get_logger("keyword_index")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", os.path.join(CACHE_DIR, "keyword_index.json"))
+KEYWORD_INDEX_SYNC_INTERVAL = float(os.getenv("KEYWORD_INDEX_SYNC_INTERVAL", "60"))
+KEYWORD_NGRAM = int(os.getenv("KEYWORD_NGRAM", "2"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = 60  # reciprocal rank fusion 상수 (순위가 낮은 결과의 영향을 줄임)
+SYNC_PAGE_SIZE = 1000
+META_FIELDS = ("id", "video_id", "url", "chunk_index", "chunk_text") + (TIME_FIELDS if CHUNK_TIME_COLUMNS else ())
+
+_WORD = re.compile(r"\w+")
+_HANGUL = re.compile(r"[가-힣ㄱ-ㆎ]+|[^가-힣ㄱ-ㆎ]+")
+
+
+def tokenize(text: str, n: int = KEYWORD_NGRAM) -> list:
+    """한글은 n글자 n-gram(n보다 짧으면 그대로), 그 외 단어는 소문자 단어 그대로"""
+    tokens = []
+    for word in _WORD.findall(unicodedata.normalize("NFC", text or "").lower()):
+        # "bts제육볶음" 같이 섞인 단어는 한글/비한글 부분으로 나눔
+        for part in _HANGUL.findall(word):
+            if "가" <= part[0] <= "힣" or "ㄱ" <= part[0] <= "ㆎ":
+                if len(part) <= n:
+                    tokens.append(part)
+                else:
+                    tokens.extend(part[i:i + n] for i in range(len(part) - n + 1))
+            elif part != "_":
+                tokens.append(part)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: list, top_k: int, key=lambda row: (row.get("video_id"), row.get("chunk_index")),
+                           k: int = RRF_K) -> list:
+    """여러 순위 목록을 RRF로 합침. 결과 행의 score는 합산된 RRF 점수"""
+    scores = {}
+    rows = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking or []):
+            row_key = key(row)
+            scores[row_key] = scores.get(row_key, 0.0) + 1.0 / (k + rank + 1)
+            rows.setdefault(row_key, row)
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [dict(rows[row_key], score=score) for row_key, score in best]
+
+
+class KeywordIndex:
+    """BM25 역색인 (스레드 안전)"""
+
+    def __init__(self, n: int = KEYWORD_NGRAM, k1: float = BM25_K1, b: float = BM25_B):
+        self.n = n
+        self.k1 = k1
+        self.b = b
+        self.meta = []  # 문서별 메타데이터 (None이면 삭제됨)
+        self.lengths = []  # 문서별 토큰 수
+        self.postings = {}  # 토큰 → {문서 번호: 빈도}
+        self.doc_ids = {}  # (video_id, chunk_index) → 문서 번호
+        self.total_length = 0
+        self.live = 0
+        self.last_id = 0
+        self.last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.live
+
+    def add(self, rows: list) -> int:
+        """{"video_id", "chunk_index", "chunk_text", ...} 행들을 추가. 같은 청크가 이미 있으면 내용이 바뀐 경우만 교체"""
+        added = 0
+        with self._lock:
+            for row in rows:
+                text = row.get("chunk_text")
+                if not text:
+                    continue
+                key = (row.get("video_id"), row.get("chunk_index"))
+                previous = self.doc_ids.get(key)
+                if previous is not None:
+                    if self.meta[previous]["chunk_text"] == text:
+                        # 이미 저장 직후 추가된 청크: id만 채움
+                        if self.meta[previous].get("id") is None:
+                            self.meta[previous]["id"] = row.get("id")
+                        continue
+                    self._remove_locked(previous)
+                self._add_locked(key, {field: row.get(field) for field in META_FIELDS}, tokenize(text, self.n))
+                added += 1
+        return added
+
+    def _add_locked(self, key, meta: dict, tokens: list):
+        doc = len(self.meta)
+        self.meta.append(meta)
+        self.lengths.append(len(tokens))
+        self.doc_ids[key] = doc
+        self.total_length += len(tokens)
+        self.live += 1
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self.postings.setdefault(token, {})[doc] = count
+
+    def _remove_locked(self, doc: int):
+        # 역색인에서 빼고 문서 자리는 비워둠 (문서 번호가 바뀌지 않도록)
+        for token in set(tokenize(self.meta[doc]["chunk_text"], self.n)):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(doc, None)
+                if not posting:
+                    del self.postings[token]
+        self.total_length -= self.lengths[doc]
+        self.live -= 1
+        self.meta[doc] = None
+        self.lengths[doc] = 0
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """BM25 점수가 높은 top_k개 청크를 score와 함께 반환 (일치하는 토큰이 없으면 빈 목록)"""
+        terms = set(tokenize(query, self.n))
+        with self._lock:
+            if not terms or not self.live:
+                return []
+            avg_length = self.total_length / self.live
+            scores = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (self.live - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc] / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [dict(self.meta[doc], score=score) for doc, score in best]
+
+    def sync(self, client, table: str = "youtube_videos") -> int:
+        """마지막으로 가져온 id 이후의 행만 가져와서 추가 (임베딩 컬럼은 받지 않음). 추가된 행 수를 반환"""
+        added = 0
+        while True:
+            inc("external_calls_total", service="supabase", endpoint=f"{table}.select")
+            query = (
+                client.table(table)
+                .select(",".join(META_FIELDS))
+                .gt("id", self.last_id)
+                .order("id")
+                .limit(SYNC_PAGE_SIZE)
+            )
+            resp = rate_limited("supabase", f"{table}.select", query.execute)
+            rows = resp.data or []
+            added += self.add(rows)
+            if rows:
+                self.last_id = max(self.last_id, rows[-1]["id"])
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+        self.last_sync = time.time()
+        return added
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": self.live,
+                "terms": len(self.postings),
+                "avg_tokens": round(self.total_length / self.live, 1) if self.live else 0.0,
+                "last_id": self.last_id,
+            }
+
+    def save(self, path: str = KEYWORD_INDEX_PATH):
+        """메타데이터와 마지막 id만 저장 (역색인은 load()에서 다시 만듦)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"n": self.n, "last_id": self.last_id, "meta": [meta for meta in self.meta if meta is not None]}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = KEYWORD_INDEX_PATH):
+        """저장된 인덱스를 불러옴. 파일이 없거나 n-gram 설정이 다르면 빈 인덱스"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("n") != index.n:
+            logger.info(f"🔁 키워드 인덱스 n-gram 설정이 달라({saved.get('n')} → {index.n}) 다시 동기화합니다")
+            return index
+        index.add(saved["meta"])
+        index.last_id = saved.get("last_id", 0)
+        logger.info(f"📂 키워드 인덱스 로드: {len(index)}개 청크, 토큰 {len(index.postings)}종")
+        return index
+
+
+_index = None
+_index_lock = threading.Lock()
+_sync_lock = threading.Lock()  # 동기화/저장 중인 스레드 (한 번에 하나)
+
+
+def get_keyword_index(client) -> KeywordIndex:
+    """프로세스 공용 키워드 인덱스 (동기화 주기마다 증분 동기화).
+    client는 Supabase 클라이언트 또는 클라이언트를 돌려주는 함수 (함수면 동기화할 때만 호출)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+        index = _index
+    # 동기화/저장은 전역 잠금 밖에서 한 스레드만. 이미 문서가 있으면 백그라운드로 돌리고 검색은 바로 진행
+    if time.time() - index.last_sync >= KEYWORD_INDEX_SYNC_INTERVAL and _sync_lock.acquire(blocking=False):
+        if len(index):
+            threading.Thread(target=_sync_index, args=(index, client, True), daemon=True,
+                             name="keyword-index-sync").start()
+        else:
+            _sync_index(index, client)
+    return index
+
+
+def _sync_index(index: KeywordIndex, client, background: bool = False):
+    """_sync_lock을 잡은 상태로 호출. 증분 동기화 후 추가된 문서가 있으면 저장하고 잠금을 풂"""
+    try:
+        added = index.sync(client() if callable(client) else client)
+        if added:
+            logger.info(f"🔄 키워드 인덱스 동기화: {added}개 추가 (총 {len(index)}개)")
+            index.save(KEYWORD_INDEX_PATH)
+    except Exception as e:
+        if not background:
+            raise
+        logger.warning(f"⚠️ 키워드 인덱스 백그라운드 동기화 실패, 다음 주기에 다시 시도: {str(e)}")
+        index.last_sync = time.time()
+    finally:
+        _sync_lock.release()
+
+
+def index_written_rows(table: str, rows: list):
+    """chunk_writer 행 저장 콜백: 이 프로세스에 인덱스가 있으면 저장된 청크를 바로 추가 (검색에 즉시 반영).
+    인덱스가 아직 없으면 처음 불러올 때 동기화로 가져옴"""
+    if table == "youtube_videos" and _index is not None:
+        _index.add(rows)
+
+
+def keyword_index_stats():
+    """이 프로세스에 불러온 인덱스의 통계 (아직 불러오지 않았으면 None)"""
+    return _index.stats() if _index is not None else None
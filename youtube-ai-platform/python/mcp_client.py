@@ -2,12 +2,38 @@
 """
 MCP Client for Rust Backend
 Rust 서버에서 Python MCP 함수들을 호출하기 위한 클라이언트
+
+실행 모드:
+  python mcp_client.py <function_name> <args_json>      # 1회성 호출 (fallback)
+  python mcp_client.py --worker                         # stdin/stdout JSON-lines 워커
+  python mcp_client.py --serve [--socket PATH] [--workers N]
+                                                        # Unix 소켓 + 사전 워밍된 워커 풀
+
+JSON-lines 프로토콜:
+  요청: {"id": 1, "function": "search_similar_youtube_video", "args": {"query": "..."}}
+  응답: {"id": 1, "result": <call_mcp_function 반환값>}
+  헬스체크: {"id": 2, "function": "__ping__"} -> {"id": 2, "result": {"pong": true}}
 """
 
 import sys
 import json
 import os
 import traceback
+import contextlib
+import queue
+import socketserver
+import subprocess
+import threading
+import time
+
+DEFAULT_SOCKET_PATH = os.getenv("MCP_SOCKET_PATH", "/tmp/mcp_worker.sock")
+DEFAULT_WORKERS = int(os.getenv("MCP_WORKERS", "4"))
+CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "600"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+PING_TIMEOUT = 5.0
+STARTUP_TIMEOUT = 120.0
+PING_FUNCTION = "__ping__"
+
 
 def call_mcp_function(function_name, args):
     """MCP 함수를 호출하는 함수"""
@@ -17,13 +43,35 @@ def call_mcp_function(function_name, args):
         
         # 함수 호출
         if function_name == "search_similar_youtube_video":
-            result = mcp_server.search_similar_youtube_video(args.get("query", ""))
+            result = mcp_server.search_similar_youtube_video(
+                args.get("query", ""),
+                args.get("top_k", 1),
+                args.get("mode", "vector")
+            )
+        elif function_name == "search_similar_youtube_video_batch":
+            result = mcp_server.search_similar_youtube_video_batch(
+                args.get("queries", []),
+                args.get("top_k", 1),
+                args.get("mode", "vector")
+            )
         elif function_name == "search_youtube_videos":
             result = mcp_server.search_youtube_videos(args.get("query", ""))
         elif function_name == "get_channel_info":
-            result = mcp_server.get_channel_info(args.get("video_url", ""))
+            result = mcp_server.get_channel_info(
+                args.get("video_url", ""),
+                args.get("max_videos", 5)
+            )
         elif function_name == "save_channel_youtube_embeddings":
-            result = mcp_server.save_channel_youtube_embeddings(args.get("channel_id", ""))
+            result = mcp_server.save_channel_youtube_embeddings(
+                args.get("channel_id", ""),
+                args.get("max_results", 3),
+                args.get("force_update", False)
+            )
+        elif function_name == "sync_all_tracked_channels":
+            result = mcp_server.sync_all_tracked_channels(
+                args.get("max_results", 3),
+                args.get("max_channels", 10)
+            )
         elif function_name == "get_youtube_transcript":
             result = mcp_server.get_youtube_transcript(args.get("url", ""))
         elif function_name == "save_single_video_embedding":
@@ -33,6 +81,19 @@ def call_mcp_function(function_name, args):
                 args.get("video_url", ""), 
                 args.get("chunk_method", "semantic")
             )
+        elif function_name == "get_ingest_job":
+            result = mcp_server.get_ingest_job(args.get("job_id", ""))
+        elif function_name == "list_ingest_jobs":
+            result = mcp_server.list_ingest_jobs(
+                args.get("status", ""),
+                args.get("limit", 20)
+            )
+        elif function_name == "get_search_cache_stats":
+            result = mcp_server.get_search_cache_stats()
+        elif function_name == "get_youtube_api_stats":
+            result = mcp_server.get_youtube_api_stats()
+        elif function_name == "get_metrics":
+            result = mcp_server.get_metrics(args.get("format", "json"))
         elif function_name == "compare_chunking_methods":
             result = mcp_server.compare_chunking_methods(args.get("video_url", ""))
         else:
@@ -57,9 +118,286 @@ def call_mcp_function(function_name, args):
         }
         return error_info
 
+
+def handle_request_line(line):
+    """JSON-lines 요청 한 줄을 처리하여 응답 dict를 반환"""
+    try:
+        request = json.loads(line)
+    except Exception as e:
+        return {"id": None, "result": {"error": f"잘못된 요청 JSON: {str(e)}"}}
+
+    request_id = request.get("id")
+    function_name = request.get("function", "")
+    if function_name == PING_FUNCTION:
+        return {"id": request_id, "result": {"pong": True, "pid": os.getpid()}}
+
+    result = call_mcp_function(function_name, request.get("args") or {})
+    return {"id": request_id, "result": result}
+
+
+def run_worker():
+    """stdin으로 JSON-lines 요청을 받아 stdout으로 응답하는 상주 워커"""
+    protocol_out = sys.stdout
+    # mcp_server의 print 로그가 프로토콜 채널(stdout)을 오염시키지 않도록 stderr로 돌림
+    with contextlib.redirect_stdout(sys.stderr):
+        # 사전 워밍: 상주 워커는 지연 로딩되는 클라이언트(OpenAI, Supabase)까지 첫 요청 전에 만들어 둠
+        try:
+            import mcp_server
+            mcp_server.warm_up()
+            # 수집 도구는 작업 ID만 반환하므로 상주 워커가 백그라운드에서 작업을 실행
+            mcp_server.start_job_workers()
+            ready = {"event": "ready", "pid": os.getpid()}
+        except Exception as e:
+            ready = {"event": "ready", "pid": os.getpid(), "error": str(e)}
+        protocol_out.write(json.dumps(ready, ensure_ascii=False) + "\n")
+        protocol_out.flush()
+
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            response = handle_request_line(line)
+            protocol_out.write(json.dumps(response, ensure_ascii=False) + "\n")
+            protocol_out.flush()
+
+
+class WorkerProcess:
+    """`mcp_client.py --worker` 서브프로세스 하나를 감싸는 핸들"""
+
+    def __init__(self, worker_no):
+        self.worker_no = worker_no
+        self.process = None
+        self.lines = None
+        self.request_seq = 0
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # 워커 로그는 부모의 stderr로 그대로 흘려보냄
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self.lines = queue.Queue()
+        reader = threading.Thread(target=self._read_stdout, args=(self.process, self.lines), daemon=True)
+        reader.start()
+
+        ready = self._next_line(STARTUP_TIMEOUT)
+        if ready is None:
+            raise RuntimeError(f"워커 {self.worker_no} 시작 실패 (ready 신호 없음)")
+        print(f"🟢 워커 {self.worker_no} 준비 완료 (pid={self.process.pid})", file=sys.stderr)
+
+    @staticmethod
+    def _read_stdout(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF: 프로세스 종료
+
+    def _next_line(self, timeout):
+        try:
+            line = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if line is None:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            # 프로토콜 외 출력(네이티브 라이브러리 로그 등)은 무시
+            return {}
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, function_name, args, timeout):
+        """요청을 보내고 응답의 result를 반환. 실패 시 RuntimeError"""
+        if not self.is_alive():
+            raise RuntimeError("워커 프로세스가 종료되었습니다")
+        self.request_seq += 1
+        request_id = self.request_seq
+        payload = {"id": request_id, "function": function_name, "args": args}
+        try:
+            self.process.stdin.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"워커 요청 전송 실패: {str(e)}")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"워커 응답 시간 초과 ({timeout}s)")
+            response = self._next_line(remaining)
+            if response is None:
+                if self.is_alive():
+                    raise RuntimeError(f"워커 응답 시간 초과 ({timeout}s)")
+                raise RuntimeError("워커 프로세스가 응답 중 종료되었습니다")
+            # 이전 타임아웃 요청의 늦은 응답은 버림
+            if response.get("id") == request_id:
+                return response.get("result")
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WorkerPool:
+    """사전 워밍된 워커 프로세스 풀 (헬스체크 + 크래시 시 재시작)"""
+
+    def __init__(self, size=DEFAULT_WORKERS, call_timeout=CALL_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.call_timeout = call_timeout
+        self.health_check_interval = health_check_interval
+        self.workers = [WorkerProcess(i) for i in range(size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self._stopped = threading.Event()
+        self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self._health_thread.start()
+
+    def call(self, function_name, args):
+        worker = self.idle.get()
+        try:
+            return worker.request(function_name, args, self.call_timeout)
+        except Exception as e:
+            print(f"❌ 워커 {worker.worker_no} 호출 실패, 재시작: {str(e)}", file=sys.stderr)
+            self._restart(worker)
+            return {"error": str(e), "function_name": function_name, "args": args}
+        finally:
+            self.idle.put(worker)
+
+    def _restart(self, worker):
+        try:
+            worker.restart()
+        except Exception as e:
+            print(f"❌ 워커 {worker.worker_no} 재시작 실패: {str(e)}", file=sys.stderr)
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_check_interval):
+            # 유휴 상태인 워커만 점검 (작업 중인 워커는 건드리지 않음)
+            for _ in range(len(self.workers)):
+                try:
+                    worker = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    result = worker.request(PING_FUNCTION, {}, PING_TIMEOUT)
+                    if not result or not result.get("pong"):
+                        raise RuntimeError("잘못된 ping 응답")
+                except Exception as e:
+                    print(f"⚠️ 워커 {worker.worker_no} 헬스체크 실패, 재시작: {str(e)}", file=sys.stderr)
+                    self._restart(worker)
+                finally:
+                    self.idle.put(worker)
+
+    def close(self):
+        self._stopped.set()
+        for worker in self.workers:
+            worker.stop()
+
+
+class _PoolRequestHandler(socketserver.StreamRequestHandler):
+    """소켓 연결 하나에서 JSON-lines 요청을 순서대로 처리"""
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                request_id = request.get("id")
+                function_name = request.get("function", "")
+                args = request.get("args") or {}
+                if function_name == PING_FUNCTION:
+                    result = {"pong": True, "workers": sum(w.is_alive() for w in self.server.pool.workers)}
+                else:
+                    result = self.server.pool.call(function_name, args)
+                response = {"id": request_id, "result": result}
+            except Exception as e:
+                response = {"id": None, "result": {"error": str(e), "traceback": traceback.format_exc()}}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _PoolServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(socket_path=DEFAULT_SOCKET_PATH, workers=DEFAULT_WORKERS):
+    """Unix 소켓에서 JSON-lines 요청을 받아 워커 풀로 분배"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    pool = WorkerPool(size=workers)
+    server = _PoolServer(socket_path, _PoolRequestHandler)
+    server.pool = pool
+    print(f"🚀 MCP 워커 풀 시작: {socket_path} (워커 {workers}개)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def drain_jobs_in_background():
+    """1회성 호출로 등록한 수집 작업을 실행할 프로세스를 따로 띄움 (상주 워커가 없을 때도 작업이 실행되도록).
+    표준 입출력을 물려주지 않으므로 호출한 쪽(Rust 백엔드)은 이 프로세스를 기다리지 않음"""
+    subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py"), "--drain"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _option_value(argv, name, default):
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv):
+            return argv[index + 1]
+    return default
+
+
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--worker":
+        run_worker()
+        sys.exit(0)
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        serve_socket(
+            socket_path=_option_value(sys.argv, "--socket", DEFAULT_SOCKET_PATH),
+            workers=int(_option_value(sys.argv, "--workers", DEFAULT_WORKERS)),
+        )
+        sys.exit(0)
+
     if len(sys.argv) != 3:
-        error_response = {"error": "Usage: python mcp_client.py <function_name> <args_json>"}
+        error_response = {"error": "Usage: python mcp_client.py <function_name> <args_json> | --worker | --serve [--socket PATH] [--workers N]"}
         print(json.dumps(error_response, ensure_ascii=False))
         sys.exit(1)
     
@@ -70,6 +408,10 @@ if __name__ == "__main__":
         args = json.loads(args_json)
         result = call_mcp_function(function_name, args)
         print(json.dumps(result, ensure_ascii=False))
+        if isinstance(result, dict) and (
+            (result.get("job_id") and result.get("status") == "queued") or result.get("queued_job_ids")
+        ):
+            drain_jobs_in_background()
     except Exception as e:
         error_response = {
             "error": str(e),
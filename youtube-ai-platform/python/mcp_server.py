@@ -1,32 +1,82 @@
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import threading
 import time
-import openai
-from youtube_transcript_api._api import YouTubeTranscriptApi
-from supabase import create_client, Client
-import xml.etree.ElementTree as ET
 from datetime import datetime
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import re
+import sys
 from dotenv import load_dotenv
 import os
 import numpy as np
-load_dotenv()
+load_dotenv()  # 아래 로컬 모듈들이 import 시점에 환경 변수를 읽으므로 먼저 로드
+
+from embeddings import embed_text, embed_texts, aembed_text, EMBEDDING_MODEL
+from embedding_cache import get_embedding_cache
+from http_client import http_get, get_http_stats
+from youtube_api import youtube_api_get, channel_id_for_video, get_quota_stats, YOUTUBE_API_URL
+from transcript_store import TranscriptUnavailableError, get_transcript_entries, get_transcript_store
+from channel_sync import fetch_channel_feed, get_channel_sync_store, parse_published, publish_interval, published_before
+from chunk_writer import ChunkWriter, add_write_listener, add_row_listener, CHUNK_TIME_COLUMNS
+from vector_index import get_local_index
+from keyword_index import get_keyword_index, index_written_rows, keyword_index_stats, reciprocal_rank_fusion
+from chunking import split_sentences, semantic_clusters, cluster_embedding, iter_timed_chunks
+from query_cache import QueryResultCache, normalize_query
+from ingest_jobs import (
+    JOB_STATUSES, JobLostError, get_job_runner, get_job_store, job_status, register_job_handler, submit_job,
+)
+from ingest_pipeline import (
+    IngestPipeline, Stage,
+    INGEST_FETCH_WORKERS, INGEST_CHUNK_WORKERS, INGEST_EMBED_WORKERS, INGEST_WRITE_WORKERS, INGEST_CHUNK_BATCH_SIZE,
+)
+from metrics import (
+    get_logger, instrument_tool, stage, inc, observe, register_collector, run_in_context,
+    snapshot as metrics_snapshot, prometheus_text,
+)
+from rate_limit import get_rate_limit_stats, get_rate_limiter, rate_limited
+from tool_executor import LazyToolServer, async_tool, run_blocking, run_coroutine
+
+logger = get_logger("mcp_server")
 
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3'
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+_supabase = None
+_supabase_lock = threading.Lock()
+
+
+def get_supabase():
+    """Supabase 클라이언트 (supabase 패키지 import와 클라이언트 생성을 처음 쓸 때 한 번만)"""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+
+def warm_up():
+    """지연 로딩되는 패키지/클라이언트를 미리 불러옴 (상주 워커가 첫 요청 전에 호출)"""
+    import openai  # noqa: F401
+    get_supabase()
 
 
-# Create an MCP server
-mcp = FastMCP("youtube_agent_server")
+# Create an MCP server (FastMCP는 run/list_tools 등 서버를 실제로 쓸 때 생성)
+mcp = LazyToolServer("youtube_agent_server")
+
+# 유사도 검색 결과 캐시: 새 청크가 저장되면 전체 무효화
+_search_cache = QueryResultCache()
+add_write_listener(lambda table, saved_rows: _search_cache.invalidate())
+# 이 프로세스에서 저장한 청크는 키워드 인덱스에 바로 추가 (다른 프로세스 저장분은 주기적 동기화로)
+add_row_listener(index_written_rows)
 
 
 
 ### Tool 1 : 유튜브 영상 URL에 대한 자막을 가져옵니다.
 
-@mcp.tool()
+@async_tool(mcp)
+@instrument_tool
 def get_youtube_transcript(url: str) -> str:
     """ 유튜브 영상 URL에 대한 자막을 가져옵니다."""
     
@@ -36,49 +86,49 @@ def get_youtube_transcript(url: str) -> str:
         raise ValueError("유효하지 않은 YouTube URL이 제공되었습니다")
     video_id = video_id_match.group(1)
     
-    print(f"자막 추출 시도: 비디오 ID '{video_id}'")
+    logger.debug(f"자막 추출 시도: 비디오 ID '{video_id}'")
     
-    # 2. youtube_transcript_api를 사용하여 자막을 가져옵니다.
+    # 2. 로컬 자막 저장소를 먼저 보고, 없을 때만 youtube_transcript_api로 가져옵니다.
     try:
-        # 간단한 방식으로 자막 가져오기
-        languages = ["ko", "en"]
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+        with stage("transcript"):
+            language, entries = get_transcript_entries(video_id, languages=("ko", "en"))
         
         # 3. 자막 목록의 'text' 부분을 하나의 문자열로 결합합니다.
-        transcript_text = " ".join([entry['text'] for entry in transcript_list])
+        transcript_text = " ".join([entry['text'] for entry in entries])
         
         if not transcript_text.strip():
             raise Exception("자막 내용이 비어있습니다")
         
-        print(f"자막 추출 성공: {video_id} (길이: {len(transcript_text)}자)")
+        logger.debug(f"자막 추출 성공: {video_id} ({language}, 길이: {len(transcript_text)}자)")
         return transcript_text
 
     except Exception as e:
         error_msg = f"비디오 ID '{video_id}'에 대한 자막을 찾을 수 없거나 사용할 수 없습니다. 오류: {str(e)}"
-        print(f"자막 추출 실패: {error_msg}")
+        logger.warning(f"자막 추출 실패: {error_msg}")
         raise RuntimeError(error_msg)
 
 
 ### Tool 2 : 유튜브에서 특정 키워드로 동영상을 검색하고 세부 정보를 가져옵니다
-@mcp.tool()
+@async_tool(mcp)
+@instrument_tool
 def search_youtube_videos(query: str) :
     """유튜브에서 특정 키워드로 동영상을 검색하고 세부 정보를 가져옵니다"""
     try:
         # 1. 동영상 검색
         max_results: int = 20
-        search_url = f"{YOUTUBE_API_URL}/search?part=snippet&q={requests.utils.quote(query)}&type=video&maxResults={max_results}&key={YOUTUBE_API_KEY}"
-
-        search_response = requests.get(search_url)
-        search_data = search_response.json()
+        with stage("search"):
+            search_data = youtube_api_get("search", {
+                "part": "snippet", "q": query, "type": "video", "maxResults": max_results,
+            }, fields="items(id/videoId)")
         video_ids = [item['id']['videoId'] for item in search_data.get('items', [])]
 
         if not video_ids:
             return []
 
-        video_details_url = f"{YOUTUBE_API_URL}/videos?part=snippet,statistics&id={','.join(video_ids)}&key={YOUTUBE_API_KEY}"
-        details_response = requests.get(video_details_url)
-        details_response.raise_for_status()
-        details_data = details_response.json()
+        with stage("details"):
+            details_data = youtube_api_get("videos", {
+                "part": "snippet,statistics", "id": ",".join(video_ids),
+            }, fields="items(id,snippet(title,publishedAt,channelTitle,channelId,thumbnails),statistics(viewCount,likeCount))")
 
         videos = []
         for item in details_data.get('items', []):
@@ -120,72 +170,68 @@ def search_youtube_videos(query: str) :
         return videos
 
     except Exception as e:
-        print(f"YouTube 검색 오류: {e}")
+        logger.error(f"YouTube 검색 오류: {e}")
         return []
     
 
-### Tool 3 : YouTube 동영상 URL로부터 채널 정보와 최근 5개의 동영상을 가져옵니다
-@mcp.tool()
-def get_channel_info(video_url: str) -> dict:
-    """YouTube 동영상 URL로부터 채널 정보와 최근 5개의 동영상을 가져옵니다"""
-    def extract_video_id(url):
-        match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11})", url)
-        return match.group(1) if match else None
+### Tool 3 : YouTube 동영상 URL로부터 채널 정보와 최근 동영상 목록을 가져옵니다
+def _extract_video_id(url):
+    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11})", url)
+    return match.group(1) if match else None
 
-    def fetch_recent_videos(channel_id):
-        rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-        try:
-            response = requests.get(rss_url)
-            if response.status_code != 200:
-                return []
-
-            root = ET.fromstring(response.text)
-            ns = {'atom': 'http://www.w3.org/2005/Atom'}
-            videos = []
-
-            for entry in root.findall('.//atom:entry', ns)[:5]:  
-                title = entry.find('./atom:title', ns).text
-                link = entry.find('./atom:link', ns).attrib['href']
-                published = entry.find('./atom:published', ns).text
-                video_id = link.split('v=')[1] if 'v=' in link else None
-                
-                # 썸네일 URL 생성 (여러 크기 시도)
-                thumbnail_url = ""
-                if video_id:
-                    # 먼저 mqdefault.jpg 시도
-                    thumbnail_url = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
-                    # 만약 실패하면 hqdefault.jpg 시도
-                    # 실제로는 프론트엔드에서 onerror로 처리
-                
-                videos.append({
-                    'title': title,
-                    'url': link,
-                    'publishedDate': published,
-                    'thumbnail': thumbnail_url,
-                    'videoId': video_id,  # video_id 추가
-                    'updatedDate': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-            return videos
-        except Exception as e:
-            print(f"RSS 피드 가져오기 실패: {e}")
-            return []
 
-    video_id = extract_video_id(video_url)
+def _fetch_recent_videos(channel_id, max_videos):
+    if max_videos <= 0:
+        return []
+    try:
+        # 피드를 받는 대로 파싱하고 max_videos개를 읽으면 나머지는 받지 않음
+        entries = fetch_channel_feed(channel_id, limit=max_videos) or []
+    except Exception as e:
+        logger.warning(f"RSS 피드 가져오기 실패: {e}")
+        return []
+
+    videos = []
+    for entry in entries:
+        video_id = entry['video_id']
+
+        # 썸네일 URL 생성 (여러 크기 시도)
+        thumbnail_url = ""
+        if video_id:
+            # 먼저 mqdefault.jpg 시도
+            thumbnail_url = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
+            # 만약 실패하면 hqdefault.jpg 시도
+            # 실제로는 프론트엔드에서 onerror로 처리
+
+        videos.append({
+            'title': entry['title'],
+            'url': entry['url'],
+            'publishedDate': entry['published'],
+            'thumbnail': thumbnail_url,
+            'videoId': video_id,  # video_id 추가
+            'updatedDate': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+    return videos
+
+
+def _fetch_channel(channel_id):
+    return youtube_api_get("channels", {"part": "snippet,statistics", "id": channel_id},
+                           fields="items(snippet(title,thumbnails/default/url),statistics(subscriberCount,viewCount,videoCount))")['items'][0]
+
+
+def _lookup_channel_id(video_url):
+    video_id = _extract_video_id(video_url)
     if not video_id:
         raise ValueError("Invalid YouTube URL")
 
-    video_api = f"{YOUTUBE_API_URL}/videos?part=snippet,statistics&id={video_id}&key={YOUTUBE_API_KEY}"
-    video_data = requests.get(video_api).json()
-    if not video_data.get('items'):
+    # 한 번 본 영상은 videos API 호출 없이 채널 ID를 바로 얻음
+    with stage("channel_lookup"):
+        channel_id = channel_id_for_video(video_id)
+    if not channel_id:
         raise ValueError("No video found")
+    return channel_id
 
-    video_info = video_data['items'][0]
-    channel_id = video_info['snippet']['channelId']
-
-    channel_api = f"{YOUTUBE_API_URL}/channels?part=snippet,statistics&id={channel_id}&key={YOUTUBE_API_KEY}"
-    channel_data = requests.get(channel_api).json()['items'][0]
 
+def _channel_info(channel_id, channel_data, videos):
     return {
         'channelTitle': channel_data['snippet']['title'],
         'channelUrl': f"https://www.youtube.com/channel/{channel_id}",
@@ -193,338 +239,1004 @@ def get_channel_info(video_url: str) -> dict:
         'subscriberCount': channel_data['statistics'].get('subscriberCount', '0'),
         'viewCount': channel_data['statistics'].get('viewCount', '0'),
         'videoCount': channel_data['statistics'].get('videoCount', '0'),
-        'videos': fetch_recent_videos(channel_id)
+        'videos': videos
     }
 
 
-# 이미 상단에 import, 환경설정, supabase client 생성이 있으므로 아래 중복 제거
+@mcp.tool(name="get_channel_info")
+@instrument_tool(name="get_channel_info")
+async def aget_channel_info(video_url: str, max_videos: int = 5) -> dict:
+    """YouTube 동영상 URL로부터 채널 정보와 최근 max_videos개(기본 5개)의 동영상을 가져옵니다"""
+    channel_id = await run_blocking(_lookup_channel_id, video_url)
+
+    # 채널 정보와 RSS 피드는 서로 독립적이므로 동시에 가져옴
+    with stage("channel_and_feed"):
+        channel_data, videos = await asyncio.gather(
+            run_blocking(_fetch_channel, channel_id),
+            run_blocking(_fetch_recent_videos, channel_id, max_videos),
+        )
+
+    return _channel_info(channel_id, channel_data, videos)
+
+
+def get_channel_info(video_url: str, max_videos: int = 5) -> dict:
+    """aget_channel_info의 동기 버전 (워커 풀/스크립트용)"""
+    return run_coroutine(aget_channel_info(video_url, max_videos))
+
+
+# 이미 상단에 import, 환경설정, supabase client 접근자가 있으므로 아래 중복 제거
 
 # 자막 청킹 함수 추가
 
-def chunk_transcript(transcript: str, chunk_size: int = 500) -> list:
-    """자막 텍스트를 chunk_size(기본 500)자씩 나눠 리스트로 반환"""
-    return [transcript[i:i+chunk_size] for i in range(0, len(transcript), chunk_size)]
+def fetch_timed_transcript(video_id: str) -> list:
+    """자막 타임라인 항목 [{"text", "start", "duration"}]을 가져옴 (로컬 자막 저장소 경유)"""
+    try:
+        language, entries = get_transcript_entries(video_id, languages=("ko", "en"))
+    except Exception as e:
+        # 자막이 없는 영상(다시 요청해도 같음)은 TranscriptUnavailableError로 구분해서 올림
+        error_type = TranscriptUnavailableError if isinstance(e, TranscriptUnavailableError) else RuntimeError
+        raise error_type(f"비디오 ID '{video_id}'에 대한 자막을 찾을 수 없거나 사용할 수 없습니다. 오류: {str(e)}") from e
+    if not any(entry["text"].strip() for entry in entries):
+        raise TranscriptUnavailableError(f"비디오 ID '{video_id}'의 자막 내용이 비어있습니다")
+    return entries
+
+def chunk_row(video_id: str, chunk_idx: int, chunk: dict, embedding: list) -> dict:
+    """youtube_videos 저장 행. url은 청크 시작 시점으로 바로 이동하는 링크"""
+    row = {
+        "video_id": video_id,
+        "url": f"https://www.youtube.com/watch?v={video_id}&t={int(chunk['start'])}s",
+        "chunk_index": chunk_idx,
+        "chunk_text": chunk["text"],
+        "embedding": embedding
+    }
+    if CHUNK_TIME_COLUMNS:
+        row["start_seconds"] = chunk["start"]
+        row["end_seconds"] = chunk["end"]
+    return row
 
-def semantic_chunk_transcript(transcript: str, similarity_threshold: float = 0.7) -> tuple:
-    """진정한 시맨틱 기반으로 자막 텍스트를 청킹하여 (청크텍스트, 임베딩) 튜플 리스트로 반환"""
-    import re
-    from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
-    
+def semantic_chunk_transcript(transcript: str, similarity_threshold: float = 0.7, window: int = None) -> tuple:
+    """진정한 시맨틱 기반으로 자막 텍스트를 청킹하여 (청크텍스트, 임베딩) 튜플 리스트로 반환.
+    window를 주면 앞뒤 window개 이웃 문장만 비교하여 메모리를 O(n·w)로 제한"""
     # 1. 문장 단위로 분리
-    sentences = re.split(r'[.!?]+', transcript)
-    sentences = [s.strip() for s in sentences if len(s.strip()) >= 10]  # 최소 10자 이상
+    sentences = split_sentences(transcript, min_length=10)  # 최소 10자 이상
     
     if len(sentences) <= 1:
         if transcript.strip():
             # 단일 청크인 경우 임베딩 생성
             try:
-                embedding = openai.embeddings.create(
-                    input=transcript,
-                    model="text-embedding-3-small"
-                ).data[0].embedding
+                embedding = embed_text(transcript)
                 return [(transcript.strip(), embedding)]
             except Exception as e:
-                print(f"❌ 단일 청크 임베딩 실패: {str(e)}")
+                logger.error(f"❌ 단일 청크 임베딩 실패: {str(e)}")
                 return [(transcript.strip(), None)]
         return []
     
-    print(f"📝 총 {len(sentences)}개 문장을 시맨틱 청킹 중...")
+    logger.debug(f"📝 총 {len(sentences)}개 문장을 시맨틱 청킹 중...")
     
-    # 2. 각 문장을 임베딩
-    embeddings = []
-    valid_sentences = []
-    for i, sentence in enumerate(sentences):
-        try:
-            time.sleep(0.1)  # API 호출 제한 방지
-            embedding_response = openai.embeddings.create(
-                input=sentence,
-                model="text-embedding-3-small"
-            )
-            embedding = embedding_response.data[0].embedding
-            embeddings.append(embedding)
-            valid_sentences.append(sentence)
-            print(f"🔍 문장 {i+1}/{len(sentences)} 임베딩 완료")
-        except Exception as e:
-            print(f"❌ 문장 {i+1} 임베딩 실패: {str(e)}")
-            # 실패한 문장은 제외
-            continue
+    # 2. 문장들을 배치로 임베딩 (실패한 문장은 제외)
+    with stage("embed"):
+        sentence_embeddings = embed_texts(sentences)
+    valid_sentences = [s for s, e in zip(sentences, sentence_embeddings) if e is not None]
+    embeddings = np.asarray([e for e in sentence_embeddings if e is not None], dtype=np.float32)
+    logger.debug(f"🔍 문장 임베딩 완료: {len(valid_sentences)}/{len(sentences)}개")
     
-    if not embeddings:
+    if not len(valid_sentences):
         return [(transcript, None)]
     
-    # 3. 코사인 유사도 계산
-    embeddings_array = np.array(embeddings)
-    similarity_matrix = cosine_similarity(embeddings_array)
+    # 3. 유사도 기반 시맨틱 클러스터링 (벡터 연산, n×n 행렬 없이)
+    with stage("cluster"):
+        clusters = semantic_clusters(embeddings, similarity_threshold, window=window)
     
-    # 4. 시맨틱 클러스터링 (유사도 기반)
+    # 4. 클러스터의 문장들을 하나의 청크로 결합
     chunks_with_embeddings = []
-    used_indices = set()
-    
-    for i in range(len(valid_sentences)):
-        if i in used_indices:
-            continue
-            
-        # 현재 문장과 유사한 문장들을 찾아서 클러스터 생성
-        cluster_indices = [i]
-        used_indices.add(i)
-        
-        for j in range(i + 1, len(valid_sentences)):
-            if j in used_indices:
-                continue
-                
-            # 유사도가 임계값보다 높으면 같은 클러스터에 추가
-            if similarity_matrix[i][j] >= similarity_threshold:
-                cluster_indices.append(j)
-                used_indices.add(j)
-        
-        # 클러스터의 문장들을 하나의 청크로 결합
-        cluster_sentences = [valid_sentences[idx] for idx in cluster_indices]
-        chunk_text = " ".join(cluster_sentences)
+    for cluster_indices in clusters:
+        chunk_text = " ".join(valid_sentences[idx] for idx in cluster_indices)
         
         if len(chunk_text.strip()) >= 20:  # 최소 20자 이상
-            # 클러스터의 첫 번째 문장 임베딩을 청크 임베딩으로 사용
-            chunk_embedding = embeddings[cluster_indices[0]]
+            # 클러스터에 속한 모든 문장 임베딩의 평균을 청크 임베딩으로 사용
+            chunk_embedding = cluster_embedding(embeddings, cluster_indices)
             chunks_with_embeddings.append((chunk_text.strip(), chunk_embedding))
-            print(f"🎯 시맨틱 청크 생성: {len(cluster_sentences)}개 문장 (유사도 임계값: {similarity_threshold})")
     
-    print(f"✅ 시맨틱 청킹 완료: {len(chunks_with_embeddings)}개 청크 생성")
+    logger.info(f"✅ 시맨틱 청킹 완료: {len(chunks_with_embeddings)}개 청크 생성 (유사도 임계값: {similarity_threshold})")
     return chunks_with_embeddings
 
-@mcp.tool()
-def save_channel_youtube_embeddings(channel_id: str) -> str:
-    """YouTube 채널 ID 기반으로 최대 3개의 새로운 영상 자막을 300자씩 청킹하여 임베딩하고 supabase에 저장 (이미 저장된 영상은 건너뜀)"""
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    max_results = 3
-    new_video_ids = []
-    next_page_token = ""
-    tried_video_ids = set()
+# 이미 저장된 것으로 확인된 video_id (프로세스 내 캐시: find_stored_video_ids로 조회했거나 이 프로세스에서 저장을 마친 id만 담음)
+_stored_video_ids = set()
+STORED_ID_PAGE_SIZE = 1000
 
-    # 충분한 수의 새로운 영상을 찾을 때까지 반복 (최대 10페이지까지)
-    page_count = 0
-    max_pages = 10  # 최대 10페이지까지 조회
-    
-    while len(new_video_ids) < max_results and page_count < max_pages:
-        page_count += 1
-        print(f"📄 {page_count}페이지 조회 중... (현재 {len(new_video_ids)}개 찾음)")
-        
-        search_url = (
-            f"{YOUTUBE_API_URL}/search?part=snippet&channelId={channel_id}"
-            f"&maxResults=50&order=date&type=video&key={YOUTUBE_API_KEY}"
+def find_stored_video_ids(video_ids: list) -> set:
+    """video_ids 중 youtube_videos에 이미 저장된 id 집합을 반환.
+    캐시에 없는 id만 in_ 필터로 조회하고, 첫 청크(chunk_index=0) 행만 골라 영상당 한 행만 받음
+    (id STORED_ID_PAGE_SIZE개당 쿼리 한 번).
+    저장 도중 끊겨 청크 체크포인트가 남은 영상은 저장되지 않은 것으로 봄 (다음 수집에서 남은 청크를 저장)"""
+    partial = get_job_store().partial_video_ids(video_ids)
+    unknown = [vid for vid in dict.fromkeys(video_ids) if vid not in _stored_video_ids and vid not in partial]
+    for start in range(0, len(unknown), STORED_ID_PAGE_SIZE):
+        inc("external_calls_total", service="supabase", endpoint="youtube_videos.select")
+        query = (
+            get_supabase().table("youtube_videos")
+            .select("video_id")
+            .in_("video_id", unknown[start:start + STORED_ID_PAGE_SIZE])
+            .eq("chunk_index", 0)
         )
-        if next_page_token:
-            search_url += f"&pageToken={next_page_token}"
-        resp = requests.get(search_url)
-        data = resp.json()
-        page_video_ids = [item["id"]["videoId"] for item in data.get("items", [])]
-        if not page_video_ids:
-            break
-
-        # 이미 저장된 영상 조회
+        resp = rate_limited("supabase", "youtube_videos.select", query.execute)
+        _stored_video_ids.update(row["video_id"] for row in resp.data or [])
+    return {vid for vid in video_ids if vid in _stored_video_ids and vid not in partial}
+
+
+def _stored_chunk_indexes(video_id: str) -> set:
+    """youtube_videos에 이미 저장된 영상의 청크 번호 (체크포인트 기록 전에 끊긴 배치까지 확인)"""
+    inc("external_calls_total", service="supabase", endpoint="youtube_videos.select")
+    query = get_supabase().table("youtube_videos").select("chunk_index").eq("video_id", video_id)
+    resp = rate_limited("supabase", "youtube_videos.select", query.execute)
+    return {row["chunk_index"] for row in resp.data or []}
+
+
+def _saved_chunk_indexes(video_id: str) -> set:
+    """이미 저장된 청크 번호. 부분 저장된 영상이면 체크포인트와 DB에 있는 청크, 아니면 빈 집합"""
+    store = get_job_store()
+    if not store.partial_video_ids([video_id]):
+        return set()
+    saved = store.saved_chunks(video_id) | _stored_chunk_indexes(video_id)
+    logger.info(f"🔁 {video_id} - 부분 저장된 영상 이어서 저장 ({len(saved)}개 청크 저장됨)")
+    return saved
+
+
+# 시도마다 처음부터 다시 세는 청크 진행 상황 (재시작된 작업은 이미 저장된 청크도 청킹하면서 다시 더함)
+_CHUNK_PROGRESS = {"chunks_total": 0, "chunks_saved": 0, "seconds_total": 0, "seconds_saved": 0}
+
+
+def _transcript_seconds(entries: list) -> float:
+    return round(max((float(entry["start"]) + float(entry.get("duration", 0.0)) for entry in entries), default=0.0), 1)
+
+
+def _plan_channel(channel_id: str, max_results: int, force_update: bool) -> dict:
+    """채널에서 수집할 새 영상을 찾아 수집 계획을 반환: {"video_ids", "high_water", "interval", "leftover"}.
+    마지막 동기화 이후 새 영상은 RSS 피드로 찾고, 첫 동기화/공백 발생/force_update일 때만 search 페이징으로 예전 영상까지 찾음"""
+    sync_store = get_channel_sync_store()
+    state = sync_store.get(channel_id)
+    high_water = state["last_published"] if state else None
+    seen_ids = set(state["seen_ids"]) if state else set()
+    new_video_ids = []
+    published_by_id = {}
+
+    # 1. RSS 피드(쿼터 0)에서 마지막 동기화 이후 게시된 영상만 추림
+    feed = None
+    if not force_update:
         try:
-            # 각 영상 ID별로 개별 조회
-            existing_ids = set()
-            for vid in page_video_ids:
-                try:
-                    resp_db = supabase.table("youtube_videos").select("video_id").eq("video_id", vid).limit(1).execute()
-                    if resp_db.data:
-                        existing_ids.add(vid)
-                        print(f"🔍 이미 저장됨: {vid}")
-                except Exception as e:
-                    print(f"❌ 영상 {vid} 조회 오류: {str(e)}")
-            
-            print(f"🔍 현재 페이지 영상: {len(page_video_ids)}개")
-            print(f"🔍 이미 저장된 영상: {len(existing_ids)}개")
-            print(f"🔍 새로운 영상 후보: {len(page_video_ids) - len(existing_ids)}개")
+            with stage("rss"):
+                feed = fetch_channel_feed(channel_id)
+        except Exception as e:
+            logger.warning(f"⚠️ RSS 피드 조회 실패, search로 대체: {str(e)}")
+
+    use_search = feed is None
+    leftover = False
+    if feed is not None:
+        for entry in feed:
+            published_by_id[entry["video_id"]] = parse_published(entry["published"])
+        delta = [
+            entry for entry in feed
+            if entry["video_id"] not in seen_ids
+            and (high_water is None or published_by_id[entry["video_id"]] > high_water)
+        ]
+        logger.info(f"📡 RSS 피드: {len(feed)}개 중 마지막 동기화 이후 {len(delta)}개")
+
+        if state and not delta:
+            return {"video_ids": [], "high_water": high_water,
+                    "interval": publish_interval(list(published_by_id.values())), "leftover": False}
+
+        # 피드가 high-water mark까지 닿으면 그 사이 영상은 모두 피드 안에 있음
+        covered = state is not None and len(delta) < len(feed)
+        try:
+            existing_ids = find_stored_video_ids([entry["video_id"] for entry in delta])
         except Exception as e:
-            print(f"❌ DB 조회 오류: {str(e)}")
+            logger.error(f"❌ DB 조회 오류: {str(e)}")
             existing_ids = set()
 
-        # 새로운 영상만 추가
-        new_found_this_page = 0
-        for vid in page_video_ids:
-            if vid not in existing_ids and vid not in new_video_ids and vid not in tried_video_ids:
-                new_video_ids.append(vid)
-                new_found_this_page += 1
-                print(f"✅ 새로운 영상 추가: {vid}")
+        if covered:
+            # 오래된 것부터 처리해서 max_results에 걸려 남은 영상은 다음 동기화 때 이어서 처리
+            for entry in reversed(delta):
+                vid = entry["video_id"]
+                if vid in existing_ids:
+                    high_water = published_by_id[vid]
+                    continue
                 if len(new_video_ids) >= max_results:
+                    leftover = True
                     break
-            tried_video_ids.add(vid)
+                new_video_ids.append(vid)
+                high_water = published_by_id[vid]
+        else:
+            # 첫 동기화이거나 피드 범위를 넘는 공백: 최신순으로 고르고 부족하면 search로 채움
+            candidates = [entry["video_id"] for entry in delta if entry["video_id"] not in existing_ids]
+            new_video_ids = candidates[:max_results]
+            skipped = candidates[max_results:]
+            if skipped:
+                # max_results에 걸려 남은 피드 영상은 seen_ids에 넣지 않고, high-water mark도 그중 가장 오래된 영상
+                # 직전까지만 올려서 다음 동기화(바로 예약)에서 오래된 것부터 이어서 처리
+                high_water = published_before(min(published_by_id[vid] for vid in skipped))
+                leftover = True
+            else:
+                high_water = max(published_by_id.values(), default=high_water)
+            use_search = len(new_video_ids) < max_results
+
+    # 2. search 페이징 (호출당 100 단위): 첫 동기화/공백/강제 업데이트일 때만
+    if use_search:
+        next_page_token = ""
+        tried_video_ids = set(new_video_ids)
+
+        # 충분한 수의 새로운 영상을 찾을 때까지 반복 (최소 10페이지, 목표가 크면 그만큼 더 조회)
+        page_count = 0
+        max_pages = max(10, (max_results + 49) // 50 * 2)
         
-        print(f"📈 이번 페이지에서 찾은 새로운 영상: {new_found_this_page}개")
+        while len(new_video_ids) < max_results and page_count < max_pages:
+            page_count += 1
+            logger.debug(f"📄 {page_count}페이지 조회 중... (현재 {len(new_video_ids)}개 찾음)")
+            
+            with stage("search"):
+                data = youtube_api_get("search", {
+                    "part": "snippet", "channelId": channel_id, "maxResults": 50,
+                    "order": "date", "type": "video", "pageToken": next_page_token,
+                }, fields="nextPageToken,items(id/videoId,snippet/publishedAt)")
+            items = data.get("items", [])
+            page_video_ids = [item["id"]["videoId"] for item in items]
+            if not page_video_ids:
+                break
+            for item in items:
+                published = item.get("snippet", {}).get("publishedAt")
+                if published:
+                    published_by_id[item["id"]["videoId"]] = parse_published(published)
 
-        next_page_token = data.get("nextPageToken")
-        if not next_page_token:
-            break
+            # 이미 저장된 영상 조회 (페이지 단위 집합 조회)
+            try:
+                existing_ids = find_stored_video_ids(page_video_ids)
+                for vid in existing_ids:
+                    logger.debug(f"🔍 이미 저장됨: {vid}")
+                
+                logger.debug(f"🔍 현재 페이지 영상: {len(page_video_ids)}개")
+                logger.debug(f"🔍 이미 저장된 영상: {len(existing_ids)}개")
+                logger.debug(f"🔍 새로운 영상 후보: {len(page_video_ids) - len(existing_ids)}개")
+            except Exception as e:
+                logger.error(f"❌ DB 조회 오류: {str(e)}")
+                existing_ids = set()
+
+            # 새로운 영상만 추가
+            new_found_this_page = 0
+            for vid in page_video_ids:
+                if vid not in existing_ids and vid not in new_video_ids and vid not in tried_video_ids:
+                    new_video_ids.append(vid)
+                    new_found_this_page += 1
+                    logger.debug(f"✅ 새로운 영상 추가: {vid}")
+                    if len(new_video_ids) >= max_results:
+                        break
+                tried_video_ids.add(vid)
+            
+            logger.debug(f"📈 이번 페이지에서 찾은 새로운 영상: {new_found_this_page}개")
+
+            next_page_token = data.get("nextPageToken")
+            if not next_page_token:
+                break
+
+        if high_water is None and published_by_id:
+            # 동기화 기록 없이 search만 쓴 경우 가장 최근 게시 시각을 high-water mark로
+            high_water = max(published_by_id.values())
     
-    print(f"📊 찾은 새로운 영상: {len(new_video_ids)}개 (목표: {max_results}개)")
+    logger.info(f"📊 찾은 새로운 영상: {len(new_video_ids)}개 (목표: {max_results}개)")
     
     # 충분한 영상을 찾지 못했다면 경고
     if len(new_video_ids) < max_results:
-        print(f"⚠️ 새로운 영상이 부족합니다. (찾음: {len(new_video_ids)}개, 목표: {max_results}개)")
-        print(f"💡 채널에 새로운 영상이 없거나 이미 모두 저장되었을 수 있습니다.")
+        logger.warning(f"⚠️ 새로운 영상이 부족합니다. (찾음: {len(new_video_ids)}개, 목표: {max_results}개)")
+        logger.info(f"💡 채널에 새로운 영상이 없거나 이미 모두 저장되었을 수 있습니다.")
 
-    if not new_video_ids:
-        return "저장할 새로운 영상이 없습니다."
+    return {"video_ids": new_video_ids, "high_water": high_water,
+            "published": {vid: published_by_id.get(vid) for vid in new_video_ids},
+            "interval": publish_interval(list(published_by_id.values())), "leftover": leftover}
 
-    count = 0
-    # 상세 정보 조회 및 임베딩/저장
-    for i in range(0, len(new_video_ids), 50):
-        batch_ids = new_video_ids[i:i + 50]
-        details_url = f"{YOUTUBE_API_URL}/videos?part=snippet&id={','.join(batch_ids)}&key={YOUTUBE_API_KEY}"
-        details_resp = requests.get(details_url)
-        details_resp.raise_for_status()
-        video_data = details_resp.json()
-
-        for video in video_data.get("items", []):
-            video_id = video["id"]
-            url = f"https://www.youtube.com/watch?v={video_id}"
-            print(f"처리 중: {video_id} - 자막 추출 시작")
-            
-            # 자막 가져오기
-            try:
-                transcript = get_youtube_transcript(url)
-                print(f"✅ {video_id} - 자막 추출 완료 ({len(transcript)}자)")
-            except Exception as e:
-                print(f"❌ {video_id} - 자막 추출 실패: {str(e)}")
+
+def _record_channel_sync(channel_id: str, plan: dict, saved: int = 0, failed: set = frozenset()):
+    """수집 결과를 채널 동기화 상태에 기록. 저장에 실패한 영상(failed)은 seen_ids에 넣지 않고,
+    high-water mark도 그중 가장 오래된 영상 직전까지만 올려서 다음 동기화에서 다시 수집되게 함"""
+    sync_store = get_channel_sync_store()
+    high_water = plan["high_water"]
+    if failed:
+        previous = sync_store.get(channel_id)
+        previous_high_water = previous["last_published"] if previous else None
+        # 예전 계획(체크포인트)에는 게시 시각이 없음: 모르면 high-water mark를 올리지 않음
+        published = [plan.get("published", {}).get(vid) for vid in failed]
+        if None in published:
+            high_water = previous_high_water
+        else:
+            high_water = min(high_water, published_before(min(published))) if high_water else None
+            if previous_high_water and (high_water is None or high_water < previous_high_water):
+                high_water = previous_high_water
+        logger.warning(f"⚠️ {channel_id} - 저장하지 못한 영상 {len(failed)}개는 다음 동기화에서 다시 수집")
+    seen_ids = [vid for vid in plan["video_ids"] if vid not in failed]
+    sync_store.update(channel_id, high_water, seen_ids, plan["interval"], saved=saved, due_now=plan["leftover"])
+
+
+def _ingest_pipeline(items, job=None, fetch: bool = True) -> list:
+    """영상 항목({"video_id"})들을 자막 수집 → 청킹 → 임베딩 → DB 저장 파이프라인으로 수집하고
+    끝까지 처리한 영상별 {"video_id", "chunks", "pending", "saved"} 목록을 반환 (saved < pending이면 부분 저장).
+    자막을 가져오지 못한 영상은 "error"와 "transcript_missing"(자막이 없는 영상이면 True)이 붙음.
+    임베딩/저장 단계에서 실패한 배치는 저장 0건으로 세므로 영상이 목록에서 빠지지 않음.
+    청킹 단계는 청크를 INGEST_CHUNK_BATCH_SIZE개씩 넘기므로 긴 영상도 앞쪽 청크부터 임베딩/저장되어 바로 검색되고,
+    메모리에는 큐에 든 배치 몇 개만 남음. 부분 저장된 영상은 남은 청크만 임베딩/저장.
+    fetch=False이면 항목에 자막 항목("entries")이 이미 들어 있음"""
+    store = get_job_store()
+    videos = {}  # video_id → 저장 상태 (청킹 단계와 저장 단계 워커가 함께 갱신)
+    videos_lock = threading.Lock()
+    finished = []
+
+    def finish_if_done(video_id):
+        # 청킹이 끝났고 넘긴 배치가 모두 저장되었으면 영상 완료 처리 (한 번만)
+        with videos_lock:
+            state = videos[video_id]
+            if not state["chunked"] or state["written"] < state["batches"] or state["finished"]:
+                return
+            state["finished"] = True
+        complete = state["saved"] == state["pending"]
+        if complete:
+            store.finish_video(video_id)
+            _stored_video_ids.add(video_id)
+        else:
+            logger.warning(f"⚠️ {video_id} - {state['pending'] - state['saved']}개 청크 미저장, 다음 수집에서 이어서 저장")
+        if job is not None:
+            job.add(videos_done=1, videos_partial=0 if complete else 1)
+        logger.info(f"🎉 {video_id} - {state['saved']}개 청크 저장 완료! (전체 {state['chunks']}개 청크)")
+        with videos_lock:
+            finished.append({"video_id": video_id, "chunks": state["chunks"], "pending": state["pending"],
+                             "saved": state["saved"]})
+
+    def lost():
+        # 다른 워커가 작업을 이어받음: 남은 영상/배치는 처리하지 않고 파이프라인을 비움
+        return job is not None and job.lost
+
+    def iter_items():
+        for item in items:
+            if lost():
+                break
+            yield item
+
+    def fetch_stage(item):
+        # 자막 타임라인 항목 가져오기
+        logger.debug(f"처리 중: {item['video_id']} - 자막 추출 시작")
+        try:
+            item["entries"] = fetch_timed_transcript(item["video_id"])
+        except Exception as e:
+            logger.warning(f"❌ {item['video_id']} - 자막 추출 실패: {str(e)}")
+            if job is not None:
+                job.add(videos_done=1, videos_skipped=1)
+            with videos_lock:
+                finished.append({"video_id": item["video_id"], "chunks": 0, "pending": 0, "saved": 0,
+                                 "error": str(e), "transcript_missing": isinstance(e, TranscriptUnavailableError)})
+            return None
+        logger.debug(f"✅ {item['video_id']} - 자막 추출 완료 ({len(item['entries'])}개 항목)")
+        return item
+
+    def chunk_stage(item):
+        video_id = item["video_id"]
+        entries = item.pop("entries")
+        saved_before = _saved_chunk_indexes(video_id)
+        # 첫 배치를 저장하기 전에 시작을 기록해야 중간에 끊겨도 부분 저장 상태로 남음
+        store.start_video(video_id, job.job_id if job is not None else None)
+        state = {"chunks": 0, "pending": 0, "saved": 0, "batches": 0, "written": 0, "chunked": False, "finished": False}
+        with videos_lock:
+            videos[video_id] = state
+        if job is not None:
+            job.add(seconds_total=_transcript_seconds(entries))
+        return iter_batches(video_id, entries, saved_before, state)
+
+    def iter_batches(video_id, entries, saved_before, state):
+        # 토큰 예산 청크(시작/끝 시각 보존)를 만들면서 저장할 청크를 배치로 넘김. 임베딩 큐가 차면 청킹도 멈춤.
+        # 청킹은 결정적이라 재시작해도 청크 번호가 같음
+        batch = {"video_id": video_id, "indexes": [], "chunks": [], "seconds": 0.0}
+        counted = {"chunks_total": 0, "chunks_saved": 0, "seconds_saved": 0.0}  # 아직 진행 상황에 더하지 않은 값
+        covered = 0.0
+        for idx, chunk in enumerate(iter_timed_chunks(entries)):
+            if lost():
+                return
+            # 청크가 새로 덮는 자막 구간(초). 겹치는 청크(CHUNK_OVERLAP_TOKENS)도 두 번 세지 않음
+            span = max(0.0, chunk["end"] - max(chunk["start"], covered))
+            covered = max(covered, chunk["end"])
+            state["chunks"] += 1
+            counted["chunks_total"] += 1
+            if idx in saved_before:
+                counted["chunks_saved"] += 1
+                counted["seconds_saved"] += span
                 continue
-                
-            # 500자씩 청킹
-            chunks = chunk_transcript(transcript, chunk_size=500)
-            print(f"📝 {video_id} - {len(chunks)}개 청크로 분할")
-            
-            chunk_count = 0
-            for chunk_idx, chunk in enumerate(chunks):
-                # OpenAI 임베딩
-                try:
-                    time.sleep(1)
-                    embedding = openai.embeddings.create(
-                        input=chunk,
-                        model="text-embedding-3-small"
-                    ).data[0].embedding
-                except Exception as e:
-                    print(f"❌ {video_id} - 임베딩 실패 (청크 {chunk_idx}): {str(e)}")
-                    continue
-                    
-                # Supabase 저장
+            batch["indexes"].append(idx)
+            batch["chunks"].append(chunk)
+            batch["seconds"] += span
+            if len(batch["indexes"]) >= INGEST_CHUNK_BATCH_SIZE:
+                yield emit(batch, state, counted)
+                batch = {"video_id": video_id, "indexes": [], "chunks": [], "seconds": 0.0}
+        if batch["indexes"]:
+            yield emit(batch, state, counted)
+        elif job is not None and counted["chunks_total"]:
+            job.add(**counted)
+        logger.debug(f"📝 {video_id} - {state['chunks']}개 청크로 분할 (저장할 청크 {state['pending']}개)")
+        with videos_lock:
+            state["chunked"] = True
+        finish_if_done(video_id)
+
+    def emit(batch, state, counted):
+        with videos_lock:
+            state["batches"] += 1
+            state["pending"] += len(batch["indexes"])
+        if job is not None:
+            job.add(**counted)
+            counted.update(chunks_total=0, chunks_saved=0, seconds_saved=0.0)
+        return batch
+
+    def embed_stage(batch):
+        # OpenAI 임베딩 (배치 하나를 요청 한 번으로). 실패하면 배치 전체를 임베딩 실패로 넘겨
+        # 저장 단계가 저장 0건으로 세도록 함 (배치를 버리면 영상이 끝나지 않음)
+        if lost():
+            return None
+        try:
+            batch["embeddings"] = embed_texts([chunk["text"] for chunk in batch["chunks"]])
+        except Exception as e:
+            logger.error(f"❌ {batch['video_id']} - 청크 {len(batch['indexes'])}개 임베딩 실패: {str(e)}")
+            batch["embeddings"] = [None] * len(batch["indexes"])
+        return batch
+
+    def write_stage(batch):
+        # Supabase 다건 insert 후 flush (저장하자마자 검색 가능). 저장된 행은 청크 체크포인트에 기록
+        if lost():
+            return None
+        video_id = batch["video_id"]
+
+        def record(rows):
+            store.record_chunks(video_id, [row["chunk_index"] for row in rows])
+            if job is not None and not job.lost:
                 try:
-                    supabase.table("youtube_videos").insert({
-                        "video_id": video_id,
-                        "url": url,
-                        "chunk_index": chunk_idx,
-                        "chunk_text": chunk,
-                        "embedding": embedding
-                    }).execute()
-                    count += 1
-                    chunk_count += 1
-                except Exception as e:
-                    print(f"❌ {video_id} - DB 저장 실패 (청크 {chunk_idx}): {str(e)}")
+                    job.add(chunks_saved=len(rows))
+                except JobLostError:
+                    pass  # 저장된 행의 청크 체크포인트는 남기고, 작업은 파이프라인이 멈추면서 정리
+
+        writer = ChunkWriter(get_supabase(), on_rows=record)
+        try:
+            for chunk_idx, chunk, embedding in zip(batch["indexes"], batch["chunks"], batch["embeddings"]):
+                if embedding is None:
+                    logger.error(f"❌ {video_id} - 임베딩 실패 (청크 {chunk_idx})")
                     continue
-            
-            print(f"🎉 {video_id} - {chunk_count}개 청크 저장 완료!")
+                writer.add(chunk_row(video_id, chunk_idx, chunk, embedding))
+            writer.flush()
+        except Exception as e:
+            # 저장된 행은 이미 체크포인트에 기록됨. 나머지는 미저장으로 세고 배치는 끝난 것으로 처리
+            logger.error(f"❌ {video_id} - 청크 저장 실패 ({writer.saved}/{len(batch['indexes'])}개 저장): {str(e)}")
+        if job is not None and writer.saved == len(batch["indexes"]):
+            job.add(seconds_saved=batch["seconds"])
+        with videos_lock:
+            videos[video_id]["saved"] += writer.saved
+            videos[video_id]["written"] += 1
+        finish_if_done(video_id)
+        return {"video_id": video_id, "saved": writer.saved}
+
+    stages = [
+        Stage("chunk", chunk_stage, INGEST_CHUNK_WORKERS, fan_out=True),
+        Stage("embed", embed_stage, INGEST_EMBED_WORKERS),
+        Stage("db_write", write_stage, INGEST_WRITE_WORKERS),
+    ]
+    if fetch:
+        stages.insert(0, Stage("transcript", fetch_stage, INGEST_FETCH_WORKERS))
+    pipeline = IngestPipeline(stages)
+    pipeline.run(iter_items())
+    pipeline.log_report()
+    return finished
+
+
+def _ingest_videos(video_ids: list, job=None) -> list:
+    """영상들을 스트리밍 파이프라인(_ingest_pipeline)으로 수집하고 영상별 결과 목록을 반환"""
+    def iter_videos():
+        # 상세 정보 조회 (50개 단위). 파이프라인 큐가 차면 다음 조회는 대기
+        for i in range(0, len(video_ids), 50):
+            batch_ids = video_ids[i:i + 50]
+            video_data = youtube_api_get("videos", {"part": "id", "id": ",".join(batch_ids)}, fields="items(id)")
+            for video in video_data.get("items", []):
+                yield {"video_id": video["id"]}
+
+    return _ingest_pipeline(iter_videos(), job)
+
+
+@instrument_tool
+def ingest_channel(channel_id: str, max_results: int = 3, force_update: bool = False, job=None) -> str:
+    """YouTube 채널 ID 기반으로 최대 max_results개(기본 3개)의 새로운 영상 자막을 토큰 예산 단위로 청킹하여 임베딩하고 supabase에 저장 (이미 저장된 영상은 건너뜀).
+    수집 작업 핸들러 (스크립트/벤치마크는 직접 호출). job이 있으면 수집 계획을 작업 체크포인트로 저장하고,
+    재시작된 작업은 저장된 계획에서 끝나지 않은 영상만 이어서 수집"""
+    plan = job.checkpoint if job is not None else None
+    if plan is None:
+        plan = _plan_channel(channel_id, max_results, force_update)
+        video_ids = plan["video_ids"]
+        if job is not None:
+            job.save_checkpoint(plan)
+            job.update(videos_total=len(video_ids), videos_done=0, **_CHUNK_PROGRESS)
+    else:
+        # 재시작된 작업: 저장된 계획에서 저장이 끝나지 않은 영상만 (부분 저장된 영상은 남은 청크부터)
+        done = find_stored_video_ids(plan["video_ids"])
+        video_ids = [vid for vid in plan["video_ids"] if vid not in done]
+        logger.info(f"🔁 {channel_id} - 중단된 채널 수집 재개: {len(done)}개 영상 완료, {len(video_ids)}개 남음")
+        job.update(videos_total=len(plan["video_ids"]), videos_done=len(done), **_CHUNK_PROGRESS)
+
+    if not plan["video_ids"]:
+        _record_channel_sync(channel_id, plan)
+        return "저장할 새로운 영상이 없습니다."
 
+    results = _ingest_videos(video_ids, job)
+    if job is not None:
+        job.check()  # 다른 워커가 이어받았으면 동기화 상태를 기록하지 않고 멈춤
+    count = sum(result["saved"] for result in results)
+    saved_videos = len([result for result in results if result["saved"]]) + len(plan["video_ids"]) - len(video_ids)
+    # 자막 오류(자막 없는 영상 제외)나 미저장 청크가 남은 영상만 실패. videos API가 돌려주지 않은 영상(삭제/비공개)은 제외
+    failed = {
+        result["video_id"] for result in results
+        if (result.get("error") and not result["transcript_missing"]) or result["saved"] < result["pending"]
+    }
+    _record_channel_sync(channel_id, plan, saved=saved_videos, failed=failed)
+    partial = [result["video_id"] for result in results if result["saved"] < result["pending"]]
+    if partial:
+        return (f"총 {count}개 자막 청크가 저장되었습니다. 일부 청크가 저장되지 않은 영상 {len(partial)}개 "
+                f"(다음 수집에서 이어서 저장): {', '.join(partial)}")
     return f"총 {count}개 자막 청크가 저장되었습니다."
 
 
-@mcp.tool()
-def search_similar_youtube_video(query: str) -> dict:
-    """검색어를 임베딩하고 Supabase RPC를 통해 가장 유사한 자막 청크(및 비디오) 정보를 반환"""
+def _submitted(job: dict, created: bool) -> dict:
+    status = job_status(job)
+    status["message"] = (f"수집 작업을 등록했습니다 (작업 ID: {job['job_id']})" if created
+                         else f"같은 대상의 수집 작업이 이미 있습니다 (작업 ID: {job['job_id']}, 상태: {job['status']})")
+    return status
+
+
+@async_tool(mcp)
+@instrument_tool
+def save_channel_youtube_embeddings(channel_id: str, max_results: int = 3, force_update: bool = False) -> dict:
+    """YouTube 채널의 새로운 영상 최대 max_results개(기본 3개)를 수집하는 백그라운드 작업을 등록하고 작업 ID를 바로 반환.
+    자막을 토큰 예산 단위로 청킹/임베딩하여 supabase에 저장 (이미 저장된 영상은 건너뜀). 진행 상황은 get_ingest_job으로 확인.
+    마지막 동기화 이후 새 영상은 RSS 피드로 찾고, 첫 동기화/공백 발생/force_update일 때만 search 페이징으로 예전 영상까지 찾음"""
+    job, created = submit_job("channel", channel_id, {
+        "channel_id": channel_id, "max_results": max_results, "force_update": force_update,
+    })
+    return _submitted(job, created)
+
+
+def _sync_summary(sync_store, due, results):
+    tracked = sync_store.tracked_channels()
+    return {
+        "synced": len(due),
+        "tracked": len(tracked),
+        "results": results,
+        # 워커가 가져가야 하는 작업 (mcp_client 일회성 실행은 이 목록이 비어 있지 않으면 백그라운드 drain을 띄움)
+        "queued_job_ids": [result["job_id"] for result in results.values() if result["status"] == "queued"],
+        "schedule": [{
+            "channel_id": channel["channel_id"],
+            "last_published": channel["last_published"],
+            "publish_interval_hours": round(channel["publish_interval"] / 3600, 1) if channel["publish_interval"] else None,
+            "next_sync_at": datetime.fromtimestamp(channel["next_sync_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+        } for channel in tracked],
+    }
+
+
+@async_tool(mcp)
+@instrument_tool
+def sync_all_tracked_channels(max_results: int = 3, max_channels: int = 10) -> dict:
+    """한 번 이상 저장한 채널 중 다음 동기화 시각이 지난 채널을 최대 max_channels개 골라 채널별 수집 작업을 등록 (작업 ID를 바로 반환).
+    다음 동기화 시각은 채널의 게시 주기로 정해지므로 자주 올리는 채널이 더 자주 동기화됨"""
+    sync_store = get_channel_sync_store()
+    due = sync_store.due_channels()[:max(0, max_channels)]
+    logger.info(f"🔄 동기화 대상 채널: {len(due)}개")
+
+    results = {}
+    for channel in due:
+        channel_id = channel["channel_id"]
+        job, _ = submit_job("channel", channel_id, {
+            "channel_id": channel_id, "max_results": max_results, "force_update": False,
+        })
+        results[channel_id] = {"job_id": job["job_id"], "status": job["status"]}
+
+    return _sync_summary(sync_store, due, results)
+
+
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+# hybrid 모드에서 각 검색이 융합 전에 가져오는 후보 수
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# 일괄 검색: 한 번에 받는 최대 검색어 수, 로컬 인덱스가 없을 때 동시에 보내는 RPC 수
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", "1000"))
+BATCH_SEARCH_RPC_WORKERS = int(os.getenv("BATCH_SEARCH_RPC_WORKERS", "8"))
+
+
+def _cached_search(cache_key):
+    """검색 결과 캐시 조회 (정규화된 검색어 기준). 없으면 None"""
+    cached = _search_cache.get(cache_key)
+    if cached is not None:
+        inc("cache_hits_total", cache="search")
+        return dict(cached)
+    inc("cache_misses_total", cache="search")
+    return None
+
+
+def _local_search(embedding, top_k):
+    """로컬 벡터 인덱스 검색 (설정된 경우, 실패하거나 인덱스가 없으면 None → RPC로 대체)"""
     try:
-        # 1. OpenAI를 사용해 쿼리 임베딩 생성
-        embedding_response = openai.embeddings.create(
-            input=query,
-            model="text-embedding-3-small"
-        )
-        embedding = embedding_response.data[0].embedding
-
-        # 2. Supabase RPC 호출 (input_vector는 JSON 형태 리스트 그대로 넘김)
-        response = supabase.rpc("match_youtube_video", {
-            "input_vector": embedding
-        }).execute()
-
-        # 3. 결과 반환
-        if response.data and len(response.data) > 0:
-            result = response.data[0]
-            return {
-                "video_id": result.get("video_id"),
-                "url": result.get("url"),
-                "chunk_index": result.get("chunk_index"),
-                "chunk_text": result.get("chunk_text"),
-                "score": result.get("score", None)
-            }
+        with stage("local_index"):
+            index = get_local_index(get_supabase)
+            if index is not None and len(index):
+                return index.search(embedding, top_k=max(1, top_k))
+    except Exception as e:
+        logger.warning(f"⚠️ 로컬 벡터 인덱스 검색 실패, RPC로 대체: {str(e)}")
+    return None
+
+
+def _keyword_search(query, top_k):
+    """로컬 BM25 역색인으로 chunk_text 키워드 검색 (임베딩 호출 없음)"""
+    with stage("keyword"):
+        return get_keyword_index(get_supabase).search(query, top_k=max(1, top_k))
+
+
+def _search_depth(mode, top_k):
+    return max(top_k, HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+
+
+def _fuse(mode, keyword_matches, vector_matches, top_k):
+    if mode == "keyword":
+        return keyword_matches
+    if mode == "vector":
+        return vector_matches
+    return reciprocal_rank_fusion([keyword_matches, vector_matches], top_k=max(1, top_k))
+
+
+def _search_result(cache_key, matches, top_k):
+    if not matches:
+        return {"error": "No similar video found."}
+    results = [{
+        "video_id": result.get("video_id"),
+        "url": result.get("url"),
+        "chunk_index": result.get("chunk_index"),
+        "chunk_text": result.get("chunk_text"),
+        "start_seconds": result.get("start_seconds"),
+        "end_seconds": result.get("end_seconds"),
+        "score": result.get("score", None)
+    } for result in matches]
+    best = dict(results[0])
+    if top_k > 1:
+        best["matches"] = results
+    _search_cache.put(cache_key, best)
+    return dict(best)
+
+
+def _rpc_match(embedding, top_k):
+    """Supabase match_youtube_video RPC (input_vector는 JSON 형태 리스트 그대로 넘김)"""
+    inc("external_calls_total", service="supabase", endpoint="rpc.match_youtube_video")
+    started = time.perf_counter()
+    query = get_supabase().rpc("match_youtube_video", {
+        "input_vector": embedding
+    })
+    response = rate_limited("supabase", "rpc.match_youtube_video", query.execute)
+    observe("external_call_seconds", time.perf_counter() - started,
+            service="supabase", endpoint="rpc.match_youtube_video")
+    return (response.data or [])[:max(1, top_k)]
+
+
+def _vector_search_many(queries, top_k):
+    """검색어들을 한 번에 임베딩하고 쿼리별 결과 목록을 반환 (임베딩에 실패한 검색어는 None).
+    로컬 벡터 인덱스가 있으면 행렬 곱 한 번으로 점수를 계산하고, 없으면 RPC를 동시에 호출"""
+    with stage("embed"):
+        embeddings = embed_texts(queries)  # 요청 한도 안에서 한 요청으로 묶임
+    valid = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+    results = [None] * len(queries)
+    if not valid:
+        return results
+
+    try:
+        with stage("local_index"):
+            index = get_local_index(get_supabase)
+            if index is not None and len(index):
+                found = index.search_many([embeddings[i] for i in valid], top_k=max(1, top_k))
+                for i, matches in zip(valid, found):
+                    results[i] = matches
+                return results
+    except Exception as e:
+        logger.warning(f"⚠️ 로컬 벡터 인덱스 검색 실패, RPC로 대체: {str(e)}")
+
+    with stage("rpc"), ThreadPoolExecutor(max_workers=min(BATCH_SEARCH_RPC_WORKERS, len(valid))) as executor:
+        found = executor.map(run_in_context(_rpc_match), [embeddings[i] for i in valid], [top_k] * len(valid))
+        for i, matches in zip(valid, found):
+            results[i] = matches
+    return results
+
+
+_async_supabase = None
+_async_supabase_lock = asyncio.Lock()
+
+
+async def get_async_supabase():
+    """비동기 도구용 Supabase 클라이언트 (처음 쓸 때 생성)"""
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_supabase_lock:
+            if _async_supabase is None:
+                from supabase import acreate_client
+                _async_supabase = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return _async_supabase
+
+
+@async_tool(mcp)
+@instrument_tool
+def search_similar_youtube_video_batch(queries: list, top_k: int = 1, mode: str = "vector") -> list:
+    """여러 검색어를 한 번에 검색해서 입력 순서대로 결과 목록을 반환 (각 결과는 search_similar_youtube_video와 같은 형식에 query 추가).
+    임베딩은 한 요청으로 만들고, 로컬 벡터 인덱스가 있으면 행렬 곱 한 번으로 점수를 계산 (없으면 RPC를 동시에 호출).
+    mode는 search_similar_youtube_video와 같음 (vector/keyword/hybrid). 검색어 평가용"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode는 {', '.join(SEARCH_MODES)} 중 하나여야 합니다: {mode}")
+    if len(queries) > BATCH_SEARCH_MAX_QUERIES:
+        raise ValueError(f"한 번에 최대 {BATCH_SEARCH_MAX_QUERIES}개 검색어까지 보낼 수 있습니다 ({len(queries)}개)")
+
+    # 1. 캐시에 있는 검색어는 바로 채우고, 나머지는 정규화된 검색어 기준으로 한 번씩만 검색
+    results = [None] * len(queries)
+    pending = {}
+    for pos, query in enumerate(queries):
+        cache_key = (normalize_query(query), top_k, mode)
+        cached = _cached_search(cache_key)
+        if cached is not None:
+            results[pos] = dict(cached, query=query)
         else:
-            return {"error": "No similar video found."}
+            pending.setdefault(cache_key, []).append(pos)
+    if not pending:
+        return results
+
+    # 2. 키워드 / 벡터 검색 (벡터는 임베딩 한 요청 + 행렬 곱 한 번)
+    unique_queries = [queries[positions[0]] for positions in pending.values()]
+    depth = _search_depth(mode, top_k)
+    keyword_found = [_keyword_search(query, depth) for query in unique_queries] \
+        if mode != "vector" else [None] * len(unique_queries)
+    vector_found = _vector_search_many(unique_queries, depth) \
+        if mode != "keyword" else [None] * len(unique_queries)
+
+    # 3. 결과 합치기 (검색어별 캐시 저장)
+    for (cache_key, positions), keyword_matches, vector_matches in zip(pending.items(), keyword_found, vector_found):
+        if mode != "keyword" and vector_matches is None:
+            result = {"error": "임베딩 생성에 실패했습니다"}
+        else:
+            result = _search_result(cache_key, _fuse(mode, keyword_matches, vector_matches, top_k), top_k)
+        for pos in positions:
+            results[pos] = dict(result, query=queries[pos])
+    return results
+
+
+async def _avector_search(query, top_k):
+    # 1. 쿼리 임베딩 생성 (임베딩 캐시 경유, AsyncOpenAI)
+    with stage("embed"):
+        embedding = await aembed_text(query)
+
+    # 2. 로컬 벡터 인덱스 검색
+    matches = await run_blocking(_local_search, embedding, top_k)
+
+    # 3. Supabase RPC 호출 (비동기 클라이언트)
+    if matches is None:
+        client = await get_async_supabase()
+        inc("external_calls_total", service="supabase", endpoint="rpc.match_youtube_video")
+        started = time.perf_counter()
+        with stage("rpc"):
+            query = client.rpc("match_youtube_video", {
+                "input_vector": embedding
+            })
+            response = await get_rate_limiter("supabase", "rpc.match_youtube_video").acall(query.execute)
+        observe("external_call_seconds", time.perf_counter() - started,
+                service="supabase", endpoint="rpc.match_youtube_video")
+        matches = (response.data or [])[:max(1, top_k)]
+    return matches
+
+
+async def _none():
+    return None
+
+
+@mcp.tool(name="search_similar_youtube_video")
+@instrument_tool(name="search_similar_youtube_video")
+async def asearch_similar_youtube_video(query: str, top_k: int = 1, mode: str = "vector") -> dict:
+    """검색어와 가장 유사한 자막 청크(및 비디오) 정보를 반환 (top_k>1이면 matches에 상위 결과 포함).
+    mode="vector": 검색어 임베딩으로 검색 (LOCAL_VECTOR_INDEX=numpy|faiss 이면 로컬 인덱스, 아니면 Supabase RPC)
+    mode="keyword": 로컬 BM25 역색인으로 chunk_text 키워드 검색 (임베딩 호출 없음, 요리/재료 이름처럼 정확한 단어에 적합)
+    mode="hybrid": 두 검색 순위를 reciprocal rank fusion으로 합침"""
+    # 수집 도구가 실행 중이어도 이벤트 루프를 막지 않도록 벡터 검색은 비동기 클라이언트로,
+    # hybrid 모드의 키워드 검색은 벡터 검색과 동시에 실행
+    if mode not in SEARCH_MODES:
+        return {"error": f"mode는 {', '.join(SEARCH_MODES)} 중 하나여야 합니다: {mode}"}
+    try:
+        cache_key = (normalize_query(query), top_k, mode)
+        cached = _cached_search(cache_key)
+        if cached is not None:
+            return cached
+
+        depth = _search_depth(mode, top_k)
+        keyword_matches, vector_matches = await asyncio.gather(
+            run_blocking(_keyword_search, query, depth) if mode != "vector" else _none(),
+            _avector_search(query, depth) if mode != "keyword" else _none(),
+        )
+        return _search_result(cache_key, _fuse(mode, keyword_matches, vector_matches, top_k), top_k)
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ 유사도 검색 실패: {str(e)}")
         return {"error": str(e)}
 
 
-@mcp.tool()
-def save_single_video_embedding(video_url: str) -> str:
-    """단일 YouTube 영상 URL을 입력받아 자막을 추출하고 300글자씩 청킹하여 임베딩 저장"""
+def search_similar_youtube_video(query: str, top_k: int = 1, mode: str = "vector") -> dict:
+    """asearch_similar_youtube_video의 동기 버전 (워커 풀/스크립트용)"""
+    return run_coroutine(asearch_similar_youtube_video(query, top_k, mode))
+
+
+@async_tool(mcp)
+@instrument_tool
+def get_search_cache_stats() -> dict:
+    """유사도 검색 결과 캐시와 임베딩 캐시의 적중률 통계, 키워드 인덱스 크기를 반환"""
+    embedding_cache = get_embedding_cache()
+    return {
+        "search_cache": _search_cache.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "keyword_index": keyword_index_stats(),
+    }
+
+
+@async_tool(mcp)
+@instrument_tool
+def get_youtube_api_stats() -> dict:
+    """YouTube Data API / RSS 엔드포인트별 호출 수, 오류, 재시도, 평균/최대 지연(ms)과 쿼터 사용량/응답 캐시, 자막 저장소 통계,
+    외부 API(OpenAI/YouTube/Supabase) 엔드포인트별 속도 제어 상태(동시 호출 한도, 제한 횟수, 대기 시간)를 반환"""
+    return {
+        "endpoints": get_http_stats(),
+        "quota": get_quota_stats(),
+        "transcripts": get_transcript_store().stats(),
+        "rate_limits": get_rate_limit_stats(),
+    }
+
+
+def _storage_gauges() -> dict:
+    """지표 스냅샷/Prometheus용 현재 상태 게이지 (캐시 크기, 쿼터 사용량)"""
+    quota = get_quota_stats()
+    transcripts = get_transcript_store().stats()
+    gauges = {
+        "search_cache_entries": _search_cache.stats()["entries"],
+        "youtube_quota_used": quota["quota_used"],
+        "youtube_quota_remaining": quota["quota_remaining"],
+        "transcript_store_entries": transcripts["transcripts"],
+        "transcript_store_bytes": transcripts["stored_bytes"],
+    }
+    job_counts = get_job_store().counts()
+    gauges["ingest_jobs_queued"] = job_counts["queued"]
+    gauges["ingest_jobs_running"] = job_counts["running"]
+    keyword_stats = keyword_index_stats()
+    if keyword_stats:
+        gauges["keyword_index_documents"] = keyword_stats["documents"]
+        gauges["keyword_index_terms"] = keyword_stats["terms"]
+    embedding_cache = get_embedding_cache()
+    if embedding_cache:
+        cache_stats = embedding_cache.stats()
+        gauges["embedding_cache_entries"] = cache_stats["entries"]
+        gauges["embedding_cache_bytes"] = cache_stats["bytes"]
+    return gauges
+
+
+register_collector(_storage_gauges)
+
+
+@async_tool(mcp)
+def get_metrics(format: str = "json"):
+    """도구별 호출 수/소요 시간, 단계별(자막 수집, 청킹, 임베딩, DB 저장, RPC) 시간, 외부 API 호출/오류/재시도,
+    임베딩 토큰 수, 캐시 적중 지표를 반환. format="prometheus"이면 Prometheus 텍스트 형식 문자열 (프로세스 단위 집계)"""
+    if format == "prometheus":
+        return prometheus_text()
+    return metrics_snapshot()
+
+
+@instrument_tool
+def ingest_video(video_url: str, job=None) -> str:
+    """단일 YouTube 영상 URL을 입력받아 자막을 추출하고 토큰 예산 단위로 청킹(시작/끝 시각 보존)하여 임베딩 저장.
+    수집 작업 핸들러 (스크립트/벤치마크는 직접 호출). 부분 저장된 영상이면 남은 청크만 임베딩/저장"""
     try:
         # 1. URL에서 비디오 ID 추출
-        video_id_match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", video_url)
-        if not video_id_match:
+        video_id = _extract_video_id(video_url)
+        if not video_id:
             return "유효하지 않은 YouTube URL이 제공되었습니다"
-        video_id = video_id_match.group(1)
         
-        print(f"🎬 영상 처리 시작: {video_id}")
+        logger.info(f"🎬 영상 처리 시작: {video_id}")
         
-        # 2. 이미 저장된 영상인지 확인
+        # 2. 이미 저장된 영상인지 확인 (부분 저장된 영상은 저장 안 됨으로 나옴)
         try:
-            existing = supabase.table("youtube_videos").select("video_id").eq("video_id", video_id).limit(1).execute()
-            if existing.data:
+            with stage("dedup_check"):
+                stored = find_stored_video_ids([video_id])
+            if stored:
                 return f"이미 저장된 영상입니다: {video_id}"
         except Exception as e:
-            print(f"⚠️ 기존 데이터 확인 중 오류: {str(e)}")
+            logger.warning(f"⚠️ 기존 데이터 확인 중 오류: {str(e)}")
         
-        # 3. 자막 추출
+        # 3. 자막 타임라인 항목 추출
         try:
-            transcript = get_youtube_transcript(video_url)
-            print(f"✅ 자막 추출 완료: {len(transcript)}자")
+            with stage("transcript"):
+                entries = fetch_timed_transcript(video_id)
+            logger.debug(f"✅ 자막 추출 완료: {len(entries)}개 항목")
         except Exception as e:
             return f"자막 추출 실패: {str(e)}"
         
-        # 4. 500글자씩 청킹
-        chunks = chunk_transcript(transcript, chunk_size=500)
-        print(f"📝 {len(chunks)}개 청크로 분할 완료")
-        
-        # 5. 각 청크를 임베딩하고 저장
-        saved_chunks = 0
-        for chunk_idx, chunk in enumerate(chunks):
-            try:
-                # OpenAI 임베딩 생성
-                time.sleep(1)  # API 호출 제한 방지
-                embedding_response = openai.embeddings.create(
-                    input=chunk,
-                    model="text-embedding-3-small"
-                )
-                embedding = embedding_response.data[0].embedding
-                
-                # Supabase에 저장
-                supabase.table("youtube_videos").insert({
-                    "video_id": video_id,
-                    "url": video_url,
-                    "chunk_index": chunk_idx,
-                    "chunk_text": chunk,
-                    "embedding": embedding
-                }).execute()
-                
-                saved_chunks += 1
-                print(f"💾 청크 {chunk_idx + 1}/{len(chunks)} 저장 완료")
-                
-            except Exception as e:
-                print(f"❌ 청크 {chunk_idx} 저장 실패: {str(e)}")
-                continue
+        # 4~6. 토큰 예산 청킹 → 배치 임베딩 → 다건 insert를 청크 배치 단위로 흘려보냄
+        # (긴 영상도 앞쪽 청크부터 저장되어 바로 검색되고, 배치마다 청크 체크포인트 기록)
+        if job is not None:
+            job.update(**_CHUNK_PROGRESS)
+        results = _ingest_pipeline([{"video_id": video_id, "entries": entries}], job, fetch=False)
+        if job is not None:
+            job.check()
+        if not results:
+            raise RuntimeError(f"청크 저장 중 오류가 발생했습니다 (저장된 청크는 다음 수집에서 이어서 저장): {video_id}")
+        saved_chunks = results[0]["saved"]
+        logger.info(f"💾 {saved_chunks}/{results[0]['pending']}개 청크 저장 완료")
+        if saved_chunks < results[0]["pending"]:
+            raise RuntimeError(f"{results[0]['pending'] - saved_chunks}개 청크가 저장되지 않았습니다 "
+                               f"(저장된 {saved_chunks}개는 유지, 다음 수집에서 이어서 저장): {video_id}")
         
         return f"✅ 영상 처리 완료! {saved_chunks}개 청크가 저장되었습니다. (비디오 ID: {video_id})"
         
     except Exception as e:
+        if job is not None:
+            raise  # 작업 실패로 기록
         return f"영상 처리 중 오류 발생: {str(e)}"
 
 
+@async_tool(mcp)
+@instrument_tool
+def save_single_video_embedding(video_url: str) -> dict:
+    """단일 YouTube 영상 URL의 자막을 청킹(시작/끝 시각 보존)/임베딩하여 저장하는 백그라운드 작업을 등록하고 작업 ID를 바로 반환.
+    진행 상황은 get_ingest_job으로 확인"""
+    video_id = _extract_video_id(video_url)
+    if not video_id:
+        return {"error": "유효하지 않은 YouTube URL이 제공되었습니다"}
+    job, created = submit_job("video", video_id, {"video_url": video_url})
+    return _submitted(job, created)
+
+
+@async_tool(mcp)
+@instrument_tool
+def get_ingest_job(job_id: str) -> dict:
+    """수집 작업의 상태(queued/running/done/failed)와 진행 상황(영상/청크 수, 진행률 %), 결과를 반환"""
+    job = get_job_store().get(job_id)
+    if job is None:
+        return {"error": f"수집 작업을 찾을 수 없습니다: {job_id}"}
+    return job_status(job)
+
+
+@async_tool(mcp)
+@instrument_tool
+def list_ingest_jobs(status: str = "", limit: int = 20) -> dict:
+    """최근 수집 작업 목록(최신순)과 상태별 작업 수. status를 주면 그 상태(queued/running/done/failed)의 작업만"""
+    if status and status not in JOB_STATUSES:
+        return {"error": f"status는 {', '.join(JOB_STATUSES)} 중 하나여야 합니다: {status}"}
+    store = get_job_store()
+    return {"counts": store.counts(), "jobs": [job_status(job) for job in store.list(status or None, limit)]}
+
+
+def _run_channel_job(job):
+    params = job.params
+    return ingest_channel(params["channel_id"], params.get("max_results", 3), params.get("force_update", False), job=job)
+
+
+def _run_video_job(job):
+    return ingest_video(job.params["video_url"], job=job)
+
+
+register_job_handler("channel", _run_channel_job)
+register_job_handler("video", _run_video_job)
+
+
+def start_job_workers():
+    """수집 작업 워커 시작. MCP 서버, 워커 풀 프로세스처럼 계속 떠 있는 프로세스에서 호출
+    (시작하면 이전 프로세스가 끝내지 못한 작업도 heartbeat가 끊긴 뒤 이어서 실행)"""
+    get_job_runner().start()
+
+
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    if "--drain" in sys.argv:
+        # 상주 워커 없이 대기 중인 수집 작업을 모두 실행하고 종료 (mcp_client 1회성 호출 뒤에 실행)
+        get_job_runner().drain()
+    elif "--jobs" in sys.argv:
+        # MCP 서버 없이 수집 작업 워커만 실행
+        start_job_workers()
+        threading.Event().wait()
+    else:
+        start_job_workers()
+        mcp.run()
\ No newline at end of file
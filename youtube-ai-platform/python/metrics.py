@@ -0,0 +1,351 @@
+"""
+도구별 지표/추적과 구조화 로그
+- 카운터: 외부 API 호출/오류/재시도, 임베딩 토큰 수, 캐시 적중/미스 (라벨별)
+- 타이머: 도구 전체 시간과 단계별 시간(자막 수집, 청킹, 임베딩, DB 저장, RPC)을 히스토그램으로 집계
+- 도구 호출마다 추적 ID를 붙이고, 끝날 때 단계별 소요 시간을 한 줄 로그로 남김
+- snapshot()은 MCP 도구 응답용 dict, prometheus_text()는 Prometheus 텍스트 형식
+  (METRICS_TEXTFILE_PATH를 설정하면 도구 호출이 끝날 때마다 파일로 기록 → node_exporter textfile collector)
+- 로그는 stderr로 출력 (stdio MCP 프로토콜 채널인 stdout을 쓰지 않음). LOG_LEVEL로 수준, LOG_FORMAT=json이면 JSON 한 줄
+지표는 프로세스 단위입니다 (MCP 워커 풀이면 워커마다 따로 집계, 텍스트 파일 경로에 {pid}를 넣어 워커별로 기록).
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH", "")
+METRIC_PREFIX = "youtube_ai_"
+
+# 지연 시간 히스토그램 구간 (초)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_tool = contextvars.ContextVar("current_tool", default=None)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+# ---- 구조화 로그 ----
+
+class StructuredFormatter(logging.Formatter):
+    """로그 레코드에 현재 도구/추적 ID와 extra={"fields": {...}}를 붙여 출력"""
+
+    def __init__(self, json_format: bool = False):
+        super().__init__()
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = dict(getattr(record, "fields", None) or {})
+        tool = getattr(record, "tool", None)
+        trace = getattr(record, "trace_id", None)
+        if self.json_format:
+            payload = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "msg": record.getMessage(),
+            }
+            if tool:
+                payload["tool"] = tool
+            if trace:
+                payload["trace_id"] = trace
+            payload.update(fields)
+            if record.exc_info:
+                payload["exc"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+
+        prefix = time.strftime("%H:%M:%S", time.localtime(record.created))
+        context = f" [{tool}:{trace}]" if tool else ""
+        extras = "".join(f" {key}={value}" for key, value in fields.items())
+        line = f"{prefix} {record.levelname[0]}{context} {record.getMessage()}{extras}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.tool = _current_tool.get()
+        trace = _current_trace.get()
+        record.trace_id = trace["id"] if trace else None
+        return True
+
+
+_root_logger = logging.getLogger("youtube_ai")
+if not _root_logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(StructuredFormatter(json_format=LOG_FORMAT == "json"))
+    _handler.addFilter(_ContextFilter())
+    _root_logger.addHandler(_handler)
+    _root_logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    _root_logger.propagate = False
+    # supabase/openai 클라이언트(httpx)의 요청마다 찍히는 INFO 로그는 LOG_LEVEL=DEBUG일 때만 출력
+    for _name in ("httpx", "httpx2"):
+        logging.getLogger(_name).setLevel(logging.DEBUG if _root_logger.level <= logging.DEBUG else logging.WARNING)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """모듈별 로거 (youtube_ai.<name>)"""
+    return logging.getLogger(f"youtube_ai.{name}")
+
+
+logger = get_logger("metrics")
+
+
+# ---- 지표 저장소 ----
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def fmt_labels(labels: tuple) -> str:
+    """Prometheus 라벨 표기 ({k="v",...})"""
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """카운터와 지연 시간 히스토그램 (스레드 안전)"""
+
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._counters = {}
+        self._timers = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+                    break
+
+    def register_collector(self, collector):
+        """collector() -> {지표 이름: 값 또는 [(라벨 dict, 값), ...]} 형태의 게이지 (캐시 크기, 쿼터 사용량 등)"""
+        self._collectors.append(collector)
+
+    def _gauges(self) -> dict:
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                for name, value in collector().items():
+                    samples = value if isinstance(value, list) else [({}, value)]
+                    gauges.setdefault(name, []).extend(
+                        (labels, float(v)) for labels, v in samples if isinstance(v, (int, float))
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ 지표 수집 실패: {str(e)}")
+        return gauges
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            timers = {}
+            for (name, labels), timer in sorted(self._timers.items()):
+                timers.setdefault(name, []).append({
+                    "labels": dict(labels),
+                    "count": timer["count"],
+                    "avg_ms": round(timer["sum"] / timer["count"] * 1000, 2) if timer["count"] else 0.0,
+                    "max_ms": round(timer["max"] * 1000, 2),
+                    "total_s": round(timer["sum"], 3),
+                })
+        gauges = {
+            name: [{"labels": labels, "value": value} for labels, value in samples]
+            for name, samples in self._gauges().items()
+        }
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "counters": counters,
+            "timers": timers,
+            "gauges": gauges,
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted((key, dict(t, buckets=list(t["buckets"]))) for key, t in self._timers.items())
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{fmt_labels(labels)} {value}")
+
+        for (name, labels), timer in timers:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, timer["buckets"]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{fmt_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{fmt_labels(labels + (('le', '+Inf'),))} {timer['count']}")
+            lines.append(f"{metric}_sum{fmt_labels(labels)} {timer['sum']:.6f}")
+            lines.append(f"{metric}_count{fmt_labels(labels)} {timer['count']}")
+
+        for name, samples in sorted(self._gauges().items()):
+            metric = f"{METRIC_PREFIX}{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric}{fmt_labels(_label_key(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self.started_at = time.time()
+
+
+registry = MetricsRegistry()
+inc = registry.inc
+observe = registry.observe
+register_collector = registry.register_collector
+
+
+def snapshot() -> dict:
+    return registry.snapshot()
+
+
+def prometheus_text() -> str:
+    return registry.prometheus_text()
+
+
+def write_textfile(path: str = None):
+    """Prometheus 텍스트를 파일로 기록 (임시 파일에 쓴 뒤 교체해서 수집기가 반쯤 쓴 파일을 읽지 않게 함)"""
+    path = (path or METRICS_TEXTFILE_PATH).replace("{pid}", str(os.getpid()))
+    if not path:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.prometheus_text())
+    os.replace(tmp_path, path)
+
+
+# ---- 추적 ----
+
+def current_tool() -> str:
+    return _current_tool.get()
+
+
+@contextlib.contextmanager
+def stage(name: str, **labels):
+    """도구 안의 한 단계 시간 측정. 현재 도구 이름을 라벨로 붙이고 추적 기록에 누적"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("stage_duration_seconds", elapsed, tool=_current_tool.get(), stage=name, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            with trace["lock"]:
+                trace["stages"][name] = trace["stages"].get(name, 0.0) + elapsed
+
+
+@contextlib.contextmanager
+def _tool_trace(tool_name: str):
+    """도구 호출 하나의 추적 구간. 결과 판정용 dict를 넘겨주고, 끝나면 지표/로그 기록"""
+    # 도구 안에서 다른 도구를 부르면(채널 일괄 동기화 등) 바깥 추적에 합쳐서 기록
+    if _current_trace.get() is not None:
+        with stage(tool_name):
+            yield {"status": "ok"}
+        return
+
+    trace = {"id": uuid.uuid4().hex[:12], "stages": {}, "lock": threading.Lock()}
+    tool_token = _current_tool.set(tool_name)
+    trace_token = _current_trace.set(trace)
+    started = time.perf_counter()
+    outcome = {"status": "ok"}
+    try:
+        yield outcome
+    except BaseException:
+        outcome["status"] = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        status = outcome["status"]
+        inc("tool_calls_total", tool=tool_name, status=status)
+        observe("tool_duration_seconds", elapsed, tool=tool_name)
+        stages = {name: round(seconds * 1000, 1) for name, seconds in trace["stages"].items()}
+        logger.info(f"⏱️ {tool_name} {elapsed * 1000:.1f}ms ({status})",
+                    extra={"fields": {"stages_ms": stages} if stages else {}})
+        _current_tool.reset(tool_token)
+        _current_trace.reset(trace_token)
+        if METRICS_TEXTFILE_PATH:
+            try:
+                write_textfile()
+            except OSError as e:
+                logger.warning(f"⚠️ 지표 파일 기록 실패: {str(e)}")
+
+
+def _check_result(outcome: dict, result):
+    if isinstance(result, dict) and "error" in result:
+        outcome["status"] = "error"
+    return result
+
+
+def instrument_tool(fn=None, name: str = None):
+    """MCP 도구 함수 계측: 호출 수/오류/전체 시간, 추적 ID, 끝날 때 단계별 시간 로그.
+    functools.wraps로 시그니처를 유지하므로 도구 등록 데코레이터 바로 아래에 둠.
+    async 함수도 지원하며, 지표의 도구 이름을 바꾸려면 @instrument_tool(name=...)"""
+    if fn is None:
+        return lambda f: instrument_tool(f, name=name)
+    tool_name = name or fn.__name__
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with _tool_trace(tool_name) as outcome:
+                return _check_result(outcome, await fn(*args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _tool_trace(tool_name) as outcome:
+            return _check_result(outcome, fn(*args, **kwargs))
+
+    return wrapper
+
+
+def run_in_context(fn):
+    """현재 도구/추적 컨텍스트를 다른 스레드에서도 쓰도록 감싼 함수 반환 (파이프라인 워커, 스레드 풀)"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
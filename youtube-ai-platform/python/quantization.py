@@ -0,0 +1,96 @@
+"""
+임베딩 벡터 압축 헬퍼
+- 차원 축소: text-embedding-3 계열은 앞쪽 차원만 잘라 다시 정규화해도 dimensions 파라미터로 받은 벡터와 같음
+- 양자화 저장: float32(4바이트/차원), float16(2바이트), int8(1바이트 + 벡터당 scale 4바이트)
+  int8은 벡터마다 최대 절댓값을 127로 맞추는 대칭 양자화
+검색은 블록 단위로 float32로 되돌려 계산하므로 전체 행렬을 한 번에 복원하지 않습니다.
+"""
+
+import numpy as np
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+SCORE_BLOCK_ROWS = 16384
+
+
+def check_dtype(dtype: str) -> str:
+    dtype = (dtype or "float32").lower()
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"지원하지 않는 벡터 저장 형식: {dtype} (float32, float16, int8 중 하나)")
+    return dtype
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def truncate_dimensions(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """앞쪽 dimensions개 차원만 남기고 다시 정규화"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dimensions is None or matrix.shape[-1] <= dimensions:
+        return matrix
+    return normalize_rows(matrix.reshape(-1, matrix.shape[-1])[:, :dimensions]).reshape(*matrix.shape[:-1], dimensions)
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> tuple:
+    """(codes, scales) 반환. scales는 int8일 때만 (n,) float32, 나머지는 None"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    dtype = check_dtype(dtype)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    matrix = codes.astype(np.float32)
+    if scales is not None:
+        matrix *= scales[:, None]
+    return matrix
+
+
+def quantized_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """양자화된 행렬과 float32 쿼리의 내적 (블록 단위로 복원해서 계산).
+    query가 (d,) 벡터면 (n,), (q, d) 행렬이면 (n, q) 점수"""
+    query = np.asarray(query, dtype=np.float32)
+    if query.ndim == 2:
+        query = query.T
+    if codes.dtype == np.float32:
+        return codes @ query
+    scores = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+        scores[start:start + len(block)] = block @ query
+    if scales is not None:
+        scores *= scales.reshape((-1,) + (1,) * (scores.ndim - 1))
+    return scores
+
+
+def bytes_per_vector(dimensions: int, dtype: str) -> int:
+    dtype = check_dtype(dtype)
+    if dtype == "float32":
+        return dimensions * 4
+    if dtype == "float16":
+        return dimensions * 2
+    return dimensions + 4
+
+
+def encode_vector(vector, dtype: str) -> bytes:
+    """캐시 저장용 바이트 (int8은 앞 4바이트에 scale)"""
+    codes, scales = quantize(np.asarray([vector], dtype=np.float32), dtype)
+    if scales is not None:
+        return scales.tobytes() + codes.tobytes()
+    return codes.tobytes()
+
+
+def decode_vector(blob: bytes, dtype: str) -> list:
+    dtype = check_dtype(dtype)
+    if dtype == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return (np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale).tolist()
+    return np.frombuffer(blob, dtype=np.dtype(dtype)).astype(np.float32).tolist()
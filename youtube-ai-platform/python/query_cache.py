@@ -0,0 +1,113 @@
+"""
+유사도 검색 결과 캐시 (TTL + LRU)
+정규화된 검색어를 키로 search_similar_youtube_video 결과를 보관합니다.
+수집 도구가 새 행을 저장하면 invalidate()로 전체를 무효화하며, 무효화 시각을 마커 파일에도
+기록해서 워커 풀의 다른 프로세스 캐시도 다음 조회 때 비워지도록 합니다.
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from metrics import get_logger
+
+logger = get_logger("query_cache")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+INVALIDATION_MARKER_PATH = os.getenv("SEARCH_CACHE_MARKER_PATH", os.path.join(CACHE_DIR, "search_cache.invalidated"))
+
+
+def normalize_query(query: str) -> str:
+    """NFC 정규화 + 소문자 + 공백 정리"""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class QueryResultCache:
+    """스레드 안전 TTL+LRU 캐시"""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS,
+                 marker_path: str = INVALIDATION_MARKER_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.marker_path = marker_path
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (저장 시각, 값)
+        self._marker_mtime = self._read_marker()
+        self._lock = threading.Lock()
+
+    def _read_marker(self) -> float:
+        try:
+            return os.path.getmtime(self.marker_path)
+        except OSError:
+            return 0.0
+
+    def _check_marker_locked(self):
+        # 다른 프로세스가 무효화했으면 로컬 캐시도 비움
+        mtime = self._read_marker()
+        if mtime > self._marker_mtime:
+            self._marker_mtime = mtime
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+
+    def get(self, key):
+        with self._lock:
+            self._check_marker_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """전체 무효화 (새 청크가 저장되었을 때 호출)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            try:
+                os.makedirs(os.path.dirname(self.marker_path), exist_ok=True)
+                with open(self.marker_path, "a"):
+                    pass
+                os.utime(self.marker_path, None)
+                self._marker_mtime = self._read_marker()
+            except OSError as e:
+                logger.warning(f"⚠️ 검색 캐시 무효화 마커 기록 실패: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
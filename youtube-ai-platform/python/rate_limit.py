@@ -0,0 +1,317 @@
+"""
+외부 API 공용 속도 제어기 (OpenAI / YouTube / Supabase)
+고정된 sleep 대신 엔드포인트별 제어기를 거쳐서 호출합니다.
+- 토큰 버킷: 초당 요청 수(RATE_LIMIT_<SERVICE>_RPS)와 순간 허용량(burst) 안에서만 호출 시작
+- AIMD 동시 호출 한도: 성공할 때마다 한도를 1/한도씩 늘리고(additive increase),
+  429/503/rate limit 응답이면 절반으로 줄임(multiplicative decrease)
+- Retry-After 헤더가 있으면 그 시간 동안 해당 엔드포인트의 새 호출을 모두 멈춤
+  (헤더가 없으면 연속 제한 횟수에 따라 지수 backoff)
+제한은 프로세스 단위입니다. 워커 풀 프로세스들은 각자 429 응답을 보고 따로 줄어듭니다.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+
+from metrics import get_logger, inc, observe, register_collector
+
+logger = get_logger("rate_limit")
+
+# 서비스별 기본값 (초당 요청 수, 최대 동시 호출 수)
+SERVICE_DEFAULTS = {
+    "openai": (50.0, 8),
+    "youtube": (10.0, 8),
+    "supabase": (20.0, 16),
+    "default": (20.0, 8),
+}
+RATE_LIMIT_MIN_CONCURRENCY = int(os.getenv("RATE_LIMIT_MIN_CONCURRENCY", "1"))
+RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "1.0"))
+# 제한 응답 후 재시도 횟수 (call/acall, 청크 저장기, 임베딩 배치)
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+MAX_RETRY_AFTER_SECONDS = 30.0
+DECREASE_FACTOR = 0.5
+
+# 호출 속도를 줄여야 하는 응답 상태 코드
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+def _service_config(service: str) -> tuple:
+    rate, concurrency = SERVICE_DEFAULTS.get(service, SERVICE_DEFAULTS["default"])
+    prefix = f"RATE_LIMIT_{service.upper()}"
+    rate = float(os.getenv(f"{prefix}_RPS", str(rate)))
+    concurrency = int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency)))
+    return rate, max(1, concurrency)
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After 헤더 값(초 또는 HTTP 날짜)을 기다릴 초로 변환. 해석할 수 없으면 None"""
+    if value is None or value == "":
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = parsedate_to_datetime(str(value)).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), MAX_RETRY_AFTER_SECONDS)
+
+
+def _response_retry_after(response):
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")  # OpenAI
+    if retry_after_ms:
+        try:
+            return min(float(retry_after_ms) / 1000, MAX_RETRY_AFTER_SECONDS)
+        except ValueError:
+            pass
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+def throttle_info(error: Exception) -> tuple:
+    """예외가 속도 제한 응답인지 판단해서 (제한 여부, Retry-After 초 또는 None)을 반환.
+    openai.APIStatusError/httpx 오류는 응답 상태 코드와 헤더를, postgrest APIError는 code/메시지를 봄"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is None:
+        code = getattr(error, "code", None)
+        status = int(code) if str(code).isdigit() else None
+    if status in THROTTLE_STATUS_CODES:
+        return True, _response_retry_after(response)
+    message = str(error).lower()
+    if "rate limit" in message or "too many requests" in message:
+        return True, None
+    return False, None
+
+
+class Permit:
+    """slot()/aslot() 안에서 쓰는 호출 허가. 응답이 제한이면 throttled()로 알림"""
+
+    def __init__(self):
+        self.throttled_after = False  # False: 제한 아님, None/초: 제한 (Retry-After)
+
+    def throttled(self, retry_after: float = None):
+        self.throttled_after = retry_after
+
+
+class RateLimiter:
+    """엔드포인트 하나의 토큰 버킷 + AIMD 동시 호출 한도"""
+
+    def __init__(self, service: str, endpoint: str, rate: float, max_concurrency: int,
+                 burst: float = None, min_concurrency: int = RATE_LIMIT_MIN_CONCURRENCY):
+        self.service = service
+        self.endpoint = endpoint
+        # 로그/통계 이름 (http_client 엔드포인트는 이미 "youtube.search"처럼 서비스 이름으로 시작)
+        self.name = endpoint if endpoint.startswith(f"{service}.") else f"{service}.{endpoint}"
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.consecutive = 0  # 연속 제한 횟수 (Retry-After가 없을 때 backoff 계산)
+        self.throttles = 0
+        self.waited = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters = []  # 슬롯 반납을 기다리는 aacquire의 (이벤트 루프, future)
+
+    def _try_acquire_locked(self, now: float):
+        """지금 호출할 수 있으면 토큰/슬롯을 차지하고 0, 아니면 기다릴 초(슬롯 반납을 기다리면 None)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def _record_wait(self, waited: float):
+        if waited > 0.001:
+            with self._cond:
+                self.waited += waited
+            observe("rate_limit_wait_seconds", waited, service=self.service, endpoint=self.endpoint)
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                delay = self._try_acquire_locked(time.monotonic())
+                if delay == 0:
+                    break
+                self._cond.wait(delay)
+        self._record_wait(time.monotonic() - started)
+
+    async def aacquire(self):
+        """이벤트 루프를 막지 않고 기다리는 acquire. 토큰/제한 구간은 남은 시간만큼 sleep,
+        슬롯이 없으면 release()가 깨워줄 때까지 future를 기다림"""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = None
+            with self._cond:
+                delay = self._try_acquire_locked(time.monotonic())
+                if delay is None:
+                    waiter = loop.create_future()
+                    self._async_waiters.append((loop, waiter))
+            if delay == 0:
+                break
+            if waiter is not None:
+                await waiter
+            else:
+                await asyncio.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+
+    def release(self, throttled=False):
+        """호출 결과 반영. throttled는 False(성공/일반 오류) 또는 None/Retry-After 초(제한 응답)"""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled is False:
+                self.consecutive = 0
+                if self.limit < self.max_concurrency:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self._throttle_locked(throttled)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass  # 이미 닫힌 이벤트 루프
+
+    def _throttle_locked(self, retry_after: float):
+        now = time.monotonic()
+        self.throttles += 1
+        inc("rate_limit_throttled_total", service=self.service, endpoint=self.endpoint)
+        if now >= self.blocked_until:
+            # 같은 제한 구간에 동시에 돌아온 429들로 한도가 여러 번 줄지 않도록 구간당 한 번만 감소
+            self.limit = max(self.min_concurrency, self.limit * DECREASE_FACTOR)
+            self.consecutive += 1
+        if retry_after is None:
+            retry_after = min(RATE_LIMIT_BACKOFF_SECONDS * (2 ** (self.consecutive - 1)), MAX_RETRY_AFTER_SECONDS)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.tokens = min(self.tokens, 0.0)
+        logger.warning(f"⏳ {self.name} 호출 제한, {retry_after:.1f}초 대기 "
+                       f"(동시 호출 한도 {int(self.limit)})")
+
+    @contextmanager
+    def slot(self):
+        """with limiter.slot() as permit: 호출 (예외는 throttle_info로 제한 여부를 판단)"""
+        self.acquire()
+        permit = Permit()
+        try:
+            yield permit
+        except Exception as e:
+            throttled, retry_after = throttle_info(e)
+            self.release(retry_after if throttled else False)
+            raise
+        self.release(permit.throttled_after)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        permit = Permit()
+        try:
+            yield permit
+        except Exception as e:
+            throttled, retry_after = throttle_info(e)
+            self.release(retry_after if throttled else False)
+            raise
+        self.release(permit.throttled_after)
+
+    def call(self, fn, *args, **kwargs):
+        """fn을 제어기 안에서 호출. 제한 응답(예외)이면 제한 구간이 끝난 뒤 RATE_LIMIT_MAX_RETRIES번까지 재시도"""
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == RATE_LIMIT_MAX_RETRIES or not throttle_info(e)[0]:
+                    raise
+                inc("retries_total", service=self.service, endpoint=self.endpoint)
+
+    async def acall(self, fn, *args, **kwargs):
+        """call의 비동기 버전 (fn은 코루틴 함수)"""
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            try:
+                async with self.aslot():
+                    return await fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == RATE_LIMIT_MAX_RETRIES or not throttle_info(e)[0]:
+                    raise
+                inc("retries_total", service=self.service, endpoint=self.endpoint)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "concurrency_limit": round(self.limit, 2),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "throttles": self.throttles,
+                "waited_s": round(self.waited, 3),
+                "blocked_s": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            }
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(service: str, endpoint: str) -> RateLimiter:
+    """(서비스, 엔드포인트)별 제어기 (처음 쓸 때 서비스 설정으로 생성)"""
+    key = (service, endpoint)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                rate, concurrency = _service_config(service)
+                limiter = _limiters[key] = RateLimiter(service, endpoint, rate, concurrency)
+    return limiter
+
+
+def rate_limited(service: str, endpoint: str, fn, *args, **kwargs):
+    """get_rate_limiter(service, endpoint).call(fn, ...) 단축"""
+    return get_rate_limiter(service, endpoint).call(fn, *args, **kwargs)
+
+
+def get_rate_limit_stats() -> dict:
+    """엔드포인트별 제어기 상태 (이름 → stats)"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def _rate_limit_gauges() -> dict:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {
+        "rate_limit_concurrency": [
+            ({"service": limiter.service, "endpoint": limiter.endpoint}, limiter.limit) for limiter in limiters
+        ],
+        "rate_limit_in_flight": [
+            ({"service": limiter.service, "endpoint": limiter.endpoint}, limiter.in_flight) for limiter in limiters
+        ],
+    }
+
+
+register_collector(_rate_limit_gauges)
@@ -1,10 +1,10 @@
-import time
 import openai
 import re
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 import os
+from embeddings import embed_texts
+from chunking import split_sentences, semantic_clusters, cluster_embedding
 
 # 환경 변수 로드
 load_dotenv()
@@ -12,64 +12,33 @@ load_dotenv()
 # OpenAI API 키 설정
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def test_semantic_chunking(transcript: str, similarity_threshold: float = 0.7) -> dict:
+def test_semantic_chunking(transcript: str, similarity_threshold: float = 0.7, window: int = None) -> dict:
     """시맨틱 청킹 함수를 테스트하고 각 단계별 결과를 반환"""
     
     # 1. 문장 분리 테스트
-    sentences = re.split(r'[.!?,]+', transcript)
-    sentences = [s.strip() for s in sentences if len(s.strip()) >= 3]  # 최소 3자로 변경
+    sentences = split_sentences(transcript, pattern=r'[.!?,]+', min_length=3)  # 최소 3자로 변경
     
     if len(sentences) <= 1:
         return {"error": "문장이 부족합니다"}
     
-    # 2. 문장별 임베딩 테스트
-    embeddings = []
-    valid_sentences = []
-    
-    for i, sentence in enumerate(sentences):
-        try:
-            time.sleep(0.1)
-            embedding_response = openai.embeddings.create(
-                input=sentence,
-                model="text-embedding-3-small"
-            )
-            embedding = embedding_response.data[0].embedding
-            embeddings.append(embedding)
-            valid_sentences.append(sentence)
-        except Exception as e:
-            continue
+    # 2. 문장 임베딩 테스트 (배치 호출)
+    sentence_embeddings = embed_texts(sentences)
+    valid_sentences = [s for s, e in zip(sentences, sentence_embeddings) if e is not None]
+    embeddings = np.asarray([e for e in sentence_embeddings if e is not None], dtype=np.float32)
     
     if len(embeddings) < 2:
         return {"error": "임베딩된 문장이 부족합니다"}
     
-    # 3. 유사도 계산 테스트
-    embeddings_array = np.array(embeddings)
-    similarity_matrix = cosine_similarity(embeddings_array)
+    # 3~4. 유사도 계산 + 클러스터링 테스트 (벡터 연산)
+    clusters = semantic_clusters(embeddings, similarity_threshold, window=window)
     
-    # 4. 클러스터링 테스트
     chunks_with_embeddings = []
-    used_indices = set()
-    
-    for i in range(len(valid_sentences)):
-        if i in used_indices:
-            continue
-            
-        cluster_indices = [i]
-        used_indices.add(i)
-        
-        for j in range(i + 1, len(valid_sentences)):
-            if j in used_indices:
-                continue
-                
-            if similarity_matrix[i][j] >= similarity_threshold:
-                cluster_indices.append(j)
-                used_indices.add(j)
-        
+    for cluster_indices in clusters:
         cluster_sentences = [valid_sentences[idx] for idx in cluster_indices]
         chunk_text = " ".join(cluster_sentences)
         
         if len(chunk_text.strip()) >= 20:
-            chunk_embedding = embeddings[cluster_indices[0]]
+            chunk_embedding = cluster_embedding(embeddings, cluster_indices)
             chunks_with_embeddings.append((chunk_text.strip(), chunk_embedding))
     
     # 5. 결과 요약
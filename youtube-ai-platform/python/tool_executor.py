@@ -0,0 +1,164 @@
+"""
+FastMCP 비동기 도구용 크기 제한 실행기
+FastMCP는 동기 도구 함수를 이벤트 루프에서 그대로 호출하므로, 긴 수집 도구 하나가 다른 클라이언트의 요청을 모두 막습니다.
+- 블로킹 작업은 용도별 스레드 풀에서 실행 (io: 짧은 API/DB 호출. 오래 걸리는 수집은 ingest_jobs 작업 워커가 실행)
+- 풀마다 세마포어로 동시 실행 수를 제한해서, 대기 중인 호출은 스레드를 잡지 않고 이벤트 루프에서 기다림
+- async_tool()은 동기 함수를 그대로 두고(워커 풀/스크립트에서 직접 호출) 같은 이름의 비동기 도구를 등록
+- 반대로 비동기로 구현한 도구는 run_coroutine()으로 감싼 동기 함수를 워커 풀/스크립트용으로 둠
+- LazyToolServer는 도구 등록만 모아두고 FastMCP 서버(mcp 패키지 import)는 처음 쓸 때 만듦
+  (mcp_server를 함수 모음으로만 import하는 워커/스크립트는 mcp 패키지를 불러오지 않음)
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import register_collector
+
+TOOL_IO_WORKERS = int(os.getenv("TOOL_IO_WORKERS", "16"))
+
+POOL_SIZES = {"io": TOOL_IO_WORKERS}
+
+
+class BoundedExecutor:
+    """스레드 풀 + 동시 실행 수 제한 세마포어"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"tool-{name}")
+        self._semaphores = {}  # 이벤트 루프별 세마포어
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.workers)
+        return semaphore
+
+    async def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs)를 풀에서 실행하고 결과를 기다림 (현재 컨텍스트 변수 유지)"""
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, fn, *args, **kwargs)
+        self.waiting += 1
+        async with self._semaphore():
+            self.waiting -= 1
+            self.running += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+            finally:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "running": self.running, "waiting": self.waiting,
+                "completed": self.completed}
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool: str = "io") -> BoundedExecutor:
+    with _executors_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = _executors[pool] = BoundedExecutor(pool, POOL_SIZES.get(pool, TOOL_IO_WORKERS))
+    return executor
+
+
+async def run_blocking(fn, *args, pool: str = "io", **kwargs):
+    """블로킹 함수를 크기 제한 스레드 풀에서 실행"""
+    return await get_executor(pool).run(fn, *args, **kwargs)
+
+
+_bridge_loop = None
+_bridge_loop_lock = threading.Lock()
+
+
+def run_coroutine(coro):
+    """동기 코드(워커 풀/스크립트)에서 코루틴을 실행하고 결과를 기다림.
+    비동기 클라이언트(AsyncOpenAI, Supabase)가 한 루프에 묶여 있도록 호출마다 새 루프를 만들지 않고
+    프로세스 공용 이벤트 루프 스레드에서 실행 (이벤트 루프 안에서는 호출하지 않음)"""
+    global _bridge_loop
+    if _bridge_loop is None:
+        with _bridge_loop_lock:
+            if _bridge_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="tool-bridge-loop").start()
+                _bridge_loop = loop
+    return asyncio.run_coroutine_threadsafe(coro, _bridge_loop).result()
+
+
+def executor_stats() -> dict:
+    with _executors_lock:
+        return {name: executor.stats() for name, executor in _executors.items()}
+
+
+class LazyToolServer:
+    """FastMCP 대신 쓰는 도구 등록기. tool() 데코레이터로 등록을 모아두고, run/list_tools/call_tool 등
+    서버 속성에 처음 접근할 때 FastMCP를 만들어 모아둔 도구를 한꺼번에 추가"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tools = []
+        self._server = None
+        self._lock = threading.Lock()
+
+    def tool(self, **options):
+        def decorator(fn):
+            with self._lock:
+                self._tools.append((fn, options))
+                if self._server is not None:
+                    self._server.add_tool(fn, **options)
+            return fn
+
+        return decorator
+
+    @property
+    def server(self):
+        if self._server is None:
+            with self._lock:
+                if self._server is None:
+                    from mcp.server.fastmcp import FastMCP
+                    server = FastMCP(self.name)
+                    for fn, options in self._tools:
+                        server.add_tool(fn, **options)
+                    self._server = server
+        return self._server
+
+    def __getattr__(self, attr):
+        return getattr(self.server, attr)
+
+
+def _executor_gauges() -> dict:
+    """풀별 워커 수/실행 중/대기 중/완료 호출 수 게이지"""
+    gauges = {}
+    for pool, stats in executor_stats().items():
+        for key, value in stats.items():
+            gauges.setdefault(f"tool_executor_{key}", []).append(({"pool": pool}, value))
+    return gauges
+
+
+register_collector(_executor_gauges)
+
+
+def async_tool(mcp, pool: str = "io"):
+    """동기 함수를 pool에서 실행하는 같은 이름/시그니처의 비동기 도구로 등록하고, 원래 동기 함수를 반환"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await run_blocking(fn, *args, pool=pool, **kwargs)
+
+        mcp.tool()(wrapper)
+        return fn
+
+    return decorator
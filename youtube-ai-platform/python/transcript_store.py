@@ -0,0 +1,237 @@
+"""
+자막 로컬 저장소
+(video_id, language) 키로 원본 타임라인 항목(text, start, duration)을 zlib 압축해 SQLite에 보관합니다.
+- 단일 영상/채널 수집, 시맨틱 청킹 실험, 재시도 모두 같은 자막을 네트워크 없이 재사용
+- 자막이 없는 영상(자막 비활성화, 해당 언어 없음 등)은 음성 캐시로 기록해서 다시 요청하지 않음
+  (나중에 자막이 올라올 수 있으므로 TRANSCRIPT_NEGATIVE_TTL 이후 다시 확인)
+- 조회는 기본 키 조회 두 번 (언어 우선순위 → 실제 언어, 실제 언어 → 자막)
+- youtube_transcript_api는 저장소에 없는 자막을 YouTube에서 가져올 때 처음 import
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from http_client import http_get
+from metrics import inc
+from rate_limit import rate_limited
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+TRANSCRIPT_STORE_PATH = os.getenv("TRANSCRIPT_STORE_PATH", os.path.join(CACHE_DIR, "transcripts.sqlite3"))
+# 자막을 youtube_transcript_api 대신 가져올 HTTP 서비스 (GET {url}/{video_id}?languages=ko,en → {"language", "entries"},
+# 자막이 없으면 404). 오프라인 벤치마크의 가짜 서버 등에서 사용
+TRANSCRIPT_SOURCE_URL = os.getenv("TRANSCRIPT_SOURCE_URL", "")
+TRANSCRIPT_NEGATIVE_TTL = float(os.getenv("TRANSCRIPT_NEGATIVE_TTL", str(24 * 60 * 60)))
+DEFAULT_LANGUAGES = ("ko", "en")
+
+
+def _permanent_errors() -> tuple:
+    """다시 요청해도 결과가 같은 오류만 음성 캐시 (네트워크/차단 오류는 저장하지 않음)"""
+    from youtube_transcript_api._errors import (
+        NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, VideoUnplayable, InvalidVideoId, AgeRestricted,
+    )
+    return (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, VideoUnplayable, InvalidVideoId, AgeRestricted)
+
+
+class TranscriptUnavailableError(RuntimeError):
+    """자막이 없는 영상 (음성 캐시 적중 포함)"""
+
+
+class TranscriptBlockedError(RuntimeError):
+    """YouTube가 자막 요청을 차단함 (RequestBlocked/IpBlocked). 속도 제어기가 제한 응답으로 보도록 429로 표시"""
+    status_code = 429
+
+
+def _languages_key(languages) -> str:
+    return ",".join(languages)
+
+
+def compress_entries(entries: list) -> bytes:
+    return zlib.compress(json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decompress_entries(blob: bytes) -> list:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class TranscriptStore:
+    """압축 자막 + 음성 캐시 저장소 (SQLite, 스레드/프로세스 공유)"""
+
+    def __init__(self, path: str = TRANSCRIPT_STORE_PATH, negative_ttl: float = TRANSCRIPT_NEGATIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                entries BLOB NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language)
+            )
+        """)
+        # 언어 우선순위 목록(예: "ko,en")으로 요청했을 때 실제로 선택된 언어. NULL이면 자막 없음(음성 캐시)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resolutions (
+                video_id TEXT NOT NULL,
+                languages TEXT NOT NULL,
+                language TEXT,
+                reason TEXT,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (video_id, languages)
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, video_id: str, languages=DEFAULT_LANGUAGES):
+        """저장된 (language, entries)를 반환. 음성 캐시면 TranscriptUnavailableError, 없으면 None"""
+        with self._lock:
+            resolution = self._conn.execute(
+                "SELECT language, reason, checked_at FROM resolutions WHERE video_id = ? AND languages = ?",
+                (video_id, _languages_key(languages))
+            ).fetchone()
+            if resolution is None:
+                return None
+            language, reason, checked_at = resolution
+            if language is None:
+                if time.time() - checked_at > self.negative_ttl:
+                    return None
+                self.negative_hits += 1
+                raise TranscriptUnavailableError(reason or "자막 없음")
+            row = self._conn.execute(
+                "SELECT entries FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language)
+            ).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+        return language, decompress_entries(row[0])
+
+    def store(self, video_id: str, languages, language: str, entries: list):
+        raw = json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, entries, raw_bytes, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (video_id, language, zlib.compress(raw), len(raw), time.time())
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolutions (video_id, languages, language, reason, checked_at) "
+                "VALUES (?, ?, ?, NULL, ?)",
+                (video_id, _languages_key(languages), language, time.time())
+            )
+            self._conn.commit()
+
+    def store_missing(self, video_id: str, languages, reason: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolutions (video_id, languages, language, reason, checked_at) "
+                "VALUES (?, ?, NULL, ?, ?)",
+                (video_id, _languages_key(languages), reason, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, stored, raw = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(entries)), 0), COALESCE(SUM(raw_bytes), 0) FROM transcripts"
+            ).fetchone()
+            missing_count = self._conn.execute(
+                "SELECT COUNT(*) FROM resolutions WHERE language IS NULL"
+            ).fetchone()[0]
+        return {
+            "transcripts": count,
+            "missing_videos": missing_count,
+            "stored_bytes": stored,
+            "raw_bytes": raw,
+            "compression_ratio": round(raw / stored, 2) if stored else 0.0,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "fetches": self.fetches,
+            "missing": self.missing,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_transcript_store() -> TranscriptStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TranscriptStore()
+    return _store
+
+
+def get_transcript_entries(video_id: str, languages=DEFAULT_LANGUAGES) -> tuple:
+    """(language, [{"text", "start", "duration"}, ...]) 반환. 저장소에 있으면 네트워크를 쓰지 않음"""
+    store = get_transcript_store()
+    try:
+        cached = store.lookup(video_id, languages)
+    except TranscriptUnavailableError:
+        inc("cache_hits_total", cache="transcript_negative")
+        raise
+    if cached is not None:
+        inc("cache_hits_total", cache="transcript")
+        return cached
+    inc("cache_misses_total", cache="transcript")
+
+    if TRANSCRIPT_SOURCE_URL:
+        language, entries = _fetch_from_source(store, video_id, languages)
+    else:
+        inc("external_calls_total", service="youtube", endpoint="transcript")
+        try:
+            language, entries = rate_limited("youtube", "transcript", _fetch_from_youtube, video_id, languages)
+        except _permanent_errors() as e:
+            reason = f"{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ''}"
+            _mark_missing(store, video_id, languages, reason)
+            raise TranscriptUnavailableError(reason) from e
+
+    entries = [
+        {"text": snippet["text"], "start": snippet["start"], "duration": snippet["duration"]}
+        for snippet in entries
+    ]
+    store.fetches += 1
+    store.store(video_id, languages, language, entries)
+    return language, entries
+
+
+def _fetch_from_youtube(video_id: str, languages) -> tuple:
+    """youtube_transcript_api로 자막을 가져옴. 차단 응답은 TranscriptBlockedError로 바꿔서 제어기가 호출 속도를 줄이게 함"""
+    from youtube_transcript_api._api import YouTubeTranscriptApi
+    from youtube_transcript_api._errors import RequestBlocked
+
+    try:
+        transcript = YouTubeTranscriptApi().list(video_id).find_transcript(list(languages))
+        return transcript.language_code, transcript.fetch().to_raw_data()
+    except RequestBlocked as e:
+        raise TranscriptBlockedError(f"YouTube 자막 요청 차단: {str(e).strip().splitlines()[0] if str(e).strip() else ''}") from e
+
+
+def _mark_missing(store: TranscriptStore, video_id: str, languages, reason: str):
+    store.missing += 1
+    store.store_missing(video_id, languages, reason)
+
+
+def _fetch_from_source(store: TranscriptStore, video_id: str, languages) -> tuple:
+    response = http_get(f"{TRANSCRIPT_SOURCE_URL.rstrip('/')}/{video_id}",
+                        params={"languages": _languages_key(languages)}, endpoint="transcript")
+    if response.status_code == 404:
+        reason = "NoTranscriptFound: 자막 서비스에 해당 언어 자막이 없습니다"
+        _mark_missing(store, video_id, languages, reason)
+        raise TranscriptUnavailableError(reason)
+    response.raise_for_status()
+    body = response.json()
+    return body["language"], body["entries"]
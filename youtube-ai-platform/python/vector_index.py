@@ -0,0 +1,277 @@
+"""
+youtube_videos 임베딩용 로컬 벡터 인덱스
+Supabase RPC 대신 프로세스 안에서 top-k 검색을 합니다.
+- numpy: 정규화된 float32 행렬 곱으로 정확한(exact) 검색
+- faiss: faiss-cpu HNSW 근사(ANN) 검색 (faiss가 없으면 numpy로 대체)
+numpy 백엔드는 VECTOR_INDEX_DTYPE=float16|int8로 행렬을 양자화해서 메모리/디스크 사용량을 줄일 수 있습니다.
+테이블의 id 기준으로 새 행만 가져오는 증분 동기화와 디스크 저장/로드를 지원합니다.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from chunk_writer import CHUNK_TIME_COLUMNS, TIME_FIELDS
+from metrics import get_logger, inc
+from quantization import check_dtype, normalize_rows, quantize, dequantize, quantized_scores, truncate_dimensions
+from rate_limit import rate_limited
+
+faiss = None  # faiss 백엔드를 처음 만들 때 _load_faiss()로 불러옴
+
+logger = get_logger("vector_index")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", os.path.join(CACHE_DIR, "vector_index"))
+VECTOR_INDEX_SYNC_INTERVAL = float(os.getenv("VECTOR_INDEX_SYNC_INTERVAL", "60"))
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+SYNC_PAGE_SIZE = 1000
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+META_FIELDS = ("id", "video_id", "url", "chunk_index", "chunk_text") + (TIME_FIELDS if CHUNK_TIME_COLUMNS else ())
+
+
+def _load_faiss():
+    """faiss 모듈 (설치되어 있지 않으면 None). import가 무거우므로 faiss 백엔드를 쓸 때만 불러옴"""
+    global faiss
+    if faiss is None:
+        try:
+            import faiss as faiss_module
+            faiss = faiss_module
+        except ImportError:
+            pass
+    return faiss
+
+
+def parse_embedding(value) -> list:
+    """PostgREST는 pgvector 컬럼을 "[0.1,0.2,...]" 문자열로 돌려주므로 리스트로 변환"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class VectorIndex:
+    """코사인 유사도 top-k 검색용 인덱스 (스레드 안전)"""
+
+    def __init__(self, backend: str = "numpy", dtype: str = VECTOR_INDEX_DTYPE):
+        if backend == "faiss" and _load_faiss() is None:
+            logger.warning("⚠️ faiss를 불러올 수 없어 numpy 정확 검색으로 대체합니다")
+            backend = "numpy"
+        self.backend = backend
+        # faiss HNSW는 float32 벡터를 자체 보관하므로 양자화는 numpy 백엔드에만 적용
+        self.dtype = check_dtype(dtype) if backend == "numpy" else "float32"
+        self.dimensions = None
+        self.matrix = None  # (n, d) 정규화된 벡터 (dtype으로 양자화)
+        self.scales = None  # int8일 때 행별 scale
+        self.meta = []  # 행별 메타데이터 (embedding 제외)
+        self.last_id = 0
+        self.last_sync = 0.0
+        self._pending = []  # 아직 행렬에 합치지 않은 (codes, scales) 블록
+        self._faiss_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.meta)
+
+    def add(self, rows: list) -> int:
+        """{"id", "video_id", "url", "chunk_index", "chunk_text", "embedding"} 행들을 추가"""
+        vectors = []
+        metas = []
+        for row in rows:
+            embedding = parse_embedding(row.get("embedding"))
+            if not embedding:
+                continue
+            vectors.append(embedding)
+            metas.append({field: row.get(field) for field in META_FIELDS})
+        if not vectors:
+            return 0
+
+        with self._lock:
+            block, metas = self._prepare_locked(vectors, metas)
+            if block is None:
+                return 0
+            self._pending.append(quantize(block, self.dtype))
+            self.meta.extend(metas)
+            ids = [meta["id"] for meta in metas if isinstance(meta.get("id"), int)]
+            if ids:
+                self.last_id = max(self.last_id, max(ids))
+            if self._faiss_index is not None:
+                self._faiss_index.add(block)
+        return len(metas)
+
+    def _prepare_locked(self, vectors: list, metas: list) -> tuple:
+        """정규화하고 인덱스 차원에 맞춤. 차원이 더 긴 벡터(축소 전 임베딩)는 앞쪽 차원만 잘라서 사용"""
+        if self.dimensions is None:
+            # 첫 블록에서 가장 많은 차원을 인덱스 차원으로 사용
+            lengths = [len(vector) for vector in vectors]
+            self.dimensions = max(set(lengths), key=lengths.count)
+        kept = [i for i, vector in enumerate(vectors) if len(vector) >= self.dimensions]
+        if len(kept) < len(vectors):
+            logger.warning(f"⚠️ 인덱스 차원({self.dimensions})보다 짧은 임베딩 {len(vectors) - len(kept)}개는 건너뜁니다")
+        if not kept:
+            return None, []
+        block = np.asarray([vectors[i][:self.dimensions] for i in kept], dtype=np.float32)
+        return normalize_rows(block), [metas[i] for i in kept]
+
+    def _consolidate_locked(self):
+        if self._pending:
+            blocks = ([(self.matrix, self.scales)] if self.matrix is not None else []) + self._pending
+            self.matrix = np.vstack([codes for codes, _ in blocks])
+            self.scales = np.concatenate([scales for _, scales in blocks]) if self.dtype == "int8" else None
+            self._pending = []
+        if self.backend == "faiss" and self._faiss_index is None and self.matrix is not None:
+            index = faiss.IndexHNSWFlat(self.matrix.shape[1], HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            index.add(self.matrix)
+            self._faiss_index = index
+
+    def search(self, query_vector, top_k: int = 5) -> list:
+        """쿼리 벡터와 가장 유사한 top_k개 행을 score(코사인 유사도)와 함께 반환"""
+        return self.search_many([query_vector], top_k)[0]
+
+    def search_many(self, query_vectors: list, top_k: int = 5) -> list:
+        """여러 쿼리 벡터를 행렬 곱 한 번으로 검색해서 쿼리별 top_k 결과 목록을 반환"""
+        with self._lock:
+            if self.dimensions is None or not len(query_vectors):
+                return [[] for _ in query_vectors]
+            queries = truncate_dimensions(normalize_rows(np.asarray(query_vectors, dtype=np.float32)), self.dimensions)
+            self._consolidate_locked()
+            if self.matrix is None or not len(self.meta):
+                return [[] for _ in query_vectors]
+            top_k = min(top_k, len(self.meta))
+            results = []
+            if self._faiss_index is not None:
+                scores, indices = self._faiss_index.search(queries, top_k)
+                for row_indices, row_scores in zip(indices, scores):
+                    pairs = [(int(i), float(s)) for i, s in zip(row_indices, row_scores) if i >= 0]
+                    results.append([dict(self.meta[i], score=score) for i, score in pairs])
+                return results
+
+            scores = quantized_scores(self.matrix, self.scales, queries)  # (행 수, 쿼리 수)
+            if top_k < len(scores):
+                candidates = np.argpartition(-scores, top_k - 1, axis=0)[:top_k]
+            else:
+                candidates = np.broadcast_to(np.arange(len(scores))[:, None], scores.shape)
+            for q in range(scores.shape[1]):
+                column = candidates[:, q]
+                order = column[np.argsort(-scores[column, q])]
+                results.append([dict(self.meta[i], score=float(scores[i, q])) for i in order])
+            return results
+
+    def vectors(self) -> np.ndarray:
+        """전체 벡터를 float32 행렬로 반환 (벤치마크/형식 변환용)"""
+        with self._lock:
+            self._consolidate_locked()
+            if self.matrix is None:
+                return np.zeros((0, self.dimensions or 0), dtype=np.float32)
+            return dequantize(self.matrix, self.scales)
+
+    def sync(self, client, table: str = "youtube_videos") -> int:
+        """마지막으로 가져온 id 이후의 행만 가져와서 추가. 추가된 행 수를 반환"""
+        added = 0
+        while True:
+            inc("external_calls_total", service="supabase", endpoint=f"{table}.select")
+            query = (
+                client.table(table)
+                .select(",".join(META_FIELDS + ("embedding",)))
+                .gt("id", self.last_id)
+                .order("id")
+                .limit(SYNC_PAGE_SIZE)
+            )
+            resp = rate_limited("supabase", f"{table}.select", query.execute)
+            rows = resp.data or []
+            added += self.add(rows)
+            if rows:
+                # 임베딩이 비어 있는 행도 다시 가져오지 않도록 마지막 id까지 진행
+                self.last_id = max(self.last_id, rows[-1]["id"])
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+        self.last_sync = time.time()
+        return added
+
+    def save(self, path: str = VECTOR_INDEX_PATH):
+        """행렬(.npy)과 메타데이터(.json)를 저장. faiss 백엔드는 인덱스 파일도 함께 저장"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 행렬/메타데이터는 잠금 안에서 스냅샷만 뜨고 파일 쓰기는 잠금 밖에서 (행렬은 합칠 때 새로 만들어지므로 그대로 참조)
+        with self._lock:
+            self._consolidate_locked()
+            if self.matrix is None:
+                return
+            matrix, scales = self.matrix, self.scales
+            data = {"backend": self.backend, "dtype": self.dtype, "last_id": self.last_id, "meta": list(self.meta)}
+            if self._faiss_index is not None:
+                # faiss 인덱스는 add()가 제자리에서 바꾸므로 잠금 안에서 씀
+                faiss.write_index(self._faiss_index, f"{path}.faiss")
+        np.save(f"{path}.npy", matrix)
+        if scales is not None:
+            np.save(f"{path}.scales.npy", scales)
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str = VECTOR_INDEX_PATH, backend: str = "numpy", dtype: str = VECTOR_INDEX_DTYPE):
+        """저장된 인덱스를 불러옴. 파일이 없으면 빈 인덱스를 반환 (저장 형식이 다르면 변환)"""
+        index = cls(backend=backend, dtype=dtype)
+        if not (os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json")):
+            return index
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        matrix = np.load(f"{path}.npy")
+        scales = np.load(f"{path}.scales.npy") if saved.get("dtype") == "int8" else None
+        if saved.get("dtype", "float32") == index.dtype:
+            index.matrix, index.scales = matrix, scales
+        else:
+            index.matrix, index.scales = quantize(dequantize(matrix, scales), index.dtype)
+        index.dimensions = index.matrix.shape[1]
+        index.meta = saved["meta"]
+        index.last_id = saved.get("last_id", 0)
+        if index.backend == "faiss" and os.path.exists(f"{path}.faiss"):
+            index._faiss_index = faiss.read_index(f"{path}.faiss")
+            index._faiss_index.hnsw.efSearch = HNSW_EF_SEARCH
+        logger.info(f"📂 로컬 벡터 인덱스 로드: {len(index)}개 벡터 ({index.backend}, {index.dtype}, {index.dimensions}차원)")
+        return index
+
+
+_index = None
+_index_lock = threading.Lock()
+_sync_lock = threading.Lock()  # 동기화/저장 중인 스레드 (한 번에 하나)
+
+
+def get_local_index(client):
+    """LOCAL_VECTOR_INDEX=numpy|faiss 일 때 프로세스 공용 인덱스를 반환 (동기화 주기마다 증분 동기화).
+    client는 Supabase 클라이언트 또는 클라이언트를 돌려주는 함수 (함수면 동기화할 때만 호출)"""
+    global _index
+    backend = os.getenv("LOCAL_VECTOR_INDEX", "").lower()
+    if backend not in ("numpy", "faiss"):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = VectorIndex.load(VECTOR_INDEX_PATH, backend=backend)
+        index = _index
+    # 동기화/저장은 전역 잠금 밖에서 한 스레드만 (행 추가는 인덱스 자체 잠금으로 합침).
+    # 이미 벡터가 있으면 백그라운드로 돌리고 검색은 현재 인덱스로 바로 진행
+    if time.time() - index.last_sync >= VECTOR_INDEX_SYNC_INTERVAL and _sync_lock.acquire(blocking=False):
+        if len(index):
+            threading.Thread(target=_sync_index, args=(index, client, True), daemon=True,
+                             name="vector-index-sync").start()
+        else:
+            _sync_index(index, client)
+    return index
+
+
+def _sync_index(index: VectorIndex, client, background: bool = False):
+    """_sync_lock을 잡은 상태로 호출. 증분 동기화 후 추가된 행이 있으면 저장하고 잠금을 풂"""
+    try:
+        added = index.sync(client() if callable(client) else client)
+        if added:
+            logger.info(f"🔄 로컬 벡터 인덱스 동기화: {added}개 추가 (총 {len(index)}개)")
+            index.save(VECTOR_INDEX_PATH)
+    except Exception as e:
+        if not background:
+            raise
+        logger.warning(f"⚠️ 로컬 벡터 인덱스 백그라운드 동기화 실패, 다음 주기에 다시 시도: {str(e)}")
+        index.last_sync = time.time()
+    finally:
+        _sync_lock.release()
@@ -0,0 +1,270 @@
+"""
+YouTube Data API 호출 래퍼: 조건부 요청 응답 캐시 + 일일 쿼터 계측
+- 리소스별 TTL 안의 응답은 API를 호출하지 않고 캐시에서 반환 (쿼터 0)
+- TTL이 지나면 저장된 ETag로 If-None-Match 조건부 요청, 304면 캐시 본문 재사용
+- fields= 부분 응답으로 필요한 필드만 받아 페이로드 축소
+- 호출마다 문서화된 단가만큼 쿼터를 차감하고, 예산 소진 전에 비싼 호출(search)부터 거절하며
+  캐시된 응답이 있으면 오래된 응답이라도 대신 반환(degrade)
+캐시와 쿼터 사용량은 SQLite에 저장되어 워커 풀의 프로세스들과 재시작 사이에 공유됩니다.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from http_client import http_get
+from metrics import get_logger, inc
+
+logger = get_logger("youtube_api")
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # YouTube 쿼터는 태평양 시간 자정에 초기화
+except Exception:
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+YOUTUBE_API_CACHE_PATH = os.getenv("YOUTUBE_API_CACHE_PATH", os.path.join(CACHE_DIR, "youtube_api.sqlite3"))
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+# 남은 쿼터가 이만큼 이하로 떨어지면 비싼 호출(단가 100 이상)은 거절하고 싼 호출만 허용
+YOUTUBE_QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", "500"))
+EXPENSIVE_CALL_UNITS = 100
+
+# 리소스별 쿼터 단가 (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    "search": 100,
+    "videos": 1,
+    "channels": 1,
+    "playlistItems": 1,
+    "playlists": 1,
+    "commentThreads": 1,
+}
+
+# 리소스별 캐시 TTL(초): 채널 통계는 천천히, 검색 결과는 빠르게 바뀜
+RESOURCE_TTLS = {
+    "search": 15 * 60,
+    "videos": 60 * 60,
+    "channels": 6 * 60 * 60,
+    "playlistItems": 15 * 60,
+}
+DEFAULT_TTL = 30 * 60
+
+
+class QuotaExceededError(RuntimeError):
+    """일일 쿼터 예산을 넘는 호출을 거절할 때 발생"""
+
+
+def quota_day() -> str:
+    return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+
+class YouTubeApiCache:
+    """ETag 응답 캐시 + 쿼터 사용량 저장소 (SQLite, 스레드/프로세스 공유)"""
+
+    def __init__(self, path: str = YOUTUBE_API_CACHE_PATH, daily_quota: int = YOUTUBE_DAILY_QUOTA,
+                 reserve: int = YOUTUBE_QUOTA_RESERVE):
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.fetches = 0
+        self.degraded = 0
+        self.refused = 0
+        self.memo_hits = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                body TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                day TEXT PRIMARY KEY,
+                used INTEGER NOT NULL
+            )
+        """)
+        # 영상의 채널은 바뀌지 않으므로 TTL 없이 보관
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS video_channels (
+                video_id TEXT PRIMARY KEY,
+                channel_id TEXT NOT NULL
+            )
+        """)
+
+    def lookup(self, key: str):
+        """(etag, body dict, fetched_at) 또는 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def store(self, key: str, etag: str, body: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, body, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, etag, json.dumps(body, ensure_ascii=False), time.time())
+            )
+
+    def touch(self, key: str):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+
+    def video_channel(self, video_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT channel_id FROM video_channels WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember_video_channel(self, video_id: str, channel_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO video_channels (video_id, channel_id) VALUES (?, ?)", (video_id, channel_id)
+            )
+
+    def try_charge(self, units: int) -> bool:
+        """쿼터를 units만큼 차감. 예산(비싼 호출은 예비분 제외)을 넘으면 차감하지 않고 False"""
+        limit = self.daily_quota - (self.reserve if units >= EXPENSIVE_CALL_UNITS else 0)
+        day = quota_day()
+        with self._lock:
+            # 여러 워커 프로세스가 동시에 차감해도 예산을 넘지 않도록 즉시 쓰기 잠금
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT used FROM quota_usage WHERE day = ?", (day,)).fetchone()
+                used = row[0] if row else 0
+                if used + units > limit:
+                    self._conn.execute("COMMIT")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO quota_usage (day, used) VALUES (?, ?)", (day, used + units)
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def quota_used(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT used FROM quota_usage WHERE day = ?", (quota_day(),)).fetchone()
+        return row[0] if row else 0
+
+    def stats(self) -> dict:
+        used = self.quota_used()
+        return {
+            "quota_day": quota_day(),
+            "quota_used": used,
+            "quota_remaining": max(0, self.daily_quota - used),
+            "daily_quota": self.daily_quota,
+            "cache_hits": self.cache_hits,
+            "not_modified": self.not_modified,
+            "fetches": self.fetches,
+            "degraded": self.degraded,
+            "refused": self.refused,
+            "channel_memo_hits": self.memo_hits,
+        }
+
+
+_api_cache = None
+_api_cache_lock = threading.Lock()
+
+
+def get_api_cache() -> YouTubeApiCache:
+    global _api_cache
+    if _api_cache is None:
+        with _api_cache_lock:
+            if _api_cache is None:
+                _api_cache = YouTubeApiCache()
+    return _api_cache
+
+
+def _cache_key(resource: str, params: dict) -> str:
+    return resource + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def youtube_api_get(resource: str, params: dict, fields: str = None, ttl: float = None) -> dict:
+    """YouTube Data API GET (예: resource="videos"). 응답 JSON(dict)을 반환하며 HTTP 오류는 예외로 전달"""
+    cache = get_api_cache()
+    params = {k: v for k, v in params.items() if v is not None and v != ""}
+    if fields:
+        params["fields"] = fields
+    key = _cache_key(resource, params)
+    ttl = RESOURCE_TTLS.get(resource, DEFAULT_TTL) if ttl is None else ttl
+
+    # 1. TTL 안의 캐시 응답은 그대로 반환 (쿼터 소모 없음)
+    cached = cache.lookup(key)
+    if cached and time.time() - cached[2] < ttl:
+        cache.cache_hits += 1
+        inc("cache_hits_total", cache="youtube_api")
+        return cached[1]
+    inc("cache_misses_total", cache="youtube_api")
+
+    # 2. 쿼터 차감. 예산이 부족하면 오래된 캐시로 대체하거나 거절
+    units = QUOTA_COSTS.get(resource, 1)
+    if not cache.try_charge(units):
+        if cached:
+            cache.degraded += 1
+            inc("youtube_quota_degraded_total", resource=resource)
+            logger.warning(f"⚠️ YouTube 쿼터 부족: {resource} 요청을 캐시된 응답으로 대체합니다")
+            return cached[1]
+        cache.refused += 1
+        inc("youtube_quota_refused_total", resource=resource)
+        raise QuotaExceededError(
+            f"YouTube API 일일 쿼터 예산 부족으로 {resource} 호출을 거절했습니다 "
+            f"(사용 {cache.quota_used()}/{cache.daily_quota}, 단가 {units})"
+        )
+
+    # 3. ETag 조건부 요청
+    headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+    response = http_get(
+        f"{YOUTUBE_API_URL}/{resource}",
+        params=dict(params, key=os.getenv("YOUTUBE_API_KEY")),
+        headers=headers,
+        endpoint=f"youtube.{resource}",
+    )
+    inc("youtube_quota_units_total", units, resource=resource)
+    if response.status_code == 304 and cached:
+        cache.not_modified += 1
+        inc("youtube_not_modified_total", resource=resource)
+        cache.touch(key)
+        return cached[1]
+
+    response.raise_for_status()
+    cache.fetches += 1
+    body = response.json()
+    cache.store(key, response.headers.get("ETag") or body.get("etag"), body)
+    return body
+
+
+def channel_id_for_video(video_id: str) -> str:
+    """영상의 채널 ID. 한 번 조회한 영상은 메모에서 바로 반환 (videos API 호출 생략). 영상이 없으면 None"""
+    cache = get_api_cache()
+    channel_id = cache.video_channel(video_id)
+    if channel_id:
+        cache.memo_hits += 1
+        return channel_id
+
+    video_data = youtube_api_get("videos", {"part": "snippet", "id": video_id}, fields="items(snippet/channelId)")
+    if not video_data.get("items"):
+        return None
+    channel_id = video_data["items"][0]["snippet"]["channelId"]
+    cache.remember_video_channel(video_id, channel_id)
+    return channel_id
+
+
+def get_quota_stats() -> dict:
+    return get_api_cache().stats()